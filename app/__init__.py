@@ -1,6 +1,9 @@
 import os
+import sys
 from flask import Flask, send_from_directory
 from .extensions import cors, mongo, jwt
+from . import geo, indexes, loader, matching, query_shapes, recommender, search
+from .json_provider import OrjsonProvider
 from .alunos.routes import bp as alunos_bp
 from .professores.routes import bp as profs_bp
 from .auth.routes import bp as auth_bp
@@ -10,16 +13,40 @@ from .agenda.routes import bp as agenda_bp
 from .chats.routes import bp as chats_bp
 from .avaliacoes.routes import bp as avaliacoes_bp
 from .uploads.routes import bp as uploads_bp
+from .health.routes import bp as health_bp
+from .suggest.routes import bp as suggest_bp
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _int_env(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
 def create_app():
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     
     # Config básica via env
     app.config["MONGODB_URI"] = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
     app.config["MONGO_DB"]    = os.getenv("MONGO_DB", "app_dev")
+    # "real" (MongoClient) ou "mock" (mongomock); sob pytest (inclusive na coleta) o padrão é "mock"
+    under_pytest = "PYTEST_CURRENT_TEST" in os.environ or "pytest" in sys.modules
+    app.config["DB_MODE"] = os.getenv("DB_MODE") or ("mock" if under_pytest else "real")
+    # conexão em background: tentativas de ping e backoff inicial (segundos, dobra a cada falha)
+    app.config["DB_CONNECT_RETRIES"] = _int_env("DB_CONNECT_RETRIES", 5)
+    app.config["DB_CONNECT_BACKOFF"] = float(os.getenv("DB_CONNECT_BACKOFF", "0.5"))
+    # segundos entre os pings do /readyz com o banco pronto (0 = a cada chamada)
+    app.config["DB_READY_TTL"] = float(os.getenv("DB_READY_TTL", "5"))
+    # pool do MongoClient (vazio = padrão do pymongo); MONGO_COMPRESSORS ex.: "zstd,zlib"
+    app.config["MONGO_MAX_POOL_SIZE"] = _int_env("MONGO_MAX_POOL_SIZE")
+    app.config["MONGO_MIN_POOL_SIZE"] = _int_env("MONGO_MIN_POOL_SIZE")
+    app.config["MONGO_MAX_IDLE_TIME_MS"] = _int_env("MONGO_MAX_IDLE_TIME_MS")
+    app.config["MONGO_WAIT_QUEUE_TIMEOUT_MS"] = _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+    app.config["MONGO_SERVER_SELECTION_TIMEOUT_MS"] = _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)
+    app.config["MONGO_COMPRESSORS"] = os.getenv("MONGO_COMPRESSORS", "")
     app.config["CORS_ORIGINS"]= os.getenv("CORS_ORIGINS", "*").split(",")
     app.config["JSON_SORT_KEYS"] = False
     app.config["SHOW_HASH"] = os.getenv("SHOW_HASH", "false").lower() == "true"
@@ -28,6 +55,32 @@ def create_app():
     app.config["JWT_HEADER_TYPE"]   = "Bearer"
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "sua-chave-secreta-super-segura")
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = False  # Tokens não expiram por padrão
+    # Listagens de aulas: "lookup" (uma agregação por página) ou "find" (find + um $in por relação)
+    app.config["AULAS_LIST_STRATEGY"] = os.getenv("AULAS_LIST_STRATEGY", "lookup")
+    # segundos em que o total de uma listagem (por filtro) é reaproveitado; 0 desliga o cache
+    app.config["TOTALS_TTL"] = int(os.getenv("TOTALS_TTL", "30"))
+    # sort= sem índice: "reject" (400) ou "rewrite" (usa a ordenação padrão da listagem)
+    app.config["SORT_POLICY"] = os.getenv("SORT_POLICY", "reject")
+    # ?explain=1 anexa o plano da consulta às listagens (sempre disponível em debug)
+    app.config["LIST_EXPLAIN"] = os.getenv("LIST_EXPLAIN", "false").lower() == "true"
+    # grava as formas das consultas (filtro/ordenação/projeção) para `flask db query-report`
+    app.config["QUERY_SHAPES"] = os.getenv("QUERY_SHAPES", "false").lower() == "true"
+    app.config["QUERY_SHAPES_FILE"] = os.getenv(
+        "QUERY_SHAPES_FILE", os.path.join(app.instance_path, "query_shapes.json")
+    )
+    # false em servidores sem os índices de texto: ?q= usa a busca por regex (mode=substring)
+    app.config["SEARCH_TEXT"] = os.getenv("SEARCH_TEXT", "true").lower() == "true"
+    # autocomplete em memória (/api/search/suggest); o TTL recarrega do banco (0 = só no boot)
+    app.config["SUGGEST_INDEX"] = os.getenv("SUGGEST_INDEX", "true").lower() == "true"
+    app.config["SUGGEST_TTL"] = int(os.getenv("SUGGEST_TTL", "300"))
+    # segundos em que uma resposta de /api/aulas/search (página + facetas) é reaproveitada
+    app.config["FACETS_TTL"] = int(os.getenv("FACETS_TTL", "60"))
+    # matriz TF-IDF do /api/professores/recomendar (aberta com mmap pelos workers)
+    app.config["RECOMMENDER_DIR"] = os.getenv(
+        "RECOMMENDER_DIR", os.path.join(app.instance_path, "recomendador")
+    )
+    # CSV prefixo de CEP -> lat/lon para `localizacao` (padrão: capitais, em app/data)
+    app.config["CEP_DATASET"] = os.getenv("CEP_DATASET", geo.CEP_DATASET)
 
     # === UPLOADS ===
     root_dir = os.path.abspath(os.path.dirname(__file__))
@@ -59,48 +112,15 @@ def create_app():
         automatic_options=True,
     )
 
+    query_shapes.init_app(app)  # antes do cliente do Mongo: o listener vale para clientes novos
     mongo.init_app(app)
     jwt.init_app(app)
-
-    # Índices essenciais (idempotentes)
-    mongo.db.alunos.create_index("email", unique=True)
-    mongo.db.professores.create_index("email", unique=True)
-    mongo.db.alunos.create_index([("created_at", -1)])
-    mongo.db.professores.create_index([("created_at", -1)])
-
-    # Índices para aulas
-    mongo.db.aulas.create_index("id_professor")
-    mongo.db.aulas.create_index("id_categoria")
-    mongo.db.aulas.create_index("status")
-    mongo.db.aulas.create_index([("created_at", -1)])
-    mongo.db.aulas.create_index([("titulo", "text"), ("descricao_aula", "text")])
-
-    # Índices para categorias
-    mongo.db.categorias.create_index("nome", unique=True)
-    mongo.db.categorias.create_index([("created_at", -1)])
-
-    # Índices para agenda
-    mongo.db.agenda.create_index("id_aluno")
-    mongo.db.agenda.create_index("id_professor")
-    mongo.db.agenda.create_index("id_aula")
-    mongo.db.agenda.create_index("status")
-    mongo.db.agenda.create_index("data_hora")
-    mongo.db.agenda.create_index([("id_professor", 1), ("data_hora", 1)])
-    mongo.db.agenda.create_index([("id_aluno", 1), ("data_hora", 1)])
-    mongo.db.agenda.create_index([("created_at", -1)])
-
-    # Índices para avaliações
-    mongo.db.avaliacoes.create_index("id_aluno")
-    mongo.db.avaliacoes.create_index("id_prof")
-    mongo.db.avaliacoes.create_index("id_aula")
-    mongo.db.avaliacoes.create_index([("id_aluno", 1), ("id_aula", 1)], unique=True)
-    mongo.db.avaliacoes.create_index([("created_at", -1)])
-
-    # Índices para status de aulas
-    mongo.db.status_aulas.create_index("id_aula")
-    mongo.db.status_aulas.create_index("id_professor")
-    mongo.db.status_aulas.create_index("data_hora")
-    mongo.db.status_aulas.create_index([("created_at", -1)])
+    loader.init_app(app)
+    # índices: declarados nos blueprints, aplicados por `flask db ensure-indexes`
+    indexes.init_app(app)
+    search.init_app(app)
+    recommender.init_app(app)
+    geo.init_app(app)
 
     # Blueprints
     app.register_blueprint(auth_bp,        url_prefix="/api/auth")
@@ -112,5 +132,7 @@ def create_app():
     app.register_blueprint(avaliacoes_bp,  url_prefix="/api/avaliacoes")
     app.register_blueprint(chats_bp,       url_prefix="/api/chats")
     app.register_blueprint(uploads_bp,     url_prefix="/api/files")
+    app.register_blueprint(suggest_bp,     url_prefix="/api/search")
+    app.register_blueprint(health_bp)      # /healthz e /readyz, fora de /api
 
     return app
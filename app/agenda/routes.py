@@ -3,8 +3,13 @@ import json
 from flask import Blueprint, request, jsonify, redirect
 from flask_cors import cross_origin
 from pymongo.errors import DuplicateKeyError
+from pymongo import IndexModel
 from ..extensions import mongo
-from ..utils import oid, now, scrub
+from ..utils import oid, now
+from ..serializers import AGENDA, ALUNO, PROFESSOR, AULA
+from ..loader import get_loader
+from ..pagination import page_args, fetch_page, count_total, debug_plan
+from ..aulas.routes import set_aula_status
 from datetime import datetime, timezone
 from app.google_calendar import get_oauth_flow, build_credentials_from_tokens, create_calendar_event
 from flask import current_app
@@ -16,6 +21,23 @@ bp = Blueprint("agenda", __name__)
 
 AGENDA_FIELDS = {"id_aluno", "id_professor", "id_aula", "data_hora", "status", "observacoes"}
 
+# Ordenações aceitas na listagem -> índice que serve cada uma (declarado em INDEXES; criado por `flask db ensure-indexes`)
+SORT_KEYS = {
+    "data_hora": [("data_hora", 1), ("_id", 1)],
+    "created_at": [("created_at", -1), ("_id", -1)],
+}
+
+# Índices da coleção (aplicados por `flask db ensure-indexes`)
+INDEXES = {"agenda": [
+    *(IndexModel(keys) for keys in SORT_KEYS.values()),
+    # _id no fim: a paginação por cursor ordena por (data_hora, _id) sem SORT em memória
+    IndexModel([("id_professor", 1), ("data_hora", 1), ("_id", 1)]),
+    IndexModel([("id_aluno", 1), ("data_hora", 1), ("_id", 1)]),
+    # agendamentos ativos de uma aula (update/delete de aulas e de agenda)
+    IndexModel([("id_aula", 1), ("status", 1)]),
+    IndexModel("status"),
+]}
+
 # Handler OPTIONS explícito para evitar redirects no preflight
 @bp.route("/", methods=["OPTIONS"], strict_slashes=False)
 @cross_origin(headers=["Content-Type", "Authorization"])
@@ -25,6 +47,16 @@ def options_handler():
 @bp.route("/", methods=["POST"], strict_slashes=False)
 @cross_origin(headers=["Content-Type", "Authorization"])
 def create():
+    """Cria um agendamento com um número fixo de idas ao banco.
+
+    Orçamento de round-trips (sem Google Calendar):
+    1. aluno, professor e aula lidos em paralelo (3 find_one, uma latência);
+    2. uma consulta de conflito para professor e aluno ($or);
+    3. insert_one do agendamento (já com calendar_status, se couber);
+    4. find_one_and_update da aula "disponivel" -> "agendada".
+    Com tokens do Google, soma-se um update_one com os dados do evento.
+    A resposta é montada a partir do documento em memória, sem reler o banco.
+    """
     data = request.get_json(force=True) or {}
     body = {k: v for k, v in data.items() if k in AGENDA_FIELDS}
     
@@ -32,47 +64,17 @@ def create():
     if not all(body.get(field) for field in required_fields):
         return jsonify({"error": "missing_fields", "required": required_fields}), 400
     
-    # Validar e converter IDs para ObjectId
+    # Validar IDs e data antes de qualquer consulta
     aluno_id = oid(body.get("id_aluno"))
     if not aluno_id:
         return jsonify({"error": "invalid_aluno_id"}), 400
-    
-    aluno = mongo.db.alunos.find_one({"_id": aluno_id})
-    if not aluno:
-        return jsonify({"error": "aluno_not_found"}), 404
-    
-    # IMPORTANTE: Salvar id_aluno como ObjectId
-    body["id_aluno"] = aluno_id
-    
-    # Validar se professor existe
     prof_id = oid(body.get("id_professor"))
     if not prof_id:
         return jsonify({"error": "invalid_professor_id"}), 400
-    
-    professor = mongo.db.professores.find_one({"_id": prof_id})
-    if not professor:
-        return jsonify({"error": "professor_not_found"}), 404
-    
-    # IMPORTANTE: Salvar id_professor como ObjectId
-    body["id_professor"] = prof_id
-    
-    # Validar se aula existe
     aula_id = oid(body.get("id_aula"))
     if not aula_id:
         return jsonify({"error": "invalid_aula_id"}), 400
     
-    aula = mongo.db.aulas.find_one({"_id": aula_id})
-    if not aula:
-        return jsonify({"error": "aula_not_found"}), 404
-    
-    # IMPORTANTE: Salvar id_aula como ObjectId
-    body["id_aula"] = aula_id
-    
-    # Validar se a aula pertence ao professor
-    if aula.get("id_professor") != prof_id:
-        return jsonify({"error": "aula_does_not_belong_to_professor"}), 400
-    
-    # Validar formato da data
     try:
         if isinstance(body["data_hora"], str):
             data_hora = datetime.fromisoformat(body["data_hora"].replace('Z', '+00:00'))
@@ -81,31 +83,50 @@ def create():
         
         if data_hora.tzinfo is None:
             data_hora = data_hora.replace(tzinfo=timezone.utc)
-        
-        body["data_hora"] = data_hora
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, AttributeError):
         return jsonify({"error": "invalid_datetime_format"}), 400
     
-    # Verificar conflitos de horário para o professor
+    # IMPORTANTE: Salvar ids como ObjectId
+    body["id_aluno"] = aluno_id
+    body["id_professor"] = prof_id
+    body["id_aula"] = aula_id
+    body["data_hora"] = data_hora
+    
+    # Existência das três referências: leituras independentes, em paralelo
+    refs = get_loader(mongo.db)
+    aluno, professor, aula = refs.load_all(
+        ("alunos", aluno_id, {"email": 1}),
+        ("professores", prof_id, {"email": 1, "google_tokens": 1}),
+        ("aulas", aula_id, {"id_professor": 1, "status": 1}),
+    )
+    if not aluno:
+        return jsonify({"error": "aluno_not_found"}), 404
+    if not professor:
+        return jsonify({"error": "professor_not_found"}), 404
+    if not aula:
+        return jsonify({"error": "aula_not_found"}), 404
+    
+    # Validar se a aula pertence ao professor
+    if aula.get("id_professor") != prof_id:
+        return jsonify({"error": "aula_does_not_belong_to_professor"}), 400
+    
+    # Conflitos de horário do professor e do aluno em uma única consulta
     conflito = mongo.db.agenda.find_one({
-        "id_professor": prof_id,
-        "data_hora": body["data_hora"],
+        "$or": [{"id_professor": prof_id}, {"id_aluno": aluno_id}],
+        "data_hora": data_hora,
         "status": {"$in": ["agendada", "confirmada"]}
-    })
+    }, {"id_professor": 1})
     if conflito:
-        return jsonify({"error": "professor_schedule_conflict"}), 409
-    
-    # Verificar conflitos de horário para o aluno
-    conflito_aluno = mongo.db.agenda.find_one({
-        "id_aluno": aluno_id,
-        "data_hora": body["data_hora"],
-        "status": {"$in": ["agendada", "confirmada"]}
-    })
-    if conflito_aluno:
+        if conflito.get("id_professor") == prof_id:
+            return jsonify({"error": "professor_schedule_conflict"}), 409
         return jsonify({"error": "aluno_schedule_conflict"}), 409
     
     body["status"] = body.get("status", "agendada")
     body["created_at"] = body["updated_at"] = now()
+    google_tokens = professor.get("google_tokens")
+    if not google_tokens:
+        # marca como precisa de autorização (frontend pode ler este campo)
+        body["calendar_status"] = "needs_auth"
     
     try:
         res = mongo.db.agenda.insert_one(body)
@@ -115,78 +136,42 @@ def create():
         print(f"[AGENDA CREATE] ERRO ao inserir agendamento: {str(e)}")
         return jsonify({"error": "creation_failed", "details": str(e)}), 500
     
-    # IMPORTANTE: Atualizar o status da aula para "agendada" quando um agendamento é criado
-    # Mover para fora do try para garantir que sempre execute
+    # IMPORTANTE: a aula passa de "disponivel" para "agendada" em uma operação atômica
     try:
-        aula_atual = mongo.db.aulas.find_one({"_id": aula_id})
-        if not aula_atual:
-            print(f"[AGENDA CREATE] ERRO: Aula {aula_id} não encontrada no banco!")
+        anterior = set_aula_status(mongo.db, {"_id": aula_id, "status": "disponivel"}, "agendada")
+        refs.forget("aulas", aula_id)
+        if anterior:
+            print(f"[AGENDA CREATE] ✅ Aula {aula_id} atualizada para 'agendada'")
         else:
-            status_atual = aula_atual.get("status")
-            print(f"[AGENDA CREATE] Aula ID: {aula_id}, Status atual no banco: '{status_atual}'")
-            
-            # Se a aula está "disponivel", mudar para "agendada"
-            if status_atual == "disponivel":
-                resultado = mongo.db.aulas.update_one(
-                    {"_id": aula_id},
-                    {"$set": {"status": "agendada", "updated_at": now()}}
-                )
-                print(f"[AGENDA CREATE] ✅ Aula atualizada para 'agendada': {resultado.modified_count} documento(s) modificado(s)")
-                
-                # Verificar se realmente foi atualizado
-                aula_verificada = mongo.db.aulas.find_one({"_id": aula_id}, {"status": 1})
-                print(f"[AGENDA CREATE] ✅ Verificação pós-update - Status no banco agora: '{aula_verificada.get('status') if aula_verificada else 'N/A'}'")
-            else:
-                print(f"[AGENDA CREATE] ⚠️ Aula não foi atualizada (status atual: '{status_atual}', esperado: 'disponivel')")
+            print(f"[AGENDA CREATE] ⚠️ Aula não foi atualizada (status atual: '{aula.get('status')}', esperado: 'disponivel')")
     except Exception as e:
         print(f"[AGENDA CREATE] ERRO ao atualizar status da aula: {str(e)}")
         # Não falha o agendamento se não conseguir atualizar o status da aula
     
-    # Construir resposta
-    doc = mongo.db.agenda.find_one({"_id": res.inserted_id}, {})
-    agendamento_doc = scrub(doc)
-    
-    # Converter ObjectIds para string (id_aluno, id_professor, id_aula)
-    if agendamento_doc.get("id_aluno"):
-        agendamento_doc["id_aluno"] = str(agendamento_doc["id_aluno"])
-    if agendamento_doc.get("id_professor"):
-        agendamento_doc["id_professor"] = str(agendamento_doc["id_professor"])
-    if agendamento_doc.get("id_aula"):
-        agendamento_doc["id_aula"] = str(agendamento_doc["id_aula"])
+    # Construir resposta a partir do documento inserido
+    agendamento_doc = AGENDA.one(body)
+    agendamento_doc["_id"] = res.inserted_id
     
     # Tenta criar evento no Google Calendar automaticamente se professor já tiver tokens
-    try:
-        prof = mongo.db.professores.find_one({"_id": prof_id})
-        if prof and prof.get("google_tokens"):
+    if google_tokens:
+        try:
+            creds = build_credentials_from_tokens(google_tokens)
+            from datetime import timedelta
+            end_dt = data_hora + timedelta(hours=1)  # ajuste se tiver duração real
+            attendees = []
+            if professor.get("email"):
+                attendees.append({"email": professor["email"]})
+            if aluno.get("email"):
+                attendees.append({"email": aluno.get("email")})
+            event = create_calendar_event(creds, summary=f"Aula: {aula_id}", description=agendamento_doc.get("observacoes", ""), start_dt=data_hora, end_dt=end_dt, attendees=attendees, timezone=os.environ.get("GOOGLE_CALENDAR_DEFAULT_TIMEZONE", "America/Sao_Paulo"))
+            mongo.db.agenda.update_one({"_id": res.inserted_id}, {"$set": {"calendar_event_id": event.get("id"), "calendar_htmlLink": event.get("htmlLink")}})
+        except Exception as e:
+            current_app.logger.exception("Erro criando evento Google Calendar (criação automática)")
             try:
-                creds = build_credentials_from_tokens(prof["google_tokens"])
-                start_dt = agendamento_doc.get("data_hora")
-                # se veio como string, converter
-                if isinstance(start_dt, str):
-                    start_dt = datetime.fromisoformat(start_dt.replace('Z', '+00:00'))
-                elif isinstance(start_dt, dict):
-                    # caso extremo: se data foi serializada como dict, ignore criação automática
-                    start_dt = None
-                # no banco já temos datetime; se ainda for None, pulamos
-                if start_dt:
-                    from datetime import timedelta
-                    end_dt = start_dt + timedelta(hours=1)  # ajuste se tiver duração real
-                    attendees = []
-                    if prof.get("email"):
-                        attendees.append({"email": prof["email"]})
-                    if aluno.get("email"):
-                        attendees.append({"email": aluno.get("email")})
-                    event = create_calendar_event(creds, summary=f"Aula: {agendamento_doc.get('id_aula')}", description=agendamento_doc.get("observacoes", ""), start_dt=start_dt, end_dt=end_dt, attendees=attendees, timezone=os.environ.get("GOOGLE_CALENDAR_DEFAULT_TIMEZONE", "America/Sao_Paulo"))
-                    mongo.db.agenda.update_one({"_id": res.inserted_id}, {"$set": {"calendar_event_id": event.get("id"), "calendar_htmlLink": event.get("htmlLink")}})
-            except Exception as e:
-                current_app.logger.exception("Erro criando evento Google Calendar (criação automática)")
                 mongo.db.agenda.update_one({"_id": res.inserted_id}, {"$set": {"calendar_status": "failed", "calendar_error": str(e)}})
-        else:
-            # marca como precisa de autorização (frontend pode ler este campo)
-            mongo.db.agenda.update_one({"_id": res.inserted_id}, {"$set": {"calendar_status": "needs_auth"}})
-    except Exception:
-        # não deve interromper fluxo principal
-        current_app.logger.exception("Erro ao verificar tokens do professor para criação automática de evento")
+            except Exception:
+                # não deve interromper fluxo principal
+                current_app.logger.exception("Erro ao registrar falha do Google Calendar no agendamento")
     
     return jsonify(agendamento_doc), 201
 
@@ -200,8 +185,9 @@ def list_():
     data_fim = request.args.get("data_fim")
     page = int(request.args.get("page", 1))
     limit = int(request.args.get("limit", 10))
-    order = int(request.args.get("order", -1))
-    sort = request.args.get("sort", "data_hora")
+    sort, order, position, err = page_args(request.args, SORT_KEYS, default="data_hora")
+    if err:
+        return err
     
     filt = {}
     
@@ -245,61 +231,69 @@ def list_():
         
         filt["data_hora"] = data_filtro
     
-    cur = (mongo.db.agenda.find(filt, {})
-           .sort(sort, order)
-           .skip((page-1)*limit)
-           .limit(limit))
-    total = mongo.db.agenda.count_documents(filt)
-    
-    # Enriquecer dados
-    agendamentos = []
-    for agendamento in cur:
-        agendamento_doc = scrub(agendamento)
-        
-        # Converter ObjectIds para string (id_aluno, id_professor, id_aula)
-        if agendamento_doc.get("id_aluno"):
-            agendamento_doc["id_aluno"] = str(agendamento_doc["id_aluno"])
-        if agendamento_doc.get("id_professor"):
-            agendamento_doc["id_professor"] = str(agendamento_doc["id_professor"])
-        if agendamento_doc.get("id_aula"):
-            agendamento_doc["id_aula"] = str(agendamento_doc["id_aula"])
+    projection, err = AGENDA.projection(request.args)
+    if err:
+        return err
+    # com ?cursor= a página continua de (data_hora, _id) pelos índices compostos, sem skip
+    agendamentos_raw, next_cursor = fetch_page(
+        mongo.db.agenda, filt, AGENDA.fetch(projection), sort, order, limit, position, page
+    )
+    total = count_total(mongo.db.agenda, filt, request.args)
+    
+    # Enriquecer dados: um único $in por relação para a página inteira
+    refs = get_loader(mongo.db)
+    alunos = refs.load_many(
+        "alunos",
+        [a.get("id_aluno") for a in agendamentos_raw],
+        {"nome": 1, "email": 1, "telefone": 1},
+    )
+    professores = refs.load_many(
+        "professores",
+        [a.get("id_professor") for a in agendamentos_raw],
+        {"nome": 1, "email": 1, "telefone": 1},
+    )
+    aulas = refs.load_many(
+        "aulas",
+        [a.get("id_aula") for a in agendamentos_raw],
+        {"titulo": 1, "descricao_aula": 1, "preco_decimal": 1},
+    )
+    
+    agendamentos = AGENDA.many(agendamentos_raw, projection)
+    for agendamento_doc in agendamentos:
+        id_aluno = agendamento_doc.get("id_aluno")
+        id_professor = agendamento_doc.get("id_professor")
+        id_aula = agendamento_doc.get("id_aula")
         
-        # Buscar dados do aluno
-        if agendamento.get("id_aluno"):
-            aluno = mongo.db.alunos.find_one({"_id": agendamento["id_aluno"]}, {"nome": 1, "email": 1, "telefone": 1})
-            if aluno:
-                agendamento_doc["aluno"] = {
-                    "id": str(aluno["_id"]),
-                    "nome": aluno.get("nome"),
-                    "email": aluno.get("email"),
-                    "telefone": aluno.get("telefone")
-                }
-        
-        # Buscar dados do professor
-        if agendamento.get("id_professor"):
-            prof = mongo.db.professores.find_one({"_id": agendamento["id_professor"]}, {"nome": 1, "email": 1, "telefone": 1})
-            if prof:
-                agendamento_doc["professor"] = {
-                    "id": str(prof["_id"]),
-                    "nome": prof.get("nome"),
-                    "email": prof.get("email"),
-                    "telefone": prof.get("telefone")
-                }
+        aluno = alunos.get(str(id_aluno)) if id_aluno else None
+        if aluno:
+            agendamento_doc["aluno"] = {
+                "id": aluno["_id"],
+                "nome": aluno.get("nome"),
+                "email": aluno.get("email"),
+                "telefone": aluno.get("telefone")
+            }
         
-        # Buscar dados da aula
-        if agendamento.get("id_aula"):
-            aula = mongo.db.aulas.find_one({"_id": agendamento["id_aula"]}, {"titulo": 1, "descricao_aula": 1, "preco_decimal": 1})
-            if aula:
-                agendamento_doc["aula"] = {
-                    "id": str(aula["_id"]),
-                    "titulo": aula.get("titulo"),
-                    "descricao_aula": aula.get("descricao_aula"),
-                    "preco_decimal": aula.get("preco_decimal")
-                }
+        prof = professores.get(str(id_professor)) if id_professor else None
+        if prof:
+            agendamento_doc["professor"] = {
+                "id": prof["_id"],
+                "nome": prof.get("nome"),
+                "email": prof.get("email"),
+                "telefone": prof.get("telefone")
+            }
         
-        agendamentos.append(agendamento_doc)
+        aula = aulas.get(str(id_aula)) if id_aula else None
+        if aula:
+            agendamento_doc["aula"] = {
+                "id": aula["_id"],
+                "titulo": aula.get("titulo"),
+                "descricao_aula": aula.get("descricao_aula"),
+                "preco_decimal": aula.get("preco_decimal")
+            }
     
-    return jsonify({"data": agendamentos, "total": total, "page": page, "limit": limit})
+    return jsonify({"data": agendamentos, "total": total, "page": page, "limit": limit,
+                    "next_cursor": next_cursor,
+                    **debug_plan(mongo.db.agenda, filt, sort, order, limit, position, request.args)})
 
 @bp.get("/<id>")
 def get_(id):
@@ -307,35 +301,31 @@ def get_(id):
     if not _id:
         return jsonify({"error": "invalid_id"}), 400
     
-    doc = mongo.db.agenda.find_one({"_id": _id}, {})
+    projection, err = AGENDA.projection(request.args, default="full")
+    if err:
+        return err
+    doc = mongo.db.agenda.find_one({"_id": _id}, AGENDA.fetch(projection))
     if not doc:
         return jsonify({"error": "not_found"}), 404
     
-    agendamento_doc = scrub(doc)
+    agendamento_doc = AGENDA.one(doc, projection)
     
-    # Converter ObjectIds para string (id_aluno, id_professor, id_aula)
-    if agendamento_doc.get("id_aluno"):
-        agendamento_doc["id_aluno"] = str(agendamento_doc["id_aluno"])
-    if agendamento_doc.get("id_professor"):
-        agendamento_doc["id_professor"] = str(agendamento_doc["id_professor"])
-    if agendamento_doc.get("id_aula"):
-        agendamento_doc["id_aula"] = str(agendamento_doc["id_aula"])
-    
-    # Enriquecer com dados completos
+    # Enriquecer com o resumo de cada relação
+    refs = get_loader(mongo.db)
     if doc.get("id_aluno"):
-        aluno = mongo.db.alunos.find_one({"_id": doc["id_aluno"]})
+        aluno = refs.load("alunos", doc["id_aluno"], ALUNO.summary())
         if aluno:
-            agendamento_doc["aluno"] = scrub(aluno)
+            agendamento_doc["aluno"] = ALUNO.one(aluno)
     
     if doc.get("id_professor"):
-        prof = mongo.db.professores.find_one({"_id": doc["id_professor"]})
+        prof = refs.load("professores", doc["id_professor"], PROFESSOR.summary())
         if prof:
-            agendamento_doc["professor"] = scrub(prof)
+            agendamento_doc["professor"] = PROFESSOR.one(prof)
     
     if doc.get("id_aula"):
-        aula = mongo.db.aulas.find_one({"_id": doc["id_aula"]})
+        aula = refs.load("aulas", doc["id_aula"], AULA.summary())
         if aula:
-            agendamento_doc["aula"] = scrub(aula)
+            agendamento_doc["aula"] = AULA.one(aula, AULA.summary())
     
     return jsonify(agendamento_doc)
 
@@ -354,7 +344,7 @@ def update(id):
         if not aluno_id:
             return jsonify({"error": "invalid_aluno_id"}), 400
         
-        aluno = mongo.db.alunos.find_one({"_id": aluno_id})
+        aluno = get_loader(mongo.db).load("alunos", aluno_id)
         if not aluno:
             return jsonify({"error": "aluno_not_found"}), 404
     
@@ -363,7 +353,7 @@ def update(id):
         if not prof_id:
             return jsonify({"error": "invalid_professor_id"}), 400
         
-        professor = mongo.db.professores.find_one({"_id": prof_id})
+        professor = get_loader(mongo.db).load("professores", prof_id)
         if not professor:
             return jsonify({"error": "professor_not_found"}), 404
     
@@ -372,7 +362,7 @@ def update(id):
         if not aula_id:
             return jsonify({"error": "invalid_aula_id"}), 400
         
-        aula = mongo.db.aulas.find_one({"_id": aula_id})
+        aula = get_loader(mongo.db).load("aulas", aula_id)
         if not aula:
             return jsonify({"error": "aula_not_found"}), 404
     
@@ -409,15 +399,7 @@ def update(id):
         return jsonify({"error": "not_found"}), 404
     
     doc = mongo.db.agenda.find_one({"_id": _id}, {})
-    agendamento_doc = scrub(doc)
-    
-    # Converter ObjectIds para string antes de retornar
-    if agendamento_doc.get("id_aluno"):
-        agendamento_doc["id_aluno"] = str(agendamento_doc["id_aluno"])
-    if agendamento_doc.get("id_professor"):
-        agendamento_doc["id_professor"] = str(agendamento_doc["id_professor"])
-    if agendamento_doc.get("id_aula"):
-        agendamento_doc["id_aula"] = str(agendamento_doc["id_aula"])
+    agendamento_doc = AGENDA.one(doc)
     
     return jsonify(agendamento_doc)
 
@@ -444,13 +426,10 @@ def delete(id):
         
         # Se não há mais agendamentos ativos, voltar a aula para "disponivel"
         if agendamentos_ativos == 0:
-            aula_atual = mongo.db.aulas.find_one({"_id": aula_id})
+            aula_atual = get_loader(mongo.db).load("aulas", aula_id)
             # Só atualizar se a aula não estiver cancelada ou concluída
             if aula_atual and aula_atual.get("status") not in ["cancelada", "concluida"]:
-                mongo.db.aulas.update_one(
-                    {"_id": aula_id},
-                    {"$set": {"status": "disponivel", "updated_at": now()}}
-                )
+                set_aula_status(mongo.db, {"_id": aula_id}, "disponivel")
     
     return ("", 204)
 
@@ -496,10 +475,7 @@ def update_status(id):
             
             # Se não há outros agendamentos ativos, voltar a aula para "disponivel"
             if agendamentos_ativos == 0:
-                mongo.db.aulas.update_one(
-                    {"_id": aula_id},
-                    {"$set": {"status": "disponivel", "updated_at": now()}}
-                )
+                set_aula_status(mongo.db, {"_id": aula_id}, "disponivel")
         # Se o agendamento foi concluído, verificar se todos os agendamentos estão concluídos
         elif novo_status == "concluida":
             total_agendamentos = mongo.db.agenda.count_documents({"id_aula": aula_id})
@@ -510,27 +486,13 @@ def update_status(id):
             
             # Se todos os agendamentos estão concluídos, marcar aula como "concluida"
             if total_agendamentos > 0 and agendamentos_concluidos == total_agendamentos:
-                mongo.db.aulas.update_one(
-                    {"_id": aula_id},
-                    {"$set": {"status": "concluida", "updated_at": now()}}
-                )
+                set_aula_status(mongo.db, {"_id": aula_id}, "concluida")
         # Se o status voltou para "agendada" ou "confirmada" (após cancelamento), atualizar aula
         elif novo_status in ["agendada", "confirmada"] and status_anterior == "cancelada":
-            mongo.db.aulas.update_one(
-                {"_id": aula_id},
-                {"$set": {"status": "agendada", "updated_at": now()}}
-            )
+            set_aula_status(mongo.db, {"_id": aula_id}, "agendada")
     
     doc = mongo.db.agenda.find_one({"_id": _id}, {})
-    agendamento_doc = scrub(doc)
-    
-    # Converter ObjectIds para string antes de retornar
-    if agendamento_doc.get("id_aluno"):
-        agendamento_doc["id_aluno"] = str(agendamento_doc["id_aluno"])
-    if agendamento_doc.get("id_professor"):
-        agendamento_doc["id_professor"] = str(agendamento_doc["id_professor"])
-    if agendamento_doc.get("id_aula"):
-        agendamento_doc["id_aula"] = str(agendamento_doc["id_aula"])
+    agendamento_doc = AGENDA.one(doc)
     
     return jsonify(agendamento_doc)
 # no topo do arquivo (se ainda não tiver)
@@ -645,8 +607,9 @@ def google_oauth_callback():
 
                 # Montar attendees com e-mails (se existirem)
                 attendees = []
-                prof = mongo.db.professores.find_one({"_id": ag.get("id_professor")})
-                aluno = mongo.db.alunos.find_one({"_id": ag.get("id_aluno")})
+                refs = get_loader(mongo.db)
+                prof = refs.load("professores", ag.get("id_professor"))
+                aluno = refs.load("alunos", ag.get("id_aluno"))
                 if prof and prof.get("email"):
                     attendees.append({"email": prof["email"]})
                 if aluno and aluno.get("email"):
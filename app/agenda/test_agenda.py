@@ -61,6 +61,53 @@ def test_create_success(mock_mongo, client):
     assert data["status"] == "agendada"
     assert data["id_aluno"] == str(aluno_id)
     
+def _mock_booking(mock_mongo, conflito=None):
+    aluno_id, prof_id, aula_id = ObjectId(), ObjectId(), ObjectId()
+    mock_mongo.db.alunos.find_one.return_value = {"_id": aluno_id, "email": "joao@example.com"}
+    mock_mongo.db.professores.find_one.return_value = {"_id": prof_id, "email": "maria@example.com"}
+    mock_mongo.db.aulas.find_one.return_value = {"_id": aula_id, "id_professor": prof_id, "status": "disponivel"}
+    mock_mongo.db.agenda.find_one.return_value = conflito(aluno_id, prof_id) if conflito else None
+    mock_mongo.db.agenda.insert_one.return_value = MagicMock(inserted_id=ObjectId())
+    mock_mongo.db.aulas.find_one_and_update.return_value = {"_id": aula_id, "status": "disponivel"}
+    return {
+        "id_aluno": str(aluno_id),
+        "id_professor": str(prof_id),
+        "id_aula": str(aula_id),
+        "data_hora": "2025-12-01T10:00:00Z"
+    }
+
+@patch('app.agenda.routes.mongo')
+def test_create_round_trip_budget(mock_mongo, client):
+    payload = _mock_booking(mock_mongo)
+    
+    response = client.post('/api/agenda/', json=payload)
+    
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data["id_aula"] == payload["id_aula"]
+    assert data["calendar_status"] == "needs_auth"
+    
+    # 3 leituras de existência + 1 conflito + insert + transição da aula; nada é relido
+    chamadas = sorted(name for name, _, _ in mock_mongo.db.mock_calls if "()" not in name)
+    assert chamadas == sorted([
+        "alunos.find_one", "professores.find_one", "aulas.find_one",
+        "agenda.find_one", "agenda.insert_one", "aulas.find_one_and_update",
+    ])
+    conflito = mock_mongo.db.agenda.find_one.call_args[0][0]
+    assert conflito["$or"] == [{"id_professor": ObjectId(payload["id_professor"])}, {"id_aluno": ObjectId(payload["id_aluno"])}]
+    filtro_aula = mock_mongo.db.aulas.find_one_and_update.call_args[0][0]
+    assert filtro_aula == {"_id": ObjectId(payload["id_aula"]), "status": "disponivel"}
+
+@patch('app.agenda.routes.mongo')
+def test_create_conflito_do_aluno(mock_mongo, client):
+    payload = _mock_booking(mock_mongo, conflito=lambda aluno_id, prof_id: {"_id": ObjectId(), "id_professor": ObjectId()})
+    
+    response = client.post('/api/agenda/', json=payload)
+    
+    assert response.status_code == 409
+    assert response.get_json()["error"] == "aluno_schedule_conflict"
+    mock_mongo.db.agenda.insert_one.assert_not_called()
+    
 @patch('app.agenda.routes.mongo')
 def test_list_success(mock_mongo, client):
     # IDs fictícios
@@ -84,29 +131,29 @@ def test_list_success(mock_mongo, client):
     mock_cursor.skip.return_value = mock_cursor
     mock_cursor.limit.return_value = [agenda] #Útimo método da cadeia, retorna uma lista iterável
     mock_mongo.db.agenda.find.return_value = mock_cursor #cursor fake
-    mock_mongo.db.agenda.count_documents.return_value = 1 #um agendamento
+    mock_mongo.db.agenda.estimated_document_count.return_value = 1 #um agendamento
     
-    # Mock Aluno
-    mock_mongo.db.alunos.find_one.return_value = {
+    # Mock Aluno (hidratação em lote via $in)
+    mock_mongo.db.alunos.find.return_value = [{
         "_id": aluno_id, 
         "nome": "João Silva", 
         "email": "joao@example.com", 
         "telefone": "11999999999"
-    }
+    }]
     # Mock Professor
-    mock_mongo.db.professores.find_one.return_value = {
+    mock_mongo.db.professores.find.return_value = [{
         "_id": prof_id, 
         "nome": "Maria Santos", 
         "email": "maria@example.com", 
         "telefone": "11888888888"
-    }
+    }]
     # Mock Aula
-    mock_mongo.db.aulas.find_one.return_value = {
+    mock_mongo.db.aulas.find.return_value = [{
         "_id": aula_id, 
         "titulo": "Matemática Avançada", 
         "descricao_aula": "Álgebra Linear", 
         "preco_decimal": 150.0
-    }
+    }]
     
     response = client.get('/api/agenda/')
     
@@ -122,6 +169,93 @@ def test_list_success(mock_mongo, client):
     assert "aula" in data["data"][0]
     assert data["data"][0]["aula"]["titulo"] == "Matemática Avançada"
     
+@patch('app.agenda.routes.mongo')
+def test_list_hydrates_page_in_batch(mock_mongo, client):
+    prof_id = ObjectId()
+    aula_id = ObjectId()
+    alunos = [ObjectId() for _ in range(3)]
+    
+    # Três agendamentos do mesmo professor/aula, alunos distintos
+    page = [{
+        "_id": ObjectId(),
+        "id_aluno": aluno_id,
+        "id_professor": prof_id,
+        "id_aula": aula_id,
+        "data_hora": datetime(2025, 12, 1, 10 + i, 0, tzinfo=timezone.utc),
+        "status": "agendada"
+    } for i, aluno_id in enumerate(alunos)]
+    
+    mock_cursor = MagicMock()
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.skip.return_value = mock_cursor
+    mock_cursor.limit.return_value = page
+    mock_mongo.db.agenda.find.return_value = mock_cursor
+    mock_mongo.db.agenda.estimated_document_count.return_value = 3
+    
+    mock_mongo.db.alunos.find.return_value = [{"_id": a, "nome": f"Aluno {i}"} for i, a in enumerate(alunos)]
+    mock_mongo.db.professores.find.return_value = [{"_id": prof_id, "nome": "Maria"}]
+    mock_mongo.db.aulas.find.return_value = [{"_id": aula_id, "titulo": "Cálculo"}]
+    
+    response = client.get('/api/agenda/')
+    
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert [d["aluno"]["nome"] for d in data] == ["Aluno 0", "Aluno 1", "Aluno 2"]
+    assert all(d["professor"]["nome"] == "Maria" for d in data)
+    # Uma consulta por relação, independente do tamanho da página
+    assert mock_mongo.db.alunos.find.call_count == 1
+    assert mock_mongo.db.professores.find.call_count == 1
+    assert mock_mongo.db.aulas.find.call_count == 1
+    assert mock_mongo.db.alunos.find_one.call_count == 0
+    ids_consultados = mock_mongo.db.professores.find.call_args[0][0]["_id"]["$in"]
+    assert ids_consultados == [prof_id]
+    
+@patch('app.agenda.routes.mongo')
+def test_list_cursor_continua_sem_skip(mock_mongo, client):
+    prof_id = ObjectId()
+    page = [{
+        "_id": ObjectId(),
+        "id_professor": prof_id,
+        "data_hora": datetime(2025, 12, 1, 10 - i, 0, tzinfo=timezone.utc),
+        "status": "agendada"
+    } for i in range(3)]
+    
+    mock_cursor = MagicMock()
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.skip.return_value = mock_cursor
+    mock_cursor.limit.return_value = page
+    mock_mongo.db.agenda.find.return_value = mock_cursor
+    mock_mongo.db.agenda.count_documents.return_value = 10
+    
+    # limit=2 com 3 linhas devolvidas: existe próxima página
+    response = client.get(f'/api/agenda/?professor={prof_id}&limit=2')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["data"]) == 2
+    cursor = body["next_cursor"]
+    assert cursor
+    mock_cursor.sort.assert_called_with([("data_hora", -1), ("_id", -1)])
+    mock_cursor.limit.assert_called_with(3)
+    
+    # a página seguinte parte de (data_hora, _id) da última linha, sem skip
+    mock_cursor.reset_mock()
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.limit.return_value = page[2:]
+    response = client.get(f'/api/agenda/?professor={prof_id}&limit=2&cursor={cursor}')
+    assert response.status_code == 200
+    assert response.get_json()["next_cursor"] is None
+    mock_cursor.skip.assert_not_called()
+    filtro = mock_mongo.db.agenda.find.call_args[0][0]
+    assert filtro["$and"][0] == {"id_professor": prof_id}
+    # datas voltam do cursor como UTC naive, igual ao que o pymongo devolve
+    ultima = page[1]["data_hora"].replace(tzinfo=None)
+    assert {"data_hora": ultima, "_id": {"$lt": page[1]["_id"]}} in filtro["$and"][1]["$or"]
+    
+    # cursor emitido para outra ordenação
+    response = client.get(f'/api/agenda/?order=1&cursor={cursor}')
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "cursor_sort_mismatch"
+    
 @patch('app.agenda.routes.mongo')
 def test_get_by_id_success(mock_mongo, client):
     # IDs fictícios
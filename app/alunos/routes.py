@@ -2,6 +2,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from pymongo.errors import DuplicateKeyError
+from pymongo import IndexModel
 import re
 
 from flask import current_app
@@ -10,7 +11,11 @@ from werkzeug.utils import secure_filename
 import os, time
 
 from ..extensions import mongo
-from ..utils import oid, now, scrub, hash_password
+from ..utils import oid, now, hash_password
+from ..serializers import ALUNO, ALUNO_PUBLICO
+from ..pagination import page_args, fetch_page, count_total, debug_plan
+from ..search import ALUNO_BUSCA, search_mode
+from ..matching import COLLECTION as MATCHES
 
 from urllib.parse import urljoin
 
@@ -37,6 +42,21 @@ ALUNO_FIELDS = {
     "visibilidade"            # "publico" | "privado"
 }
 
+# sort= aceitos em GET /api/alunos e o índice de cada um
+SORT_KEYS = {
+    "created_at": [("created_at", -1), ("_id", -1)],
+    "media_avaliacoes": [("media_avaliacoes", -1), ("_id", -1)],
+}
+
+INDEXES = {"alunos": [
+    IndexModel("email", unique=True),
+    # slug só é único entre os preenchidos: perfis antigos ainda não têm
+    IndexModel("slug", unique=True, partialFilterExpression={"slug": {"$gt": ""}}),
+    *(IndexModel(keys) for keys in SORT_KEYS.values()),
+    # busca.*: texto dobrado com pesos (q) e igualdade em cidade/estado
+    *ALUNO_BUSCA.indexes(),
+]}
+
 
 # ---------------------------
 # Helpers
@@ -109,10 +129,11 @@ def get_me():
             "created_at": now(),
             "updated_at": now(),
         }
+        novo["busca"] = ALUNO_BUSCA.build(novo)
         mongo.db.alunos.insert_one(novo)
         doc = novo
 
-    return jsonify(scrub(doc))
+    return jsonify(ALUNO.one(doc))
 
 
 @bp.put("/me")
@@ -155,10 +176,33 @@ def update_me():
     if not body:
         return jsonify({"error": "no_fields_to_update"}), 400
 
+    ALUNO_BUSCA.on_write(mongo.db.alunos, _id, body)
     body["updated_at"] = now()
     mongo.db.alunos.update_one({"_id": _id}, {"$set": body}, upsert=True)
     doc = mongo.db.alunos.find_one({"_id": _id}, {})
-    return jsonify(scrub(doc))
+    return jsonify(ALUNO.one(doc))
+
+
+@bp.get("/me/matches")
+@jwt_required()
+def my_matches():
+    """
+    Professores que ensinam o que o aluno quer aprender, calculados em lote
+    (`flask db build-matches`): uma leitura pelo _id, já na ordem e com o card de cada um.
+    """
+    _id = oid(get_jwt_identity())
+    if not _id:
+        return jsonify({"error": "invalid_token"}), 401
+    claims = get_jwt() or {}
+    if claims.get("tipo") != "aluno":
+        return jsonify({"error": "forbidden", "msg": "Acesso permitido apenas para alunos"}), 403
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "invalid_limit"}), 400
+
+    doc = mongo.db[MATCHES].find_one({"_id": _id}, {"professores": {"$slice": limit}, "gerado_em": 1}) or {}
+    return jsonify({"data": doc.get("professores", []), "gerado_em": doc.get("gerado_em")})
 
 
 # ---------------------------
@@ -190,6 +234,7 @@ def create():
         base = slugify(body["slug"])
         body["slug"] = ensure_unique_slug(base)
 
+    body["busca"] = ALUNO_BUSCA.build(body)
     body["created_at"] = body["updated_at"] = now()
 
     try:
@@ -200,7 +245,7 @@ def create():
         return jsonify({"error": "slug_already_exists"}), 409
 
     doc = mongo.db.alunos.find_one({"_id": res.inserted_id}, {})
-    return jsonify(scrub(doc)), 201
+    return jsonify(ALUNO.one(doc)), 201
 
 
 @bp.get("/")
@@ -220,28 +265,23 @@ def list_():
 
     page = int(args.get("page", 1))
     limit = int(args.get("limit", 10))
-    order = int(args.get("order", -1))
-    sort = args.get("sort", "created_at")
+    sort, order, position, err = page_args(args, SORT_KEYS)
+    if err:
+        return err
+    mode, err = search_mode(args)
+    if err:
+        return err
 
     filt = {}
     if vis == "publico":
         filt["visibilidade"] = {"$ne": "privado"}
 
+    # campos dobrados em `busca` (sem acento, minúsculos), com índice de texto e de igualdade
     if q:
-        regex = {"$regex": q, "$options": "i"}
-        filt["$or"] = [
-            {"nome": regex},
-            {"email": regex},
-            {"bio": regex},
-            {"headline": regex},
-            {"especializacoes": regex},
-            {"quer_ensinar": regex},
-            {"quer_aprender": regex},
-            {"skills.nome": regex},
-        ]
-
-    if cidade:  filt["endereco.cidade"] = {"$regex": f"^{cidade}$", "$options": "i"}
-    if estado:  filt["endereco.estado"] = {"$regex": f"^{estado}$", "$options": "i"}
+        filt.update(ALUNO_BUSCA.filter(q, mode))
+
+    if cidade:  filt.update(ALUNO_BUSCA.exact("cidade", cidade))
+    if estado:  filt.update(ALUNO_BUSCA.exact("estado", estado))
     if ensina:  filt["quer_ensinar"] = {"$regex": ensina, "$options": "i"}
     if aprende: filt["quer_aprender"] = {"$regex": aprende, "$options": "i"}
     if especializacao: filt["especializacoes"] = {"$regex": especializacao, "$options": "i"}
@@ -254,14 +294,16 @@ def list_():
     if minRating is not None:
         filt["media_avaliacoes"] = {"$gte": float(minRating)}
 
-    cur = (
-        mongo.db.alunos.find(filt, {})
-        .sort(sort, order)
-        .skip((page - 1) * limit)
-        .limit(limit)
-    )
-    total = mongo.db.alunos.count_documents(filt)
-    return jsonify({"data": [scrub(d) for d in cur], "total": total, "page": page, "limit": limit})
+    # listagem resumida por padrão; ?view=full ou ?fields=a,b viram projeção no Mongo
+    projection, err = ALUNO.projection(request.args)
+    if err:
+        return err
+
+    rows, next_cursor = fetch_page(mongo.db.alunos, filt, projection, sort, order, limit, position, page)
+    total = count_total(mongo.db.alunos, filt, args)
+    return jsonify({"data": ALUNO.many(rows, projection), "total": total, "page": page, "limit": limit,
+                    "next_cursor": next_cursor,
+                    **debug_plan(mongo.db.alunos, filt, sort, order, limit, position, args)})
 
 
 @bp.get("/<id>")
@@ -272,9 +314,12 @@ def get_(id):
     if not _id:
         return jsonify({"error": "invalid_id"}), 400
 
-    doc = mongo.db.alunos.find_one({"_id": _id}, {})
+    projection, err = ALUNO.projection(request.args, default="full")
+    if err:
+        return err
+    doc = mongo.db.alunos.find_one({"_id": _id}, projection)
     if doc:
-        return jsonify(scrub(doc))
+        return jsonify(ALUNO.one(doc, projection))
 
     uid = oid(get_jwt_identity())
     if uid and uid == _id:
@@ -287,8 +332,9 @@ def get_(id):
             "_id": _id, "nome": nome, "email": email, "slug": slug,
             "visibilidade": "publico", "created_at": now(), "updated_at": now()
         }
+        novo["busca"] = ALUNO_BUSCA.build(novo)
         mongo.db.alunos.insert_one(novo)
-        return jsonify(scrub(novo)), 201
+        return jsonify(ALUNO.one(novo)), 201
 
     return jsonify({"error": "not_found"}), 404
 
@@ -296,11 +342,9 @@ def get_(id):
 @bp.route("/slug/<slug>", methods=["GET"])
 @bp.route("/slug/<slug>/", methods=["GET"])   # aceita a barra final também
 def get_public_by_slug(slug):
-    doc = mongo.db.alunos.find_one({"slug": slug, "visibilidade": {"$ne": "privado"}}, {})
+    doc = mongo.db.alunos.find_one({"slug": slug, "visibilidade": {"$ne": "privado"}}, ALUNO_PUBLICO.full())
     if not doc: return jsonify({"error":"not_found"}), 404
-    safe = scrub(doc)
-    safe.pop("cpf", None); safe.pop("telefone", None); safe.pop("email", None)
-    return jsonify(safe)
+    return jsonify(ALUNO_PUBLICO.one(doc))
 
 
 
@@ -333,7 +377,7 @@ def publish_me():
         }}
     )
     doc = mongo.db.alunos.find_one({"_id": _id}, {})
-    return jsonify(scrub(doc))
+    return jsonify(ALUNO.one(doc))
 
 @bp.put("/<id>")
 @jwt_required()
@@ -366,13 +410,14 @@ def update(id):
     if not body:
         return jsonify({"error": "no_fields_to_update"}), 400
 
+    ALUNO_BUSCA.on_write(mongo.db.alunos, _id, body)
     body["updated_at"] = now()
     r = mongo.db.alunos.update_one({"_id": _id}, {"$set": body})
     if r.matched_count == 0:
         return jsonify({"error": "not_found"}), 404
 
     doc = mongo.db.alunos.find_one({"_id": _id}, {})
-    return jsonify(scrub(doc))
+    return jsonify(ALUNO.one(doc))
 
 
 @bp.delete("/<id>")
@@ -402,10 +447,15 @@ def endorse_skill(id):
         {"$inc": {"skills.$.endossos": 1}}
     )
     if r.matched_count == 0:
-        mongo.db.alunos.update_one(
-            {"_id": _id},
-            {"$push": {"skills": {"nome": skill, "endossos": 1}}}
-        )
+        # skill nova: `busca.tags` é recalculado no mesmo update, senão ela não aparece no ?q=
+        atual = mongo.db.alunos.find_one({"_id": _id}, ALUNO_BUSCA.sources())
+        if atual:
+            nova = {"nome": skill, "endossos": 1}
+            body = ALUNO_BUSCA.on_write(mongo.db.alunos, _id, {"skills": [*(atual.get("skills") or []), nova]}, atual)
+            mongo.db.alunos.update_one(
+                {"_id": _id, "skills.nome": {"$ne": skill}},
+                {"$push": {"skills": nova}, "$set": {"busca": body["busca"]}}
+            )
     return jsonify({"ok": True})
 
 
@@ -498,5 +548,5 @@ def upload_avatar_alunos_namespace(id):
 
     mongo.db.alunos.update_one({"_id": _id}, {"$set": {"avatar_url": url, "updated_at": now()}}, upsert=True)
     doc = mongo.db.alunos.find_one({"_id": _id}, {})
-    out = scrub(doc); out["avatarUrl"] = url
+    out = ALUNO.one(doc); out["avatarUrl"] = url
     return jsonify({"ok": True, "avatarUrl": url, "user": out}), 200
\ No newline at end of file
@@ -61,6 +61,56 @@ def test_list_success(mock_mongo, client, auth_header):
     assert body["data"][0]["nome"] == "Felipe"
     assert body["data"][1]["nome"] == "Alberto"
 
+
+@patch('app.search.text_search', return_value=True)   # servidor com índice de texto
+@patch('app.alunos.routes.mongo')
+def test_list_busca_dobrada(mock_mongo, _text_search, client, auth_header):
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.skip.return_value = cursor
+    cursor.limit.return_value = []
+    mock_mongo.db.alunos.find.return_value = cursor
+    mock_mongo.db.alunos.count_documents.return_value = 0
+
+    response = client.get("/api/alunos/?q=Violão&estado=RJ", headers=auth_header)
+    assert response.status_code == 200
+    assert mock_mongo.db.alunos.find.call_args[0][0] == {
+        "visibilidade": {"$ne": "privado"},
+        "$text": {"$search": "violao", "$language": "portuguese"},
+        "busca.estado": "rj",
+    }
+    assert client.get("/api/alunos/?q=x&mode=regex", headers=auth_header).status_code == 400
+
+def test_list_busca_sem_text_no_banco(client, auth_header):
+    # DB_MODE=mock: sem $text, ?q= vai pela substring nos campos dobrados (e não dá 500)
+    from app.extensions import mongo
+    from app.search import ALUNO_BUSCA
+    mongo.db.alunos.delete_many({})
+    for aluno in ({"nome": "Caio", "quer_aprender": ["Matemática"]}, {"nome": "Duda", "bio": "Química"}):
+        mongo.db.alunos.insert_one({**aluno, "busca": ALUNO_BUSCA.build(aluno)})
+
+    response = client.get("/api/alunos/?q=mat", headers=auth_header)
+    assert response.status_code == 200
+    assert [a["nome"] for a in response.get_json()["data"]] == ["Caio"]
+
+
+def test_endosso_de_skill_nova_entra_na_busca(client, auth_header):
+    from app.extensions import mongo
+    from app.search import ALUNO_BUSCA
+    mongo.db.alunos.delete_many({})
+    aluno = {"nome": "Caio", "skills": [{"nome": "Python", "endossos": 2}]}
+    _id = mongo.db.alunos.insert_one({**aluno, "busca": ALUNO_BUSCA.build(aluno)}).inserted_id
+
+    for skill in ("Violão", "Python", "Violão"):
+        assert client.post(f"/api/alunos/{_id}/endorse", json={"skill": skill}, headers=auth_header).status_code == 200
+
+    doc = mongo.db.alunos.find_one({"_id": _id})
+    assert doc["skills"] == [{"nome": "Python", "endossos": 3}, {"nome": "Violão", "endossos": 2}]
+    assert doc["busca"] == ALUNO_BUSCA.build(doc)
+    response = client.get("/api/alunos/?q=violao", headers=auth_header)
+    assert [a["nome"] for a in response.get_json()["data"]] == ["Caio"]
+
+
 @patch('app.alunos.routes.mongo')
 def test_get_by_id_success(mock_mongo, client, auth_header):
     oid = ObjectId()
@@ -1,12 +1,19 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
+from pymongo import ReturnDocument
+from pymongo import IndexModel
 from pymongo.errors import DuplicateKeyError
 from ..extensions import mongo
-from ..utils import oid, now, scrub
+from ..utils import oid, now, lookup_stages
+from ..serializers import AULA
+from ..loader import get_loader
+from ..search import SEARCH_LANGUAGE, SUGGEST, search_mode
+from ..pagination import (page_args, after, sort_spec, with_sort_field, page_of, fetch_page, count_total,
+                          debug_plan, filter_key, TTLCache)
 from flask import current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
-import os, time
+import os, re, time
 
 
 bp = Blueprint("aulas", __name__)
@@ -15,6 +22,269 @@ AULA_FIELDS = {
     "titulo", "descricao_aula", "preco_decimal", "id_categoria", "id_professor"
 }
 
+# Campos do professor embutidos nas listagens de aulas
+PROFESSOR_RESUMO = ["nome", "email", "bio"]
+
+LIST_STRATEGIES = ("lookup", "find")
+
+# Busca por `q`: "text" usa o índice de texto ($text, com stemming em português);
+# "substring" é o regex antigo (acha pedaços de palavra, mas varre a coleção)
+TEXT_INDEX = IndexModel(
+    [("titulo", "text"), ("descricao_aula", "text")],
+    weights={"titulo": 3, "descricao_aula": 1},
+    default_language=SEARCH_LANGUAGE,
+)
+# ordenação pelo textScore do $text; só existe com busca "text"
+RELEVANCE = "relevance"
+
+# Catálogo (/search): faixas de preço, quantos valores por faceta e cache por filtro
+INF = float("inf")
+PRECO_BUCKETS = [0, 50, 100, 200, 500, INF]
+FACET_TOP = 20
+FACETS = TTLCache(maxsize=512)
+
+# Ordenações de listagem e seus índices; a paginação por cursor usa (campo, _id)
+SORT_KEYS = {"created_at": [("created_at", -1), ("_id", -1)]}
+
+INDEXES = {
+    "aulas": [
+        *(IndexModel(keys) for keys in SORT_KEYS.values()),
+        IndexModel([("id_professor", 1), ("created_at", -1), ("_id", -1)]),
+        IndexModel([("id_categoria", 1), ("created_at", -1), ("_id", -1)]),
+        IndexModel("status"),
+        TEXT_INDEX,
+    ],
+    "status_aulas": [
+        IndexModel("id_aula"),
+        IndexModel("id_professor"),
+        IndexModel("data_hora"),
+        IndexModel([("created_at", -1)]),
+    ],
+}
+
+
+def list_strategy():
+    """Estratégia de listagem: "lookup" (agregação única) ou "find" (find + loader em lote).
+
+    O padrão vem de AULAS_LIST_STRATEGY; `?strategy=` permite comparar as duas sob carga.
+    """
+    strategy = request.args.get("strategy") or current_app.config.get("AULAS_LIST_STRATEGY", "lookup")
+    return strategy if strategy in LIST_STRATEGIES else "lookup"
+
+
+def search_args(args):
+    """
+    Lê `?q=` e `?mode=`; retorna (filtro da busca, ordenações aceitas, erro).
+
+    Em "text" a busca vai pelo índice de texto e a listagem aceita também
+    `sort=relevance` (textScore, sempre decrescente); em "substring" (ou sem
+    $text no banco) o termo é procurado literalmente no título e na descrição.
+    """
+    q = (args.get("q") or "").strip()
+    mode, err = search_mode(args)
+    if err:
+        return None, None, err
+    if not q:
+        return {}, SORT_KEYS, None
+    if mode == "substring":
+        regex = {"$regex": re.escape(q), "$options": "i"}
+        return {"$or": [{"titulo": regex}, {"descricao_aula": regex}]}, SORT_KEYS, None
+    if args.get("sort") == RELEVANCE and args.get("order", "-1") != "-1":
+        return None, None, (jsonify({"error": "invalid_order", "valid": [-1]}), 400)
+    keys = {**SORT_KEYS, RELEVANCE: list(TEXT_INDEX.document["key"].items())}
+    return {"$text": {"$search": q, "$language": SEARCH_LANGUAGE}}, keys, None
+
+
+def list_filter(args):
+    """
+    Filtro das listagens de aulas (`q`/`mode`, `categoria`, `professor`, `status`,
+    `preco_min`, `preco_max`); retorna (filtro, ordenações aceitas, erro).
+    """
+    filt, sort_keys, err = search_args(args)
+    if err:
+        return None, None, err
+    categoria = args.get("categoria")
+    professor = args.get("professor")
+    status = args.get("status")
+    if categoria:
+        cat_id = oid(categoria)
+        if cat_id:
+            filt["id_categoria"] = cat_id
+    if professor:
+        prof_id = oid(professor)
+        if prof_id:
+            filt["id_professor"] = prof_id
+            print(f"[AULAS LIST] Buscando aulas do professor: {prof_id} (tipo: {type(prof_id)})")
+    if status:
+        filt["status"] = status
+    preco_min = args.get("preco_min", type=float)
+    preco_max = args.get("preco_max", type=float)
+    if preco_min is not None or preco_max is not None:
+        filt["preco_decimal"] = {
+            **({"$gte": preco_min} if preco_min is not None else {}),
+            **({"$lt": preco_max} if preco_max is not None else {}),
+        }
+    return filt, sort_keys, None
+
+
+def facet_stages():
+    """Sub-pipelines do $facet do catálogo (contagens sobre as aulas já filtradas)."""
+    top = [{"$sort": {"count": -1, "_id": 1}}, {"$limit": FACET_TOP}]
+    return {
+        "categorias": [
+            {"$group": {"_id": "$id_categoria", "count": {"$sum": 1}}}, *top,
+            *lookup_stages("categorias", "_id", "_ref", ["nome"]),
+        ],
+        "professores": [
+            {"$group": {"_id": "$id_professor", "count": {"$sum": 1}}}, *top,
+            *lookup_stages("professores", "_id", "_ref", ["nome"]),
+        ],
+        "status": [
+            {"$group": {"_id": {"$ifNull": ["$status", "disponivel"]}, "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+        ],
+        "preco": [
+            {"$bucket": {"groupBy": "$preco_decimal", "boundaries": PRECO_BUCKETS,
+                         "default": "sem_preco", "output": {"count": {"$sum": 1}}}},
+        ],
+        "total": [{"$count": "n"}],
+    }
+
+
+def facets_payload(raw):
+    """Formata o resultado do $facet para a barra lateral do catálogo."""
+    def refs(rows):
+        return [
+            {"id": r["_id"], "nome": (first(r.get("_ref")) or {}).get("nome"), "count": r["count"]}
+            for r in rows if r["_id"] is not None
+        ]
+    limites = dict(zip(PRECO_BUCKETS, PRECO_BUCKETS[1:]))
+    return {
+        "categorias": refs(raw["categorias"]),
+        "professores": refs(raw["professores"]),
+        "status": [{"valor": r["_id"], "count": r["count"]} for r in raw["status"]],
+        "preco": [
+            {"min": None, "max": None, "count": r["count"]} if r["_id"] == "sem_preco" else
+            {"min": r["_id"], "max": None if limites[r["_id"]] == INF else limites[r["_id"]], "count": r["count"]}
+            for r in raw["preco"]
+        ],
+    }
+
+
+def bump_aulas_count(db, cat_id, delta):
+    """Mantém categorias.aulas_count em dia.
+
+    Só incrementa categorias que já têm o contador; as antigas continuam sendo
+    contadas sob demanda até `flask db recount-aulas`.
+    """
+    if cat_id:
+        db.categorias.update_one(
+            {"_id": cat_id, "aulas_count": {"$exists": True}},
+            {"$inc": {"aulas_count": delta}},
+        )
+
+
+def set_aula_status(db, filt, status):
+    """Troca o status da aula que casar com `filt` (atômico) e invalida as facetas do catálogo.
+
+    Retorna o documento anterior (só `status`), ou None se nenhuma aula casou.
+    """
+    anterior = db.aulas.find_one_and_update(
+        filt, {"$set": {"status": status, "updated_at": now()}}, projection={"status": 1},
+    )
+    if anterior is not None:
+        FACETS.clear()
+    return anterior
+
+
+def first(items):
+    return items[0] if items else None
+
+
+def aulas_list_payload(rows, projection=None):
+    """Formata uma página de (aula, professor, categoria) já carregada por aulas_page."""
+    aulas = AULA.many((aula for aula, _, _ in rows), projection)
+    for aula_doc, (_, prof, cat) in zip(aulas, rows):
+        if prof:
+            aula_doc["professor"] = {
+                "id": prof["_id"],
+                "nome": prof.get("nome"),
+                "email": prof.get("email"),
+                "bio": prof.get("bio")
+            }
+        if cat:
+            aula_doc["categoria"] = {
+                "id": cat["_id"],
+                "nome": cat.get("nome")
+            }
+    return aulas
+
+def aulas_pipeline(filt, sort, order, page, limit, strategy, with_categoria=True, projection=None, position=None):
+    """
+    A agregação que `aulas_page` roda para a página (estratégia "lookup" ou
+    `sort="relevance"`), ou None quando a página sai de um find. A mesma lista
+    vai para o `?explain=1` da listagem (ver pagination.debug_plan).
+    """
+    if strategy != "lookup" and sort != RELEVANCE:
+        return None
+    projection = with_sort_field(AULA.fetch(projection), sort)
+    if sort == RELEVANCE:
+        # o $match com $text tem de ser o primeiro estágio; o cursor filtra depois do score
+        match = [
+            {"$match": filt},
+            {"$addFields": {RELEVANCE: {"$meta": "textScore"}}},
+            *([{"$match": after({}, sort, order, position)}] if position is not None else []),
+        ]
+    else:
+        match = [{"$match": after(filt, sort, order, position)}]
+    pipeline = [
+        *match,
+        {"$sort": dict(sort_spec(sort, order))},
+        *([{"$skip": (page-1)*limit}] if position is None else []),
+        {"$limit": limit + 1},
+        *([{"$project": projection}] if projection else []),
+        *lookup_stages("professores", "id_professor", "_professor", PROFESSOR_RESUMO),
+    ]
+    if with_categoria:
+        pipeline += lookup_stages("categorias", "id_categoria", "_categoria", ["nome"])
+    return pipeline
+
+
+def aulas_page(db, filt, sort, order, page, limit, strategy, with_categoria=True, projection=None, position=None):
+    """Carrega uma página de aulas com professor (e categoria) já resolvidos.
+
+    Retorna (lista de tuplas (aula, professor, categoria), cursor da próxima página).
+    Em "lookup" a página inteira vem de uma agregação ($match → $sort → $skip/$limit
+    → $lookup); em "find" as relações saem do loader da requisição (um $in por
+    coleção, sem repetir ids). `projection` (ver serializers) é aplicada no banco,
+    antes dos joins; com `position` (ver pagination) a página continua do cursor.
+
+    `sort="relevance"` (filtro com $text) sempre usa a agregação: o textScore vira
+    o campo `relevance`, que ordena, pagina e volta na resposta.
+    """
+    pipeline = aulas_pipeline(filt, sort, order, page, limit, strategy, with_categoria, projection, position)
+    if pipeline is not None:
+        aulas, next_cursor = page_of(db.aulas.aggregate(pipeline), sort, order, limit)
+        return [
+            (aula, first(aula.pop("_professor", None)), first(aula.pop("_categoria", None)))
+            for aula in aulas
+        ], next_cursor
+
+    projection = with_sort_field(AULA.fetch(projection), sort)
+    aulas, next_cursor = fetch_page(db.aulas, filt, projection or {}, sort, order, limit, position, page)
+    refs = get_loader(db)
+    prof_proj = {f: 1 for f in PROFESSOR_RESUMO}
+    refs.want("professores", [a.get("id_professor") for a in aulas], prof_proj)
+    if with_categoria:
+        refs.want("categorias", [a.get("id_categoria") for a in aulas], {"nome": 1})
+    rows = []
+    for aula in aulas:
+        prof = refs.load("professores", aula.get("id_professor"), prof_proj)
+        cat = refs.load("categorias", aula.get("id_categoria"), {"nome": 1}) if with_categoria else None
+        rows.append((aula, prof, cat))
+    return rows, next_cursor
+
+
 # Handler OPTIONS explícito para evitar redirects no preflight
 @bp.route("/", methods=["OPTIONS"], strict_slashes=False)
 @cross_origin(headers=["Content-Type", "Authorization"])
@@ -35,7 +305,8 @@ def create():
     if not prof_id:
         return jsonify({"error": "invalid_professor_id"}), 400
     
-    professor = mongo.db.professores.find_one({"_id": prof_id})
+    refs = get_loader(mongo.db)
+    professor = refs.load("professores", prof_id)
     if not professor:
         return jsonify({"error": "professor_not_found"}), 404
     
@@ -49,7 +320,7 @@ def create():
         if not cat_id:
             return jsonify({"error": "invalid_category_id"}), 400
         
-        categoria = mongo.db.categorias.find_one({"_id": cat_id})
+        categoria = refs.load("categorias", cat_id)
         if not categoria:
             return jsonify({"error": "category_not_found"}), 404
         
@@ -81,23 +352,14 @@ def create():
         print(f"[AULAS CREATE] ERRO ao inserir aula: {str(e)}")
         return jsonify({"error": "creation_failed", "details": str(e)}), 500
     
+    bump_aulas_count(mongo.db, body.get("id_categoria"), 1)
+    SUGGEST.put("aula", res.inserted_id, body.get("titulo"))
+    FACETS.clear()
+    
     doc = mongo.db.aulas.find_one({"_id": res.inserted_id}, {})
     print(f"[AULAS CREATE] Aula recuperada do banco - Status: {doc.get('status') if doc else 'não encontrada'}")
     
-    # Criar cópia para não modificar o documento original
-    doc_copy = dict(doc)
-    aula_doc = scrub(doc_copy)
-    
-    # GARANTIR que o status está presente
-    if "status" not in aula_doc:
-        aula_doc["status"] = doc.get("status", "disponivel")
-        print(f"[AULAS CREATE] ⚠️ Status não estava após scrub, adicionado: '{aula_doc['status']}'")
-    
-    # Converter ObjectIds para string (id_professor, id_categoria)
-    if aula_doc.get("id_professor"):
-        aula_doc["id_professor"] = str(aula_doc["id_professor"])
-    if aula_doc.get("id_categoria"):
-        aula_doc["id_categoria"] = str(aula_doc["id_categoria"])
+    aula_doc = AULA.one(doc)
     
     print(f"[AULAS CREATE] Aula retornada - Status no JSON: '{aula_doc.get('status')}'")
     
@@ -106,91 +368,88 @@ def create():
 @bp.route("/", methods=["GET"], strict_slashes=False)
 @cross_origin(headers=["Content-Type", "Authorization"])
 def list_():
-    q = request.args.get("q")
-    categoria = request.args.get("categoria")
-    professor = request.args.get("professor")
-    status = request.args.get("status")
     page = int(request.args.get("page", 1))
     limit = int(request.args.get("limit", 10))
-    order = int(request.args.get("order", -1))
-    sort = request.args.get("sort", "created_at")
-    
-    filt = {}
-    if q:
-        filt["$or"] = [
-            {"titulo": {"$regex": q, "$options": "i"}},
-            {"descricao_aula": {"$regex": q, "$options": "i"}},
-        ]
-    if categoria:
-        cat_id = oid(categoria)
-        if cat_id:
-            filt["id_categoria"] = cat_id
-    if professor:
-        prof_id = oid(professor)
-        if prof_id:
-            filt["id_professor"] = prof_id
-            print(f"[AULAS LIST] Buscando aulas do professor: {prof_id} (tipo: {type(prof_id)})")
-    if status:
-        filt["status"] = status
+    filt, sort_keys, err = list_filter(request.args)
+    if err:
+        return err
+    sort, order, position, err = page_args(request.args, sort_keys)
+    if err:
+        return err
     
     print(f"[AULAS LIST] Filtro aplicado: {filt}")
-    cur = (mongo.db.aulas.find(filt, {})
-           .sort(sort, order)
-           .skip((page-1)*limit)
-           .limit(limit))
-    total = mongo.db.aulas.count_documents(filt)
-    print(f"[AULAS LIST] Total de aulas encontradas: {total}")
-    
-    # Enriquecer dados com informações do professor e categoria
-    aulas = []
-    for aula in cur:
-        # Criar cópia do documento antes do scrub para preservar todos os campos
-        aula_copy = dict(aula)
-        aula_doc = scrub(aula_copy)
-        
-        # Log detalhado para debug
-        status_original = aula.get("status")
-        status_scrub = aula_doc.get("status")
-        print(f"[AULAS LIST] Aula processada - ID: {aula_doc.get('_id')}, Título: {aula_doc.get('titulo')}, Status original: '{status_original}', Status após scrub: '{status_scrub}'")
-        
-        # GARANTIR que o status está presente e correto no resultado
-        if "status" not in aula_doc or not aula_doc.get("status"):
-            # Se não tem status no doc, buscar diretamente do banco
-            aula_doc["status"] = status_original or "disponivel"
-            print(f"[AULAS LIST] ⚠️ Status não estava no doc após scrub, adicionado: '{aula_doc['status']}'")
-        else:
-            # Garantir que o status está correto (pode ter sido alterado pelo scrub)
-            aula_doc["status"] = status_original or aula_doc.get("status") or "disponivel"
-        
-        # Converter ObjectIds para string (id_professor, id_categoria)
-        if aula_doc.get("id_professor"):
-            aula_doc["id_professor"] = str(aula_doc["id_professor"])
-        if aula_doc.get("id_categoria"):
-            aula_doc["id_categoria"] = str(aula_doc["id_categoria"])
-        
-        # Buscar dados do professor
-        if aula.get("id_professor"):
-            prof = mongo.db.professores.find_one({"_id": aula["id_professor"]}, {"nome": 1, "email": 1, "bio": 1})
-            if prof:
-                aula_doc["professor"] = {
-                    "id": str(prof["_id"]),
-                    "nome": prof.get("nome"),
-                    "email": prof.get("email"),
-                    "bio": prof.get("bio")
-                }
-        
-        # Buscar dados da categoria
-        if aula.get("id_categoria"):
-            cat = mongo.db.categorias.find_one({"_id": aula["id_categoria"]}, {"nome": 1})
-            if cat:
-                aula_doc["categoria"] = {
-                    "id": str(cat["_id"]),
-                    "nome": cat.get("nome")
-                }
-        
-        aulas.append(aula_doc)
-    
-    return jsonify({"data": aulas, "total": total, "page": page, "limit": limit})
+    projection, err = AULA.projection(request.args)
+    if err:
+        return err
+    strategy = list_strategy()
+    rows, next_cursor = aulas_page(mongo.db, filt, sort, order, page, limit, strategy,
+                                   projection=projection, position=position)
+    total = count_total(mongo.db.aulas, filt, request.args)
+    print(f"[AULAS LIST] Total de aulas encontradas: {total} (strategy={strategy})")
+    
+    aulas = aulas_list_payload(rows, projection)
+    
+    return jsonify({"data": aulas, "total": total, "page": page, "limit": limit,
+                    "next_cursor": next_cursor,
+                    **debug_plan(mongo.db.aulas, filt, sort, order, limit, position, request.args,
+                                 pipeline=aulas_pipeline(filt, sort, order, page, limit, strategy,
+                                                         projection=projection, position=position))})
+
+@bp.get("/search")
+def search():
+    """
+    Catálogo: página de aulas + contagens por categoria, status, faixa de preço e
+    professor, numa única agregação ($facet). Aceita os filtros, a ordenação e a
+    paginação da listagem; as contagens refletem os filtros aplicados. A resposta
+    fica em cache por FACETS_TTL segundos para a mesma consulta normalizada.
+    """
+    page = int(request.args.get("page", 1))
+    limit = int(request.args.get("limit", 10))
+    filt, sort_keys, err = list_filter(request.args)
+    if err:
+        return err
+    sort, order, position, err = page_args(request.args, sort_keys)
+    if err:
+        return err
+    projection, err = AULA.projection(request.args)
+    if err:
+        return err
+
+    key = filter_key({"filter": filt, "sort": [sort, order], "page": page, "limit": limit,
+                      "cursor": position, "projection": projection})
+    payload = FACETS.get(key)
+    if payload is not None:
+        return jsonify(payload)
+
+    head = [{"$match": filt}]
+    if sort == RELEVANCE:
+        head.append({"$addFields": {RELEVANCE: {"$meta": "textScore"}}})
+    # antes do $facet: o $sort logo após o $match usa o índice (dentro do $facet, nunca);
+    # as contagens não dependem da ordem
+    head.append({"$sort": dict(sort_spec(sort, order))})
+    fetch = with_sort_field(AULA.fetch(projection), sort)
+    data = [
+        # o cursor só posiciona a página; as contagens usam o filtro inteiro
+        *([{"$match": after({}, sort, order, position)}] if position is not None else []),
+        *([{"$skip": (page-1)*limit}] if position is None else []),
+        {"$limit": limit + 1},
+        *([{"$project": fetch}] if fetch else []),
+        *lookup_stages("professores", "id_professor", "_professor", PROFESSOR_RESUMO),
+        *lookup_stages("categorias", "id_categoria", "_categoria", ["nome"]),
+    ]
+    raw = next(iter(mongo.db.aulas.aggregate([*head, {"$facet": {"data": data, **facet_stages()}}])), None)
+    raw = raw or {"data": [], "categorias": [], "professores": [], "status": [], "preco": [], "total": []}
+
+    aulas, next_cursor = page_of(raw["data"], sort, order, limit)
+    rows = [(a, first(a.pop("_professor", None)), first(a.pop("_categoria", None))) for a in aulas]
+    payload = {
+        "data": aulas_list_payload(rows, projection),
+        "total": raw["total"][0]["n"] if raw["total"] else 0,
+        "page": page, "limit": limit, "next_cursor": next_cursor,
+        "facets": facets_payload(raw),
+    }
+    FACETS.set(key, payload, current_app.config.get("FACETS_TTL", 60))
+    return jsonify(payload)
 
 @bp.get("/<id>")
 def get_(id):
@@ -198,24 +457,22 @@ def get_(id):
     if not _id:
         return jsonify({"error": "invalid_id"}), 400
     
-    doc = mongo.db.aulas.find_one({"_id": _id}, {})
+    projection, err = AULA.projection(request.args, default="full")
+    if err:
+        return err
+    doc = mongo.db.aulas.find_one({"_id": _id}, AULA.fetch(projection))
     if not doc:
         return jsonify({"error": "not_found"}), 404
     
-    aula_doc = scrub(doc)
-    
-    # Converter ObjectIds para string (id_professor, id_categoria)
-    if aula_doc.get("id_professor"):
-        aula_doc["id_professor"] = str(aula_doc["id_professor"])
-    if aula_doc.get("id_categoria"):
-        aula_doc["id_categoria"] = str(aula_doc["id_categoria"])
+    aula_doc = AULA.one(doc, projection)
     
     # Enriquecer com dados do professor
+    refs = get_loader(mongo.db)
     if doc.get("id_professor"):
-        prof = mongo.db.professores.find_one({"_id": doc["id_professor"]}, {"nome": 1, "email": 1, "bio": 1, "historico_academico_profissional": 1})
+        prof = refs.load("professores", doc["id_professor"], {"nome": 1, "email": 1, "bio": 1, "historico_academico_profissional": 1})
         if prof:
             aula_doc["professor"] = {
-                "id": str(prof["_id"]),
+                "id": prof["_id"],
                 "nome": prof.get("nome"),
                 "email": prof.get("email"),
                 "bio": prof.get("bio"),
@@ -224,10 +481,10 @@ def get_(id):
     
     # Enriquecer com dados da categoria
     if doc.get("id_categoria"):
-        cat = mongo.db.categorias.find_one({"_id": doc["id_categoria"]}, {"nome": 1})
+        cat = refs.load("categorias", doc["id_categoria"], {"nome": 1})
         if cat:
             aula_doc["categoria"] = {
-                "id": str(cat["_id"]),
+                "id": cat["_id"],
                 "nome": cat.get("nome")
             }
     
@@ -248,7 +505,7 @@ def update(id):
         if not prof_id:
             return jsonify({"error": "invalid_professor_id"}), 400
         
-        professor = mongo.db.professores.find_one({"_id": prof_id})
+        professor = get_loader(mongo.db).load("professores", prof_id)
         if not professor:
             return jsonify({"error": "professor_not_found"}), 404
     
@@ -258,9 +515,12 @@ def update(id):
         if not cat_id:
             return jsonify({"error": "invalid_category_id"}), 400
         
-        categoria = mongo.db.categorias.find_one({"_id": cat_id})
+        categoria = get_loader(mongo.db).load("categorias", cat_id)
         if not categoria:
             return jsonify({"error": "category_not_found"}), 404
+        
+        # Salvar id_categoria como ObjectId (mesmo formato do create)
+        body["id_categoria"] = cat_id
     
     # Converter preço para decimal
     if body.get("preco_decimal"):
@@ -274,12 +534,28 @@ def update(id):
     
     body["updated_at"] = now()
     
-    r = mongo.db.aulas.update_one({"_id": _id}, {"$set": body})
-    if r.matched_count == 0:
-        return jsonify({"error": "not_found"}), 404
+    if body.get("id_categoria"):
+        # Recategorização: precisamos da categoria anterior para acertar os contadores
+        anterior = mongo.db.aulas.find_one_and_update(
+            {"_id": _id}, {"$set": body},
+            projection={"id_categoria": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if anterior is None:
+            return jsonify({"error": "not_found"}), 404
+        if anterior.get("id_categoria") != body["id_categoria"]:
+            bump_aulas_count(mongo.db, anterior.get("id_categoria"), -1)
+            bump_aulas_count(mongo.db, body["id_categoria"], 1)
+    else:
+        r = mongo.db.aulas.update_one({"_id": _id}, {"$set": body})
+        if r.matched_count == 0:
+            return jsonify({"error": "not_found"}), 404
+    if "titulo" in body:
+        SUGGEST.put("aula", _id, body["titulo"])
+    FACETS.clear()
     
     doc = mongo.db.aulas.find_one({"_id": _id}, {})
-    return jsonify(scrub(doc))
+    return jsonify(AULA.one(doc))
 
 @bp.delete("/<id>")
 def delete(id):
@@ -287,8 +563,14 @@ def delete(id):
     if not _id:
         return jsonify({"error": "invalid_id"}), 400
     
-    r = mongo.db.aulas.delete_one({"_id": _id})
-    return ("", 204) if r.deleted_count else (jsonify({"error": "not_found"}), 404)
+    removida = mongo.db.aulas.find_one_and_delete({"_id": _id}, projection={"id_categoria": 1})
+    if removida is None:
+        return jsonify({"error": "not_found"}), 404
+    
+    bump_aulas_count(mongo.db, removida.get("id_categoria"), -1)
+    SUGGEST.remove("aula", _id)
+    FACETS.clear()
+    return ("", 204)
 
 @bp.put("/<id>/status")
 def update_status(id):
@@ -308,8 +590,7 @@ def update_status(id):
         return jsonify({"error": "invalid_status", "valid_statuses": status_validos}), 400
     
     # Atualizar status da aula
-    r = mongo.db.aulas.update_one({"_id": _id}, {"$set": {"status": novo_status, "updated_at": now()}})
-    if r.matched_count == 0:
+    if set_aula_status(mongo.db, {"_id": _id}, novo_status) is None:
         return jsonify({"error": "not_found"}), 404
     
     # Registrar mudança de status
@@ -329,4 +610,4 @@ def update_status(id):
     mongo.db.status_aulas.insert_one(status_doc)
     
     doc = mongo.db.aulas.find_one({"_id": _id}, {})
-    return jsonify(scrub(doc))
+    return jsonify(AULA.one(doc))
@@ -61,9 +61,13 @@ def test_create_success(mock_mongo, client):
     assert data["titulo"] == "Cálculo I"
     assert data["status"] == "disponivel"
     assert data["id_professor"] == str(prof_id)
+    # Contador de aulas da categoria incrementado
+    mock_mongo.db.categorias.update_one.assert_called_once_with(
+        {"_id": cat_id, "aulas_count": {"$exists": True}}, {"$inc": {"aulas_count": 1}}
+    )
     
 @patch('app.aulas.routes.mongo')
-def test_list_success(mock_mongo, client):
+def test_list_success_find_strategy(mock_mongo, client):
     prof_id = ObjectId()
     cat_id = ObjectId()
     aula_id = ObjectId()
@@ -85,7 +89,7 @@ def test_list_success(mock_mongo, client):
     mock_cursor.skip.return_value = mock_cursor
     mock_cursor.limit.return_value = [aula_doc]  #Útimo método da cadeia, retorna uma lista iterável
     mock_mongo.db.aulas.find.return_value = mock_cursor #cursor fake
-    mock_mongo.db.aulas.count_documents.return_value = 1 #uma Aula
+    mock_mongo.db.aulas.estimated_document_count.return_value = 1 #uma Aula
     
     # Mock Professor
     mock_mongo.db.professores.find_one.return_value = {
@@ -101,7 +105,7 @@ def test_list_success(mock_mongo, client):
         "nome": "Ciências Exatas"
     }
     
-    response = client.get('/api/aulas/')
+    response = client.get('/api/aulas/?strategy=find')
     
     assert response.status_code == 200
     data = response.get_json()
@@ -112,6 +116,103 @@ def test_list_success(mock_mongo, client):
     assert "categoria" in data["data"][0]
     assert data["data"][0]["categoria"]["nome"] == "Ciências Exatas"
     
+@patch('app.aulas.routes.mongo')
+def test_list_success_lookup_strategy(mock_mongo, client):
+    prof_id = ObjectId()
+    cat_id = ObjectId()
+    
+    # Resultado da agregação: relações já vêm embutidas pelo $lookup
+    mock_mongo.db.aulas.aggregate.return_value = [{
+        "_id": ObjectId(),
+        "titulo": "Física Quântica",
+        "preco_decimal": 200.0,
+        "id_professor": prof_id,
+        "id_categoria": cat_id,
+        "status": "disponivel",
+        "_professor": [{"_id": prof_id, "nome": "Dr. Albert", "email": "albert@example.com"}],
+        "_categoria": [{"_id": cat_id, "nome": "Ciências Exatas"}],
+    }]
+    mock_mongo.db.aulas.estimated_document_count.return_value = 1
+    
+    response = client.get('/api/aulas/?sort=created_at&order=1&page=2&limit=5')
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    aula = data["data"][0]
+    assert aula["professor"]["nome"] == "Dr. Albert"
+    assert aula["categoria"]["nome"] == "Ciências Exatas"
+    assert "_professor" not in aula and "_categoria" not in aula
+    assert aula["id_professor"] == str(prof_id)
+    
+    # Uma única agregação, sem find_one por linha
+    pipeline = mock_mongo.db.aulas.aggregate.call_args[0][0]
+    # _id desempata a ordenação; uma linha a mais diz se há próxima página
+    assert pipeline[:4] == [{"$match": {}}, {"$sort": {"created_at": 1, "_id": 1}}, {"$skip": 5}, {"$limit": 6}]
+    assert data["next_cursor"] is None
+    assert [st["$lookup"]["from"] for st in pipeline if "$lookup" in st] == ["professores", "categorias"]
+    mock_mongo.db.aulas.find.assert_not_called()
+    mock_mongo.db.professores.find_one.assert_not_called()
+    
+    # ordenação sem índice (campo, _id) é recusada
+    response = client.get('/api/aulas/?sort=titulo')
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "invalid_sort", "valid": ["created_at"]}
+    
+@patch('app.search.text_search', return_value=True)   # servidor com índice de texto
+@patch('app.aulas.routes.mongo')
+def test_list_busca_texto_por_relevancia(mock_mongo, _text_search, client):
+    aula_id = ObjectId()
+    mock_mongo.db.aulas.aggregate.return_value = [
+        {"_id": ObjectId(), "titulo": "Cálculo I", "relevance": 3.5},
+        {"_id": aula_id, "titulo": "Cálculo II", "relevance": 1.25},
+    ]
+    mock_mongo.db.aulas.count_documents.return_value = 7
+
+    response = client.get('/api/aulas/?q=calculo&sort=relevance&limit=1&strategy=find')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["data"][0]["relevance"] == 3.5
+    text = {"$text": {"$search": "calculo", "$language": "portuguese"}}
+    # relevância sempre vai pela agregação (o textScore não existe num find)
+    pipeline = mock_mongo.db.aulas.aggregate.call_args[0][0]
+    assert pipeline[:4] == [
+        {"$match": text},
+        {"$addFields": {"relevance": {"$meta": "textScore"}}},
+        {"$sort": {"relevance": -1, "_id": -1}},
+        {"$skip": 0},
+    ]
+    mock_mongo.db.aulas.count_documents.assert_called_once_with(text)
+
+    # a próxima página continua do score + _id da última linha
+    response = client.get(f'/api/aulas/?q=calculo&sort=relevance&cursor={data["next_cursor"]}')
+    assert response.status_code == 200
+    pipeline = mock_mongo.db.aulas.aggregate.call_args[0][0]
+    assert pipeline[0] == {"$match": text}
+    assert pipeline[2]["$match"]["$or"][0] == {"relevance": {"$lt": 3.5}}
+    assert not any("$skip" in st for st in pipeline)
+
+@patch('app.search.text_search', return_value=True)   # servidor com índice de texto
+@patch('app.aulas.routes.mongo')
+def test_list_busca_modos(mock_mongo, _text_search, client):
+    mock_mongo.db.aulas.aggregate.return_value = []
+    mock_mongo.db.aulas.count_documents.return_value = 0
+
+    response = client.get('/api/aulas/?q=calc&mode=substring')
+    assert response.status_code == 200
+    assert mock_mongo.db.aulas.aggregate.call_args[0][0][0] == {"$match": {"$or": [
+        {"titulo": {"$regex": "calc", "$options": "i"}},
+        {"descricao_aula": {"$regex": "calc", "$options": "i"}},
+    ]}}
+
+    # relevância só existe na busca por texto, e só decrescente
+    assert client.get('/api/aulas/?q=calc&mode=substring&sort=relevance').status_code == 400
+    assert client.get('/api/aulas/?sort=relevance').status_code == 400
+    response = client.get('/api/aulas/?q=calc&sort=relevance&order=1')
+    assert response.get_json() == {"error": "invalid_order", "valid": [-1]}
+    response = client.get('/api/aulas/?q=calc&mode=fuzzy')
+    assert response.get_json() == {"error": "invalid_mode", "valid": ["text", "substring"]}
+
 @patch('app.aulas.routes.mongo')
 def test_get_by_id_success(mock_mongo, client):
     prof_id = ObjectId()
@@ -190,24 +291,49 @@ def test_update_success(mock_mongo, client):
 def test_delete_success(mock_mongo, client):
     aula_id = ObjectId()
     
-    # Mock delete_one
-    mock_result = MagicMock()
-    mock_result.deleted_count = 1
-    mock_mongo.db.aulas.delete_one.return_value = mock_result
+    cat_id = ObjectId()
+    
+    # Mock find_one_and_delete (devolve a categoria da aula removida)
+    mock_mongo.db.aulas.find_one_and_delete.return_value = {"_id": aula_id, "id_categoria": cat_id}
     
     response = client.delete(f'/api/aulas/{str(aula_id)}')
     
     assert response.status_code == 204
     assert response.data == b''
+    # Contador da categoria decrementado
+    mock_mongo.db.categorias.update_one.assert_called_once_with(
+        {"_id": cat_id, "aulas_count": {"$exists": True}}, {"$inc": {"aulas_count": -1}}
+    )
+
+@patch('app.aulas.routes.mongo')
+def test_update_recategoriza_ajusta_contadores(mock_mongo, client):
+    aula_id = ObjectId()
+    antiga = ObjectId()
+    nova = ObjectId()
+    
+    mock_mongo.db.categorias.find_one.return_value = {"_id": nova, "nome": "Nova"}
+    mock_mongo.db.aulas.find_one_and_update.return_value = {"_id": aula_id, "id_categoria": antiga}
+    mock_mongo.db.aulas.find_one.return_value = {
+        "_id": aula_id,
+        "titulo": "Cálculo",
+        "id_categoria": str(nova),
+        "status": "disponivel"
+    }
+    
+    response = client.put(f'/api/aulas/{str(aula_id)}', json={"id_categoria": str(nova)})
+    
+    assert response.status_code == 200
+    set_body = mock_mongo.db.aulas.find_one_and_update.call_args[0][1]["$set"]
+    assert set_body["id_categoria"] == nova
+    incs = [(c[0][0]["_id"], c[0][1]["$inc"]["aulas_count"]) for c in mock_mongo.db.categorias.update_one.call_args_list]
+    assert incs == [(antiga, -1), (nova, 1)]
 
 @patch('app.aulas.routes.mongo')
 def test_update_status_success(mock_mongo, client):
     aula_id = ObjectId()
     
-    # Mock update_one
-    mock_result = MagicMock()
-    mock_result.matched_count = 1
-    mock_mongo.db.aulas.update_one.return_value = mock_result
+    # Mock find_one_and_update (status anterior)
+    mock_mongo.db.aulas.find_one_and_update.return_value = {"_id": aula_id, "status": "disponivel"}
     
     # Mock insert_one (histórico de status)
     mock_mongo.db.status_aulas.insert_one.return_value = MagicMock(inserted_id=ObjectId())
@@ -226,4 +352,94 @@ def test_update_status_success(mock_mongo, client):
     
     assert response.status_code == 200
     data = response.get_json()
-    assert data["status"] == "em andamento"
\ No newline at end of file
+    assert data["status"] == "em andamento"
+@patch('app.aulas.routes.mongo')
+def test_search_ordena_antes_do_facet(mock_mongo, client):
+    from app.aulas.routes import FACETS
+    FACETS.clear()
+    mock_mongo.db.aulas.aggregate.return_value = iter([])
+    assert client.get("/api/aulas/search?status=disponivel").status_code == 200
+    pipeline = mock_mongo.db.aulas.aggregate.call_args[0][0]
+    # $match + $sort no começo (índice (created_at, _id)); nada de $sort dentro do $facet
+    assert pipeline[:2] == [{"$match": {"status": "disponivel"}}, {"$sort": {"created_at": -1, "_id": -1}}]
+    assert list(pipeline[2]) == ["$facet"]
+    assert all("$sort" not in stage for stage in pipeline[2]["$facet"]["data"])
+
+
+def test_mudanca_de_status_invalida_as_facetas():
+    import mongomock
+    from app.aulas.routes import FACETS, set_aula_status
+    db = mongomock.MongoClient().db
+    aula_id = db.aulas.insert_one({"status": "disponivel"}).inserted_id
+    FACETS.set("k", {"data": []}, 60)
+
+    assert set_aula_status(db, {"_id": aula_id, "status": "agendada"}, "concluida") is None
+    assert FACETS.get("k") is not None            # nada mudou: o cache fica
+    assert set_aula_status(db, {"_id": aula_id, "status": "disponivel"}, "agendada")["status"] == "disponivel"
+    assert FACETS.get("k") is None and db.aulas.find_one({"_id": aula_id})["status"] == "agendada"
+
+
+def test_search_facetas_numa_agregacao_com_cache(client):
+    from app.extensions import mongo
+    from app.aulas.routes import FACETS
+    db = mongo.db
+    for coll in ("aulas", "categorias", "professores"):
+        db[coll].delete_many({})
+    FACETS.clear()
+    cat = db.categorias.insert_one({"nome": "Exatas"}).inserted_id
+    prof = db.professores.insert_one({"nome": "Ana"}).inserted_id
+    for i, preco in enumerate([30, 75, 120, 900, None]):
+        aula = {"titulo": f"Aula {i}", "id_categoria": cat, "id_professor": prof,
+                "status": "cancelada" if i == 3 else "disponivel", "created_at": datetime(2025, 1, i + 1)}
+        if preco is not None:
+            aula["preco_decimal"] = preco
+        db.aulas.insert_one(aula)
+
+    response = client.get("/api/aulas/search?limit=2")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [a["titulo"] for a in data["data"]] == ["Aula 4", "Aula 3"]
+    assert data["data"][0]["professor"]["nome"] == "Ana"
+    assert data["total"] == 5 and data["next_cursor"]
+    facets = data["facets"]
+    assert facets["categorias"] == [{"id": str(cat), "nome": "Exatas", "count": 5}]
+    assert facets["professores"] == [{"id": str(prof), "nome": "Ana", "count": 5}]
+    assert facets["status"] == [{"valor": "disponivel", "count": 4}, {"valor": "cancelada", "count": 1}]
+    assert [(b["min"], b["max"], b["count"]) for b in facets["preco"]] == [
+        (0, 50, 1), (50, 100, 1), (100, 200, 1), (500, None, 1), (None, None, 1)]
+
+    # mesma consulta (parâmetros em outra ordem): vem do cache
+    db.aulas.insert_one({"titulo": "Fora do cache", "id_categoria": cat, "created_at": datetime(2025, 2, 1)})
+    assert client.get("/api/aulas/search?limit=2&page=1").get_json()["total"] == 5
+    # filtros mudam a chave; a faixa de preço vira filtro em preco_decimal
+    data = client.get("/api/aulas/search?preco_min=50&preco_max=200").get_json()
+    assert data["total"] == 2 and [b["min"] for b in data["facets"]["preco"]] == [50, 100]
+
+    # escrita em aulas invalida o cache
+    client.put(f"/api/aulas/{data['data'][0]['_id']}/status", json={"status": "concluida"})
+    assert client.get("/api/aulas/search?limit=2").get_json()["total"] == 6
+
+
+def test_busca_sem_text_no_banco_cai_na_substring(client):
+    # DB_MODE=mock: o mongomock não tem $text; ?q= responde pela regex em vez de 500
+    from app.extensions import mongo
+    from app.aulas.routes import FACETS
+    db = mongo.db
+    for coll in ("aulas", "categorias"):
+        db[coll].delete_many({})
+    FACETS.clear()
+    cat = db.categorias.insert_one({"nome": "Exatas"}).inserted_id
+    db.aulas.insert_many([
+        {"titulo": "Cálculo I", "id_categoria": cat, "created_at": datetime(2025, 1, 1)},
+        {"titulo": "Física", "descricao_aula": "Mecânica com cálculo", "created_at": datetime(2025, 1, 2)},
+        {"titulo": "C++ (básico)", "id_categoria": cat, "created_at": datetime(2025, 1, 3)},
+    ])
+
+    response = client.get("/api/aulas/?q=cálculo")
+    assert response.status_code == 200
+    assert [a["titulo"] for a in response.get_json()["data"]] == ["Física", "Cálculo I"]
+    response = client.get("/api/aulas/search?q=c%2B%2B (")      # termo literal, não regex
+    assert response.status_code == 200 and response.get_json()["total"] == 1
+    response = client.get(f"/api/categorias/{cat}/aulas?q=CÁLCULO&mode=text")
+    assert response.status_code == 200
+    assert [a["titulo"] for a in response.get_json()["data"]] == ["Cálculo I"]
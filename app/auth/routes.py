@@ -5,9 +5,8 @@ from flask_jwt_extended import (
     create_access_token, jwt_required, get_jwt_identity, get_jwt
 )
 from app.extensions import mongo
-from app.utils import scrub
+from app.serializers import ALUNO, PROFESSOR
 import bcrypt
-import requests
 
 bp = Blueprint("auth", __name__)
 
@@ -23,7 +22,7 @@ def test_db():
         return jsonify({
             "msg": "Conexão com banco OK",
             "alunos_count": alunos_count,
-            "aluno_exemplo": scrub(aluno_exemplo) if aluno_exemplo else None
+            "aluno_exemplo": ALUNO.one(aluno_exemplo) if aluno_exemplo else None
         }), 200
     except Exception as e:
         return jsonify({"msg": f"Erro no banco: {str(e)}"}), 500
@@ -85,7 +84,7 @@ def login():
                 identity=str(aluno["_id"]),
                 additional_claims={"email": aluno["email"], "nome": aluno["nome"], "tipo": "aluno"},
             )
-            return jsonify({"access_token": token, "user": scrub(aluno), "tipo": "aluno"}), 200
+            return jsonify({"access_token": token, "user": ALUNO.one(aluno), "tipo": "aluno"}), 200
 
         # Tenta professor
         professor = mongo.db.professores.find_one({"email": email})
@@ -94,7 +93,7 @@ def login():
                 identity=str(professor["_id"]),
                 additional_claims={"email": professor["email"], "nome": professor["nome"], "tipo": "professor"},
             )
-            return jsonify({"access_token": token, "user": scrub(professor), "tipo": "professor"}), 200
+            return jsonify({"access_token": token, "user": PROFESSOR.one(professor), "tipo": "professor"}), 200
 
         return jsonify({"msg": "Email ou senha inválidos"}), 401
     except Exception as e:
@@ -125,6 +124,8 @@ def checa_cep(cep):
     if len(digitos_cep) != 8:
         return jsonify({"error": "CEP inválido", "msg": "CEP deve conter 8 dígitos"}), 400
 
+    import requests  # só aqui; não pesa no boot dos workers
+
     try:
         resp = requests.get(f"https://viacep.com.br/ws/{digitos_cep}/json/", timeout=5)
     except requests.RequestException:
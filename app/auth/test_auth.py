@@ -9,7 +9,7 @@ from flask_jwt_extended import create_access_token
 def app():
     app = create_app()
     app.config['TESTING'] = True
-    # Garante que scrub remova senha_hash durante testes
+    # Garante que o serializador remova senha_hash durante testes
     app.config['SHOW_HASH'] = False
     return app
 
@@ -41,7 +41,7 @@ def test_auth_test_db_success(mock_mongo, client):
     assert data['alunos_count'] == 5
     assert data['aluno_exemplo'] is not None
     assert data['aluno_exemplo']['nome'] == 'Aluno Exemplo'
-    # senha_hash deve ser removido por scrub
+    # senha_hash deve ser removido pelo serializador
     assert 'senha_hash' not in data['aluno_exemplo']
 
 @patch('app.auth.routes.bcrypt')
@@ -108,7 +108,7 @@ def test_verificar_success(app, client):
     assert data['tipo'] == 'aluno'
 
 
-@patch('app.auth.routes.requests.get')
+@patch('requests.get')
 def test_checa_cep_success(mock_get, client):
     # ViaCEP OK
     fake_resp = MagicMock()
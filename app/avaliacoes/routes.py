@@ -1,11 +1,73 @@
 from flask import Blueprint, request, jsonify
 from pymongo.errors import DuplicateKeyError
+from pymongo import IndexModel
 from ..extensions import mongo
-from ..utils import oid, now, scrub
+from ..utils import oid, now
+from ..serializers import AVALIACAO, ALUNO_PUBLICO, PROFESSOR, PROFESSOR_PUBLICO, AULA
+from ..loader import get_loader
+from ..pagination import page_args, fetch_page, count_total, debug_plan
+import re
 
 bp = Blueprint("avaliacoes", __name__)
 
 AVALIACAO_FIELDS = {"id_aluno", "id_aula", "id_prof", "nota", "texto"}
+SORT_KEYS = {"created_at": [("created_at", -1), ("_id", -1)]}
+INDEXES = {"avaliacoes": [
+    *(IndexModel(keys) for keys in SORT_KEYS.values()),
+    # também serve as buscas só por id_aluno (prefixo)
+    IndexModel([("id_aluno", 1), ("id_aula", 1)], unique=True),
+    IndexModel([("id_prof", 1), ("created_at", -1), ("_id", -1)]),
+    IndexModel("id_aula"),
+]}
+
+# Relações expansíveis: nome -> (coleção, campo de referência, campos padrão na listagem, serializador)
+# As listagens são abertas: alunos e professores saem pelo perfil público, cuja lista
+# branca (`selects`) também limita os campos de `rel.campo`.
+EXPAND_RELATIONS = {
+    "aluno": ("alunos", "id_aluno", ["nome"], ALUNO_PUBLICO),
+    "professor": ("professores", "id_prof", ["nome"], PROFESSOR_PUBLICO),
+    "aula": ("aulas", "id_aula", ["titulo", "descricao_aula"], AULA),
+}
+
+EXPAND_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def parse_expand(raw):
+    """
+    Interpreta ?expand=aluno,professor.nome,... em {relação: campos | None}.
+    - `aluno` expande com os campos padrão (None);
+    - `aluno.nome` restringe a relação aos campos pedidos (projeção no Mongo);
+    - sem o parâmetro, todas as relações são expandidas (comportamento anterior);
+    - `expand=` vazio não expande nada.
+    Retorna (expand, erro).
+    """
+    if raw is None:
+        return {rel: None for rel in EXPAND_RELATIONS}, None
+
+    expand = {}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        rel, _, field = item.partition(".")
+        if rel not in EXPAND_RELATIONS:
+            return None, (jsonify({"error": "invalid_expand", "valid": list(EXPAND_RELATIONS)}), 400)
+        if not field:
+            # relação pedida inteira: prevalece sobre `rel.campo`
+            expand[rel] = None
+            continue
+        if not EXPAND_FIELD_RE.match(field) or not EXPAND_RELATIONS[rel][3].selects(field):
+            return None, (jsonify({"error": "invalid_expand_field", "field": item}), 400)
+        if rel in expand and expand[rel] is None:
+            continue
+        expand.setdefault(rel, []).append(field)
+    return expand, None
+
+
+def relation_summary(doc, fields, serializer):
+    """Relação embutida na listagem: id e os campos pedidos, já passados pelo serializador."""
+    out = serializer.one(doc)
+    return {"id": doc["_id"], **{f: out.get(f) for f in fields}}
 
 @bp.post("/")
 def create():
@@ -21,7 +83,8 @@ def create():
     if not aluno_id:
         return jsonify({"error": "invalid_aluno_id"}), 400
     
-    aluno = mongo.db.alunos.find_one({"_id": aluno_id})
+    refs = get_loader(mongo.db)
+    aluno = refs.load("alunos", aluno_id)
     if not aluno:
         return jsonify({"error": "aluno_not_found"}), 404
     
@@ -30,7 +93,7 @@ def create():
     if not prof_id:
         return jsonify({"error": "invalid_professor_id"}), 400
     
-    professor = mongo.db.professores.find_one({"_id": prof_id})
+    professor = refs.load("professores", prof_id)
     if not professor:
         return jsonify({"error": "professor_not_found"}), 404
     
@@ -39,7 +102,7 @@ def create():
     if not aula_id:
         return jsonify({"error": "invalid_aula_id"}), 400
     
-    aula = mongo.db.aulas.find_one({"_id": aula_id})
+    aula = refs.load("aulas", aula_id)
     if not aula:
         return jsonify({"error": "aula_not_found"}), 404
     
@@ -82,15 +145,7 @@ def create():
         return jsonify({"error": "creation_failed", "details": str(e)}), 500
     
     doc = mongo.db.avaliacoes.find_one({"_id": res.inserted_id}, {})
-    avaliacao_doc = scrub(doc)
-    
-    # Converter ObjectIds para string (id_aluno, id_prof, id_aula)
-    if avaliacao_doc.get("id_aluno"):
-        avaliacao_doc["id_aluno"] = str(avaliacao_doc["id_aluno"])
-    if avaliacao_doc.get("id_prof"):
-        avaliacao_doc["id_prof"] = str(avaliacao_doc["id_prof"])
-    if avaliacao_doc.get("id_aula"):
-        avaliacao_doc["id_aula"] = str(avaliacao_doc["id_aula"])
+    avaliacao_doc = AVALIACAO.one(doc)
     
     return jsonify(avaliacao_doc), 201
 
@@ -103,8 +158,12 @@ def list_():
     nota_max = request.args.get("nota_max")
     page = int(request.args.get("page", 1))
     limit = int(request.args.get("limit", 10))
-    order = int(request.args.get("order", -1))
-    sort = request.args.get("sort", "created_at")
+    sort, order, position, err = page_args(request.args, SORT_KEYS)
+    if err:
+        return err
+    expand, err = parse_expand(request.args.get("expand"))
+    if err:
+        return err
     
     filt = {}
     
@@ -138,58 +197,37 @@ def list_():
                 return jsonify({"error": "invalid_nota_max_format"}), 400
         filt["nota"] = nota_filtro
     
-    cur = (mongo.db.avaliacoes.find(filt, {})
-           .sort(sort, order)
-           .skip((page-1)*limit)
-           .limit(limit))
-    total = mongo.db.avaliacoes.count_documents(filt)
-    
-    # Enriquecer dados
-    avaliacoes = []
-    for avaliacao in cur:
-        avaliacao_doc = scrub(avaliacao)
-        
-        # Converter ObjectIds para string (id_aluno, id_prof, id_aula)
-        if avaliacao_doc.get("id_aluno"):
-            avaliacao_doc["id_aluno"] = str(avaliacao_doc["id_aluno"])
-        if avaliacao_doc.get("id_prof"):
-            avaliacao_doc["id_prof"] = str(avaliacao_doc["id_prof"])
-        if avaliacao_doc.get("id_aula"):
-            avaliacao_doc["id_aula"] = str(avaliacao_doc["id_aula"])
-        
-        # Buscar dados do aluno
-        if avaliacao.get("id_aluno"):
-            aluno = mongo.db.alunos.find_one({"_id": avaliacao["id_aluno"]}, {"nome": 1, "email": 1})
-            if aluno:
-                avaliacao_doc["aluno"] = {
-                    "id": str(aluno["_id"]),
-                    "nome": aluno.get("nome"),
-                    "email": aluno.get("email")
-                }
-        
-        # Buscar dados do professor
-        if avaliacao.get("id_prof"):
-            prof = mongo.db.professores.find_one({"_id": avaliacao["id_prof"]}, {"nome": 1, "email": 1})
-            if prof:
-                avaliacao_doc["professor"] = {
-                    "id": str(prof["_id"]),
-                    "nome": prof.get("nome"),
-                    "email": prof.get("email")
-                }
-        
-        # Buscar dados da aula
-        if avaliacao.get("id_aula"):
-            aula = mongo.db.aulas.find_one({"_id": avaliacao["id_aula"]}, {"titulo": 1, "descricao_aula": 1})
-            if aula:
-                avaliacao_doc["aula"] = {
-                    "id": str(aula["_id"]),
-                    "titulo": aula.get("titulo"),
-                    "descricao_aula": aula.get("descricao_aula")
-                }
-        
-        avaliacoes.append(avaliacao_doc)
-    
-    return jsonify({"data": avaliacoes, "total": total, "page": page, "limit": limit})
+    projection, err = AVALIACAO.projection(request.args)
+    if err:
+        return err
+    avaliacoes_raw, next_cursor = fetch_page(
+        mongo.db.avaliacoes, filt, AVALIACAO.fetch(projection), sort, order, limit, position, page
+    )
+    total = count_total(mongo.db.avaliacoes, filt, request.args)
+    
+    # Enriquecer dados: um $in por relação expandida para a página inteira
+    refs = get_loader(mongo.db)
+    relacionados = {}
+    for rel, fields in expand.items():
+        collection, ref, default_fields, serializer = EXPAND_RELATIONS[rel]
+        fields = fields or default_fields
+        docs = refs.load_many(
+            collection,
+            [a.get(ref) for a in avaliacoes_raw],
+            {f: 1 for f in fields},
+        )
+        relacionados[rel] = (ref, fields, serializer, docs)
+    
+    avaliacoes = AVALIACAO.many(avaliacoes_raw, projection)
+    for avaliacao_doc in avaliacoes:
+        for rel, (ref, fields, serializer, docs) in relacionados.items():
+            rel_doc = docs.get(str(avaliacao_doc[ref])) if avaliacao_doc.get(ref) else None
+            if rel_doc:
+                avaliacao_doc[rel] = relation_summary(rel_doc, fields, serializer)
+    
+    return jsonify({"data": avaliacoes, "total": total, "page": page, "limit": limit,
+                    "next_cursor": next_cursor,
+                    **debug_plan(mongo.db.avaliacoes, filt, sort, order, limit, position, request.args)})
 
 @bp.get("/<id>")
 def get_(id):
@@ -197,35 +235,29 @@ def get_(id):
     if not _id:
         return jsonify({"error": "invalid_id"}), 400
     
-    doc = mongo.db.avaliacoes.find_one({"_id": _id}, {})
+    expand, err = parse_expand(request.args.get("expand"))
+    if err:
+        return err
+    
+    projection, err = AVALIACAO.projection(request.args, default="full")
+    if err:
+        return err
+    doc = mongo.db.avaliacoes.find_one({"_id": _id}, AVALIACAO.fetch(projection))
     if not doc:
         return jsonify({"error": "not_found"}), 404
     
-    avaliacao_doc = scrub(doc)
-    
-    # Converter ObjectIds para string (id_aluno, id_prof, id_aula)
-    if avaliacao_doc.get("id_aluno"):
-        avaliacao_doc["id_aluno"] = str(avaliacao_doc["id_aluno"])
-    if avaliacao_doc.get("id_prof"):
-        avaliacao_doc["id_prof"] = str(avaliacao_doc["id_prof"])
-    if avaliacao_doc.get("id_aula"):
-        avaliacao_doc["id_aula"] = str(avaliacao_doc["id_aula"])
+    avaliacao_doc = AVALIACAO.one(doc, projection)
     
-    # Enriquecer com dados completos
-    if doc.get("id_aluno"):
-        aluno = mongo.db.alunos.find_one({"_id": doc["id_aluno"]})
-        if aluno:
-            avaliacao_doc["aluno"] = scrub(aluno)
-    
-    if doc.get("id_prof"):
-        prof = mongo.db.professores.find_one({"_id": doc["id_prof"]})
-        if prof:
-            avaliacao_doc["professor"] = scrub(prof)
-    
-    if doc.get("id_aula"):
-        aula = mongo.db.aulas.find_one({"_id": doc["id_aula"]})
-        if aula:
-            avaliacao_doc["aula"] = scrub(aula)
+    # Enriquecer com as relações pedidas: representação completa ou só os campos de `rel.campo`
+    refs = get_loader(mongo.db)
+    for rel, fields in expand.items():
+        collection, ref, _, serializer = EXPAND_RELATIONS[rel]
+        if not doc.get(ref):
+            continue
+        rel_proj = {f: 1 for f in fields} if fields else serializer.full()
+        rel_doc = refs.load(collection, doc[ref], rel_proj)
+        if rel_doc:
+            avaliacao_doc[rel] = serializer.one(rel_doc)
     
     return jsonify(avaliacao_doc)
 
@@ -258,15 +290,7 @@ def update(id):
         return jsonify({"error": "not_found"}), 404
     
     doc = mongo.db.avaliacoes.find_one({"_id": _id}, {})
-    avaliacao_doc = scrub(doc)
-    
-    # Converter ObjectIds para string (id_aluno, id_prof, id_aula)
-    if avaliacao_doc.get("id_aluno"):
-        avaliacao_doc["id_aluno"] = str(avaliacao_doc["id_aluno"])
-    if avaliacao_doc.get("id_prof"):
-        avaliacao_doc["id_prof"] = str(avaliacao_doc["id_prof"])
-    if avaliacao_doc.get("id_aula"):
-        avaliacao_doc["id_aula"] = str(avaliacao_doc["id_aula"])
+    avaliacao_doc = AVALIACAO.one(doc)
     
     return jsonify(avaliacao_doc)
 
@@ -286,7 +310,7 @@ def get_professor_stats(professor_id):
         return jsonify({"error": "invalid_professor_id"}), 400
     
     # Verificar se professor existe
-    professor = mongo.db.professores.find_one({"_id": prof_id})
+    professor = get_loader(mongo.db).load("professores", prof_id)
     if not professor:
         return jsonify({"error": "professor_not_found"}), 404
     
@@ -306,7 +330,7 @@ def get_professor_stats(professor_id):
     
     if not stats:
         return jsonify({
-            "professor": scrub(professor),
+            "professor": PROFESSOR.one(professor),
             "total_avaliacoes": 0,
             "nota_media": 0,
             "nota_min": 0,
@@ -315,7 +339,7 @@ def get_professor_stats(professor_id):
     
     result = stats[0]
     result.pop("_id", None)
-    result["professor"] = scrub(professor)
+    result["professor"] = PROFESSOR.one(professor)
     
     return jsonify(result)
 
@@ -326,7 +350,7 @@ def get_aula_stats(aula_id):
         return jsonify({"error": "invalid_aula_id"}), 400
     
     # Verificar se aula existe
-    aula = mongo.db.aulas.find_one({"_id": aula_obj_id})
+    aula = get_loader(mongo.db).load("aulas", aula_obj_id)
     if not aula:
         return jsonify({"error": "aula_not_found"}), 404
     
@@ -346,7 +370,7 @@ def get_aula_stats(aula_id):
     
     if not stats:
         return jsonify({
-            "aula": scrub(aula),
+            "aula": AULA.one(aula),
             "total_avaliacoes": 0,
             "nota_media": 0,
             "nota_min": 0,
@@ -355,6 +379,6 @@ def get_aula_stats(aula_id):
     
     result = stats[0]
     result.pop("_id", None)
-    result["aula"] = scrub(aula)
+    result["aula"] = AULA.one(aula)
     
     return jsonify(result)
@@ -107,28 +107,28 @@ def test_list_success(mock_mongo, client):
     mock_cursor.skip.return_value = mock_cursor
     mock_cursor.limit.return_value = [avaliacao_doc]
     mock_mongo.db.avaliacoes.find.return_value = mock_cursor
-    mock_mongo.db.avaliacoes.count_documents.return_value = 1
+    mock_mongo.db.avaliacoes.estimated_document_count.return_value = 1
     
-    # Mock aluno (só nome e email)
-    mock_mongo.db.alunos.find_one.return_value = {
+    # Mock aluno (só nome e email) - carregado em lote via $in
+    mock_mongo.db.alunos.find.return_value = [{
         "_id": aluno_id,
         "nome": "Pedro Costa",
         "email": "pedro@example.com"
-    }
+    }]
     
     # Mock professor (só nome e email)
-    mock_mongo.db.professores.find_one.return_value = {
+    mock_mongo.db.professores.find.return_value = [{
         "_id": prof_id,
         "nome": "Prof. Ana",
         "email": "ana@example.com"
-    }
+    }]
     
     # Mock aula (título e descrição)
-    mock_mongo.db.aulas.find_one.return_value = {
+    mock_mongo.db.aulas.find.return_value = [{
         "_id": aula_id,
         "titulo": "Física Quântica",
         "descricao_aula": "Introdução à mecânica quântica"
-    }
+    }]
     
     response = client.get('/api/avaliacoes/')
     
@@ -144,6 +144,96 @@ def test_list_success(mock_mongo, client):
     assert "aula" in data["data"][0]
     assert data["data"][0]["aula"]["titulo"] == "Física Quântica"
     
+@patch('app.avaliacoes.routes.mongo')
+def test_list_expand_only_aluno_nome(mock_mongo, client):
+    aluno_id = ObjectId()
+    
+    mock_cursor = MagicMock()
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.skip.return_value = mock_cursor
+    mock_cursor.limit.return_value = [
+        {"_id": ObjectId(), "id_aluno": aluno_id, "id_prof": ObjectId(), "id_aula": ObjectId(), "nota": 9.0},
+        {"_id": ObjectId(), "id_aluno": aluno_id, "id_prof": ObjectId(), "id_aula": ObjectId(), "nota": 7.0},
+    ]
+    mock_mongo.db.avaliacoes.find.return_value = mock_cursor
+    mock_mongo.db.avaliacoes.estimated_document_count.return_value = 2
+    mock_mongo.db.alunos.find.return_value = [{"_id": aluno_id, "nome": "Pedro Costa"}]
+    
+    response = client.get('/api/avaliacoes/?expand=aluno.nome')
+    
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert data[0]["aluno"] == {"id": str(aluno_id), "nome": "Pedro Costa"}
+    assert "professor" not in data[0] and "aula" not in data[0]
+    # Uma única consulta para a página, projetada só no campo pedido
+    mock_mongo.db.alunos.find.assert_called_once_with({"_id": {"$in": [aluno_id]}}, {"nome": 1})
+    mock_mongo.db.professores.find.assert_not_called()
+    mock_mongo.db.aulas.find.assert_not_called()
+
+@patch('app.avaliacoes.routes.mongo')
+def test_list_expand_invalido(mock_mongo, client):
+    response = client.get('/api/avaliacoes/?expand=aluno,senha')
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "invalid_expand"
+    
+    response = client.get('/api/avaliacoes/?expand=aluno.senha_hash')
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "invalid_expand_field"
+
+    # só a lista branca do perfil público: contato e campos internos ficam de fora
+    for field in ("aluno.cpf", "aluno.telefone", "aluno.email", "professor.saldo", "professor.busca", "aula.foo"):
+        response = client.get(f'/api/avaliacoes/?expand=aluno.nome,{field}')
+        assert response.status_code == 400, field
+        assert response.get_json() == {"error": "invalid_expand_field", "field": field}
+    mock_mongo.db.avaliacoes.find.assert_not_called()
+
+@patch('app.avaliacoes.routes.mongo')
+def test_list_expand_passa_pelo_serializador(mock_mongo, client):
+    aluno_id, prof_id = ObjectId(), ObjectId()
+    mock_cursor = MagicMock()
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.skip.return_value = mock_cursor
+    mock_cursor.limit.return_value = [{"_id": ObjectId(), "id_aluno": aluno_id, "id_prof": prof_id, "nota": 9.0}]
+    mock_mongo.db.avaliacoes.find.return_value = mock_cursor
+    mock_mongo.db.avaliacoes.estimated_document_count.return_value = 1
+    # mesmo que o banco devolva mais do que a projeção, a resposta só leva o que é público
+    mock_mongo.db.alunos.find.return_value = [{"_id": aluno_id, "nome": "Pedro", "cpf": "123", "email": "p@x.com"}]
+    mock_mongo.db.professores.find.return_value = [{"_id": prof_id, "nome": "Ana", "headline": "Física", "saldo": 10}]
+
+    response = client.get('/api/avaliacoes/?expand=aluno,professor.headline')
+    assert response.status_code == 200
+    data = response.get_json()["data"][0]
+    assert data["aluno"] == {"id": str(aluno_id), "nome": "Pedro"}
+    assert data["professor"] == {"id": str(prof_id), "headline": "Física"}
+    mock_mongo.db.alunos.find.assert_called_once_with({"_id": {"$in": [aluno_id]}}, {"nome": 1})
+
+@patch('app.avaliacoes.routes.mongo')
+def test_get_by_id_expand_professor(mock_mongo, client):
+    avaliacao_id = ObjectId()
+    prof_id = ObjectId()
+    mock_mongo.db.avaliacoes.find_one.return_value = {
+        "_id": avaliacao_id,
+        "id_aluno": ObjectId(),
+        "id_prof": prof_id,
+        "id_aula": ObjectId(),
+        "nota": 10.0
+    }
+    mock_mongo.db.professores.find_one.return_value = {"_id": prof_id, "nome": "Dr. Roberto"}
+    
+    response = client.get(f'/api/avaliacoes/{str(avaliacao_id)}?expand=professor')
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["professor"]["nome"] == "Dr. Roberto"
+    assert "aluno" not in data and "aula" not in data
+    # representação completa: campos ocultos ficam de fora já na projeção
+    mock_mongo.db.professores.find_one.assert_called_once_with(
+        {"_id": prof_id},
+        {"busca": 0, "google_tokens": 0, "cpf": 0, "telefone": 0, "email": 0, "senha": 0, "senha_hash": 0},
+    )
+    mock_mongo.db.alunos.find_one.assert_not_called()
+    mock_mongo.db.aulas.find_one.assert_not_called()
+    
 @patch('app.avaliacoes.routes.mongo')
 def test_get_by_id_success(mock_mongo, client):
     aluno_id = ObjectId()
@@ -167,7 +257,8 @@ def test_get_by_id_success(mock_mongo, client):
         "nome": "Lucas Oliveira",
         "email": "lucas@example.com",
         "telefone": "11999999999",
-        "cpf": "12345678900"
+        "cpf": "12345678900",
+        "bio": "Estudante de engenharia"
     }
     
     # Mock professor COMPLETO
@@ -195,7 +286,8 @@ def test_get_by_id_success(mock_mongo, client):
     assert data["_id"] == str(avaliacao_id)
     assert data["nota"] == 10.0
     assert "aluno" in data
-    assert data["aluno"]["cpf"] == "12345678900"  # Campo extra que não vem no list
+    assert data["aluno"]["bio"] == "Estudante de engenharia"  # Campo extra que não vem no list
+    assert not {"cpf", "telefone", "email"} & data["aluno"].keys()  # perfil público
     assert "professor" in data
     assert data["professor"]["especialidade"] == "Cálculo"
     assert "aula" in data
@@ -1,12 +1,41 @@
+import click
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from pymongo.errors import DuplicateKeyError
+from pymongo import IndexModel
 from ..extensions import mongo
-from ..utils import oid, now, scrub
+from ..indexes import db_cli
+from ..utils import oid, now
+from ..serializers import AULA, CATEGORIA
+from ..aulas.routes import aulas_page, aulas_pipeline, aulas_list_payload, list_strategy, search_args, FACETS
+from ..search import SUGGEST
+from ..pagination import page_args, fetch_page, count_total, debug_plan
 
 bp = Blueprint("categorias", __name__)
 
 CATEGORIA_FIELDS = {"nome"}
+SORT_KEYS = {
+    "created_at": [("created_at", -1), ("_id", -1)],
+    "nome": [("nome", 1), ("_id", 1)],
+}
+INDEXES = {"categorias": [
+    IndexModel("nome", unique=True),
+    *(IndexModel(keys) for keys in SORT_KEYS.values()),
+]}
+
+
+def count_aulas_by_categoria(db, cat_ids=None):
+    """Conta aulas por categoria com um único $group; retorna {str(id_categoria): total}."""
+    pipeline = []
+    if cat_ids is not None:
+        pipeline.append({"$match": {"id_categoria": {"$in": list(cat_ids)}}})
+    pipeline.append({"$group": {"_id": "$id_categoria", "total": {"$sum": 1}}})
+    return {str(row["_id"]): row["total"] for row in db.aulas.aggregate(pipeline)}
+
+
+def wants_count(projection):
+    """aulas_count só é calculado se fizer parte da representação pedida."""
+    return not projection or not any(projection.values()) or "aulas_count" in projection
 
 # Handler OPTIONS explícito para evitar redirects no preflight
 @bp.route("/", methods=["OPTIONS"], strict_slashes=False)
@@ -28,6 +57,7 @@ def create():
         return jsonify({"error": "nome_cannot_be_empty"}), 400
     
     body["created_at"] = body["updated_at"] = now()
+    body["aulas_count"] = 0  # mantido pelas rotas de aulas (create/update/delete)
     
     try:
         res = mongo.db.categorias.insert_one(body)
@@ -36,8 +66,9 @@ def create():
     except Exception as e:
         return jsonify({"error": "creation_failed", "details": str(e)}), 500
     
+    SUGGEST.put("categoria", res.inserted_id, body["nome"])
     doc = mongo.db.categorias.find_one({"_id": res.inserted_id}, {})
-    return jsonify(scrub(doc)), 201
+    return jsonify(CATEGORIA.one(doc)), 201
 
 @bp.route("/", methods=["GET"], strict_slashes=False)
 @cross_origin(headers=["Content-Type", "Authorization"])
@@ -45,29 +76,34 @@ def list_():
     q = request.args.get("q")
     page = int(request.args.get("page", 1))
     limit = int(request.args.get("limit", 10))
-    order = int(request.args.get("order", -1))
-    sort = request.args.get("sort", "created_at")
+    sort, order, position, err = page_args(request.args, SORT_KEYS)
+    if err:
+        return err
     
     filt = {}
     if q:
         filt["nome"] = {"$regex": q, "$options": "i"}
     
-    cur = (mongo.db.categorias.find(filt, {})
-           .sort(sort, order)
-           .skip((page-1)*limit)
-           .limit(limit))
-    total = mongo.db.categorias.count_documents(filt)
-    
-    # Enriquecer com contagem de aulas por categoria
-    categorias = []
-    for cat in cur:
-        cat_doc = scrub(cat)
-        # Contar aulas nesta categoria
-        aulas_count = mongo.db.aulas.count_documents({"id_categoria": cat["_id"]})
-        cat_doc["aulas_count"] = aulas_count
-        categorias.append(cat_doc)
-    
-    return jsonify({"data": categorias, "total": total, "page": page, "limit": limit})
+    projection, err = CATEGORIA.projection(request.args)
+    if err:
+        return err
+    categorias_raw, next_cursor = fetch_page(mongo.db.categorias, filt, projection, sort, order, limit, position, page)
+    total = count_total(mongo.db.categorias, filt, request.args)
+    
+    # Enriquecer com contagem de aulas por categoria: usa o contador mantido no
+    # documento e, para categorias antigas sem ele, um único $group para a página
+    com_contagem = wants_count(projection)
+    sem_contador = [cat["_id"] for cat in categorias_raw if com_contagem and "aulas_count" not in cat]
+    contagens = count_aulas_by_categoria(mongo.db, sem_contador) if sem_contador else {}
+    
+    categorias = CATEGORIA.many(categorias_raw, projection)
+    for cat in categorias:
+        if com_contagem and "aulas_count" not in cat:
+            cat["aulas_count"] = contagens.get(str(cat["_id"]), 0)
+    
+    return jsonify({"data": categorias, "total": total, "page": page, "limit": limit,
+                    "next_cursor": next_cursor,
+                    **debug_plan(mongo.db.categorias, filt, sort, order, limit, position, request.args)})
 
 @bp.get("/<id>")
 def get_(id):
@@ -75,15 +111,18 @@ def get_(id):
     if not _id:
         return jsonify({"error": "invalid_id"}), 400
     
-    doc = mongo.db.categorias.find_one({"_id": _id}, {})
+    projection, err = CATEGORIA.projection(request.args, default="full")
+    if err:
+        return err
+    doc = mongo.db.categorias.find_one({"_id": _id}, projection)
     if not doc:
         return jsonify({"error": "not_found"}), 404
     
-    cat_doc = scrub(doc)
+    cat_doc = CATEGORIA.one(doc, projection)
     
-    # Enriquecer com contagem de aulas
-    aulas_count = mongo.db.aulas.count_documents({"id_categoria": _id})
-    cat_doc["aulas_count"] = aulas_count
+    # Enriquecer com contagem de aulas (contador do documento, se houver)
+    if wants_count(projection) and "aulas_count" not in cat_doc:
+        cat_doc["aulas_count"] = mongo.db.aulas.count_documents({"id_categoria": _id})
     
     # Buscar algumas aulas desta categoria
     aulas = mongo.db.aulas.find(
@@ -91,7 +130,7 @@ def get_(id):
         {"titulo": 1, "preco_decimal": 1, "status": 1, "created_at": 1}
     ).limit(5)
     
-    cat_doc["aulas"] = [scrub(aula) for aula in aulas]
+    cat_doc["aulas"] = AULA.many(aulas)
     
     return jsonify(cat_doc)
 
@@ -117,9 +156,12 @@ def update(id):
     r = mongo.db.categorias.update_one({"_id": _id}, {"$set": body})
     if r.matched_count == 0:
         return jsonify({"error": "not_found"}), 404
+    if "nome" in body:
+        SUGGEST.put("categoria", _id, body["nome"])
+        FACETS.clear()  # as facetas do catálogo trazem o nome
     
     doc = mongo.db.categorias.find_one({"_id": _id}, {})
-    return jsonify(scrub(doc))
+    return jsonify(CATEGORIA.one(doc))
 
 @bp.delete("/<id>")
 def delete(id):
@@ -127,8 +169,15 @@ def delete(id):
     if not _id:
         return jsonify({"error": "invalid_id"}), 400
     
-    # Verificar se há aulas usando esta categoria
-    aulas_count = mongo.db.aulas.count_documents({"id_categoria": _id})
+    categoria = mongo.db.categorias.find_one({"_id": _id}, {"aulas_count": 1})
+    if not categoria:
+        return jsonify({"error": "not_found"}), 404
+    
+    # Verificar se há aulas usando esta categoria. O contador resolve o caso comum;
+    # se ele estiver zerado ou ausente, confirmamos no índice de id_categoria antes de apagar.
+    aulas_count = categoria.get("aulas_count") or 0
+    if aulas_count <= 0:
+        aulas_count = mongo.db.aulas.count_documents({"id_categoria": _id})
     if aulas_count > 0:
         return jsonify({
             "error": "categoria_in_use", 
@@ -136,7 +185,10 @@ def delete(id):
         }), 409
     
     r = mongo.db.categorias.delete_one({"_id": _id})
-    return ("", 204) if r.deleted_count else (jsonify({"error": "not_found"}), 404)
+    if not r.deleted_count:
+        return jsonify({"error": "not_found"}), 404
+    SUGGEST.remove("categoria", _id)
+    return ("", 204)
 
 @bp.get("/<id>/aulas")
 def get_aulas_by_categoria(id):
@@ -149,51 +201,52 @@ def get_aulas_by_categoria(id):
     if not categoria:
         return jsonify({"error": "categoria_not_found"}), 404
     
-    q = request.args.get("q")
     status = request.args.get("status")
     page = int(request.args.get("page", 1))
     limit = int(request.args.get("limit", 10))
-    order = int(request.args.get("order", -1))
-    sort = request.args.get("sort", "created_at")
+    busca, sort_keys, err = search_args(request.args)
+    if err:
+        return err
+    sort, order, position, err = page_args(request.args, sort_keys)
+    if err:
+        return err
     
-    filt = {"id_categoria": _id}
+    filt = {**busca, "id_categoria": _id}
     
-    if q:
-        filt["$or"] = [
-            {"titulo": {"$regex": q, "$options": "i"}},
-            {"descricao_aula": {"$regex": q, "$options": "i"}},
-        ]
     if status:
         filt["status"] = status
     
-    cur = (mongo.db.aulas.find(filt, {})
-           .sort(sort, order)
-           .skip((page-1)*limit)
-           .limit(limit))
-    total = mongo.db.aulas.count_documents(filt)
-    
-    # Enriquecer dados com informações do professor
-    aulas = []
-    for aula in cur:
-        aula_doc = scrub(aula)
-        
-        # Buscar dados do professor
-        if aula.get("id_professor"):
-            prof = mongo.db.professores.find_one({"_id": aula["id_professor"]}, {"nome": 1, "email": 1, "bio": 1})
-            if prof:
-                aula_doc["professor"] = {
-                    "id": str(prof["_id"]),
-                    "nome": prof.get("nome"),
-                    "email": prof.get("email"),
-                    "bio": prof.get("bio")
-                }
-        
-        aulas.append(aula_doc)
+    projection, err = AULA.projection(request.args)
+    if err:
+        return err
+    strategy = list_strategy()
+    rows, next_cursor = aulas_page(mongo.db, filt, sort, order, page, limit, strategy,
+                                   with_categoria=False, projection=projection, position=position)
+    total = count_total(mongo.db.aulas, filt, request.args)
+    
+    aulas = aulas_list_payload(rows, projection)
     
     return jsonify({
-        "categoria": scrub(categoria),
+        "categoria": CATEGORIA.one(categoria),
         "data": aulas, 
         "total": total, 
         "page": page, 
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor,
+        **debug_plan(mongo.db.aulas, filt, sort, order, limit, position, request.args,
+                     pipeline=aulas_pipeline(filt, sort, order, page, limit, strategy, with_categoria=False,
+                                             projection=projection, position=position))
     })
+
+
+@db_cli.command("recount-aulas")
+def recount_aulas():
+    """Recalcula categorias.aulas_count a partir da coleção de aulas."""
+    contagens = count_aulas_by_categoria(mongo.db)
+    # agrupa as categorias por total: um update_many por valor distinto
+    por_total = {}
+    for cat in mongo.db.categorias.find({}, {"_id": 1}):
+        por_total.setdefault(contagens.get(str(cat["_id"]), 0), []).append(cat["_id"])
+    for total, ids in por_total.items():
+        mongo.db.categorias.update_many({"_id": {"$in": ids}}, {"$set": {"aulas_count": total}})
+    click.echo(f"aulas_count recalculado para {sum(len(ids) for ids in por_total.values())} categoria(s)")
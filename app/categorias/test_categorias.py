@@ -45,8 +45,9 @@ def test_list_success(mock_mongo, client):
         "nome": "Humanas"
     }]
     mock_mongo.db.categorias.find.return_value = mock_cursor
-    mock_mongo.db.categorias.count_documents.return_value = 1
-    mock_mongo.db.aulas.count_documents.return_value = 3
+    mock_mongo.db.categorias.estimated_document_count.return_value = 1
+    # Categoria antiga, sem contador: contagem vem de um $group para a página
+    mock_mongo.db.aulas.aggregate.return_value = [{"_id": cat_id, "total": 3}]
 
     resp = client.get('/api/categorias/')
     assert resp.status_code == 200
@@ -55,6 +56,31 @@ def test_list_success(mock_mongo, client):
     assert len(body["data"]) == 1
     assert body["data"][0]["nome"] == "Humanas"
     assert body["data"][0]["aulas_count"] == 3
+    mock_mongo.db.aulas.count_documents.assert_not_called()
+
+
+@patch('app.categorias.routes.mongo')
+def test_list_counts_in_single_aggregation(mock_mongo, client):
+    com_contador = {"_id": ObjectId(), "nome": "Exatas", "aulas_count": 7}
+    ids_sem_contador = [ObjectId() for _ in range(3)]
+    sem_contador = [{"_id": _id, "nome": "Antiga"} for _id in ids_sem_contador]
+    mock_cursor = MagicMock()
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.skip.return_value = mock_cursor
+    mock_cursor.limit.return_value = [com_contador, *sem_contador]
+    mock_mongo.db.categorias.find.return_value = mock_cursor
+    mock_mongo.db.categorias.estimated_document_count.return_value = 4
+    mock_mongo.db.aulas.aggregate.return_value = [{"_id": ids_sem_contador[0], "total": 2}]
+
+    resp = client.get('/api/categorias/')
+    assert resp.status_code == 200
+    counts = [c["aulas_count"] for c in resp.get_json()["data"]]
+    assert counts == [7, 2, 0, 0]
+    # Só as categorias sem contador entram no $group, em uma única agregação
+    mock_mongo.db.aulas.aggregate.assert_called_once()
+    pipeline = mock_mongo.db.aulas.aggregate.call_args[0][0]
+    assert pipeline[0] == {"$match": {"id_categoria": {"$in": ids_sem_contador}}}
+    assert pipeline[1]["$group"]["_id"] == "$id_categoria"
 
 
 @patch('app.categorias.routes.mongo')
@@ -103,6 +129,7 @@ def test_update_success(mock_mongo, client):
 def test_delete_success(mock_mongo, client):
     cat_id = ObjectId()
     # Sem aulas vinculadas
+    mock_mongo.db.categorias.find_one.return_value = {"_id": cat_id, "aulas_count": 0}
     mock_mongo.db.aulas.count_documents.return_value = 0
     mock_del = MagicMock()
     mock_del.deleted_count = 1
@@ -112,6 +139,17 @@ def test_delete_success(mock_mongo, client):
     assert resp.data == b''
 
 
+@patch('app.categorias.routes.mongo')
+def test_delete_in_use_uses_counter(mock_mongo, client):
+    cat_id = ObjectId()
+    mock_mongo.db.categorias.find_one.return_value = {"_id": cat_id, "aulas_count": 4}
+    resp = client.delete(f'/api/categorias/{str(cat_id)}')
+    assert resp.status_code == 409
+    assert resp.get_json()["error"] == "categoria_in_use"
+    mock_mongo.db.aulas.count_documents.assert_not_called()
+    mock_mongo.db.categorias.delete_one.assert_not_called()
+
+
 @patch('app.categorias.routes.mongo')
 def test_get_aulas_by_categoria_success(mock_mongo, client):
     cat_id = ObjectId()
@@ -144,7 +182,7 @@ def test_get_aulas_by_categoria_success(mock_mongo, client):
         "bio": "Artista e professora"
     }
 
-    resp = client.get(f'/api/categorias/{str(cat_id)}/aulas')
+    resp = client.get(f'/api/categorias/{str(cat_id)}/aulas?strategy=find')
     assert resp.status_code == 200
     data = resp.get_json()
     assert data["categoria"]["_id"] == str(cat_id)
@@ -154,3 +192,48 @@ def test_get_aulas_by_categoria_success(mock_mongo, client):
     assert aula_out["titulo"] == "Pintura I"
     assert "professor" in aula_out
     assert aula_out["professor"]["nome"] == "Prof. Tarsila"
+
+
+@patch('app.categorias.routes.mongo')
+def test_get_aulas_by_categoria_lookup(mock_mongo, client):
+    cat_id = ObjectId()
+    prof_id = ObjectId()
+    
+    mock_mongo.db.categorias.find_one.return_value = {"_id": cat_id, "nome": "Artes"}
+    mock_mongo.db.aulas.aggregate.return_value = [{
+        "_id": ObjectId(),
+        "titulo": "Pintura I",
+        "status": "disponivel",
+        "id_professor": prof_id,
+        "id_categoria": cat_id,
+        "_professor": [{"_id": prof_id, "nome": "Prof. Tarsila"}],
+    }]
+    mock_mongo.db.aulas.count_documents.return_value = 1
+
+    resp = client.get(f'/api/categorias/{str(cat_id)}/aulas')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["data"][0]["professor"]["nome"] == "Prof. Tarsila"
+    assert data["data"][0]["id_categoria"] == str(cat_id)
+    
+    pipeline = mock_mongo.db.aulas.aggregate.call_args[0][0]
+    assert pipeline[0] == {"$match": {"id_categoria": cat_id}}
+    # A categoria já é conhecida: só o professor é resolvido via $lookup
+    assert [st["$lookup"]["from"] for st in pipeline if "$lookup" in st] == ["professores"]
+    mock_mongo.db.professores.find_one.assert_not_called()
+
+
+def test_recount_aulas_no_grupo_db(app):
+    from app.extensions import mongo
+    db = mongo.db
+    for coll in ("aulas", "categorias"):
+        db[coll].delete_many({})
+    exatas = db.categorias.insert_one({"nome": "Exatas", "aulas_count": 9}).inserted_id
+    vazia = db.categorias.insert_one({"nome": "Vazia"}).inserted_id
+    db.aulas.insert_many([{"id_categoria": exatas}, {"id_categoria": exatas}])
+
+    result = app.test_cli_runner().invoke(args=["db", "recount-aulas"])
+    assert result.exit_code == 0, result.output
+    assert result.output == "aulas_count recalculado para 2 categoria(s)\n"
+    assert db.categorias.find_one({"_id": exatas})["aulas_count"] == 2
+    assert db.categorias.find_one({"_id": vazia})["aulas_count"] == 0
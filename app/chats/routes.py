@@ -3,12 +3,22 @@ from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
+from pymongo import IndexModel
 from datetime import datetime, timezone
 from ..extensions import mongo
-from ..utils import scrub, now  # usa seu now() tz-aware (UTC)
+from ..utils import now  # usa seu now() tz-aware (UTC)
+from ..loader import get_loader
+from ..serializers import MENSAGEM
 
 bp = Blueprint("chats", __name__)
 
+# Caminho quente do chat: inbox (conversas do usuário pela mais recente) e
+# mensagens de uma conversa em ordem (a última mensagem usa o mesmo índice)
+INDEXES = {
+    "conversations": [IndexModel([("members", 1), ("updated_at", -1)])],
+    "messages": [IndexModel([("conversation_id", 1), ("created_at", 1)])],
+}
+
 # ----------------- helpers -----------------
 
 def oid(x):
@@ -26,6 +36,7 @@ def iso_z(dt):
     """
     Converte datetime (aware ou naive) para string ISO8601 com 'Z' no fim.
     - Se vier naive, assume UTC.
+    Nas respostas o JSONProvider já faz isso; aqui serve para o que é gravado (last_message.at).
     """
     if not dt:
         return None
@@ -52,37 +63,77 @@ def _parse_since_iso(s: str):
     except Exception:
         return None
 
+USER_PUBLIC_PROJ = {"nome": 1, "email": 1, "bio": 1, "headline": 1, "avatar_url": 1, "tipo": 1}
+
+# coleções de usuários em ordem de prioridade, com o 'tipo' que cada uma garante
+USER_COLLECTIONS = (("alunos", "aluno"), ("professores", "prof"), ("usuarios", None))
+
 def find_user_any(_id):
     """Procura o usuário em alunos/professores/usuarios e retorna doc + 'tipo' coerente."""
     if not _id:
         return None
-    proj = {"nome": 1, "email": 1, "bio": 1, "headline": 1, "avatar_url": 1, "tipo": 1}
 
+    refs = get_loader(mongo.db)
     # prioriza coleções específicas (delas sabemos o tipo com certeza)
-    a = mongo.db.alunos.find_one({"_id": _id}, proj)
-    if a:
-        a["tipo"] = "aluno"
-        return a
-
-    p = mongo.db.professores.find_one({"_id": _id}, proj)
-    if p:
-        p["tipo"] = "prof"
-        return p
-
-    # fallback genérico (se existir 'usuarios', mantém 'tipo' se houver)
-    u = mongo.db.get_collection("usuarios").find_one({"_id": _id}, proj)
-    if u:
-        # se não tiver tipo, deixa None mesmo
-        return u
+    for name, tipo in USER_COLLECTIONS:
+        doc = refs.load(name, _id, USER_PUBLIC_PROJ)
+        if doc:
+            # no fallback genérico ('usuarios') mantém o 'tipo' salvo, se houver
+            if tipo:
+                doc["tipo"] = tipo
+            return doc
 
     return None
 
+def find_users_any(ids):
+    """
+    Versão em lote de find_user_any: resolve vários usuários pelo loader da requisição
+    (um $in por coleção), consultando a próxima coleção só para os ids ainda não encontrados.
+    Retorna {str(_id): doc}.
+    """
+    refs = get_loader(mongo.db)
+    pending = [i for i in ids if i]
+    found = {}
+    for name, tipo in USER_COLLECTIONS:
+        if not pending:
+            break
+        for key, doc in refs.load_many(name, pending, USER_PUBLIC_PROJ).items():
+            if tipo:
+                doc["tipo"] = tipo
+            found[key] = doc
+        pending = [i for i in pending if str(i) not in found]
+    return found
+
+def last_messages_for(conv_ids):
+    """Última mensagem de cada conversa em uma única agregação; retorna {str(conversation_id): msg}."""
+    if not conv_ids:
+        return {}
+    pipeline = [
+        {"$match": {"conversation_id": {"$in": list(conv_ids)}}},
+        {"$sort": {"created_at": -1}},
+        {"$group": {
+            "_id": "$conversation_id",
+            "text": {"$first": "$text"},
+            "from": {"$first": "$from"},
+            "created_at": {"$first": "$created_at"},
+        }},
+    ]
+    return {str(m["_id"]): m for m in mongo.db.messages.aggregate(pipeline)}
+
+def _other_member(conv, me_id):
+    m0, m1 = conv["members"]
+    return m0 if str(m1) == str(me_id) else m1
+
+def _needs_last_message(conv):
+    lm = conv.get("last_message") or None
+    return not lm or not lm.get("at")
+
 def user_public(doc):
     """Normaliza shape público do usuário (inclui avatar_url e headline)."""
     if not doc:
         return None
     return {
-        "id": str(doc["_id"]),
+        "id": doc["_id"],
         "nome": doc.get("nome"),
         "email": doc.get("email"),
         # exibe bio; se não houver, cai pra headline
@@ -92,40 +143,49 @@ def user_public(doc):
         "tipo": doc.get("tipo"),  # "prof" | "aluno" | None
     }
     
-def conversation_payload(conv, me_id):
-    """Monta o payload da conversa já com 'other' enriquecido."""
+def conversation_payload(conv, me_id, users=None, last_messages=None):
+    """
+    Monta o payload da conversa já com 'other' enriquecido.
+    `users` e `last_messages` (de find_users_any / last_messages_for) evitam as
+    consultas por conversa quando várias conversas são montadas de uma vez.
+    """
     members = conv["members"]
     # membros podem ser ObjectId ou string
-    m0, m1 = members
-    other_id = m0 if str(m1) == str(me_id) else m1
+    other_id = _other_member(conv, me_id)
 
-    # aceita ObjectId ou string:
-    other_oid = oid(other_id) or other_id
-    other_doc = find_user_any(other_oid)
+    if users is not None:
+        other_doc = users.get(str(other_id))
+    else:
+        # aceita ObjectId ou string:
+        other_oid = oid(other_id) or other_id
+        other_doc = find_user_any(other_oid)
 
     # Completa/recupera last_message se estiver ausente ou sem 'at'
     lm = conv.get("last_message") or None
-    if not lm or not lm.get("at"):
-        last_msg = mongo.db.messages.find_one(
-            {"conversation_id": conv["_id"]},
-            sort=[("created_at", -1)],
-        )
+    if _needs_last_message(conv):
+        if last_messages is not None:
+            last_msg = last_messages.get(str(conv["_id"]))
+        else:
+            last_msg = mongo.db.messages.find_one(
+                {"conversation_id": conv["_id"]},
+                sort=[("created_at", -1)],
+            )
         if last_msg:
             lm = {
                 "text": last_msg.get("text", ""),
-                "at": iso_z(last_msg.get("created_at")),
-                "from": str(last_msg.get("from")),
+                "at": last_msg.get("created_at"),
+                "from": last_msg.get("from"),
             }
         else:
             lm = None
 
     return {
-        "id": str(conv["_id"]),
-        "members": [str(m) for m in members],
+        "id": conv["_id"],
+        "members": members,
         "other": user_public(other_doc),  # <- agora vem avatar_url/headline/bio/tipo
         "last_message": lm,
-        "created_at": iso_z(conv.get("created_at")),
-        "updated_at": iso_z(conv.get("updated_at")),
+        "created_at": conv.get("created_at"),
+        "updated_at": conv.get("updated_at"),
     }
     
 def get_me_oid():
@@ -152,7 +212,14 @@ def list_conversations():
         .find({"members": {"$in": [me_id, str(me_id)]}})
         .sort("updated_at", -1)
     )
-    out = [conversation_payload(c, me_id) for c in cur]
+    convs = list(cur)
+
+    # Inbox inteira com consultas em lote: um $in por coleção de usuários
+    # e uma agregação para as conversas sem last_message
+    users = find_users_any(_other_member(c, me_id) for c in convs)
+    last_messages = last_messages_for([c["_id"] for c in convs if _needs_last_message(c)])
+
+    out = [conversation_payload(c, me_id, users, last_messages) for c in convs]
     return jsonify(out)
 
 # Preflight do POST /api/chats
@@ -247,15 +314,9 @@ def _list_messages(conv_id):
 
     cur = mongo.db.messages.find(filt).sort("created_at", 1).limit(200)
 
-    out = []
-    for m in cur:
-        out.append({
-            "id": str(m["_id"]),
-            "text": m["text"],
-            "from": str(m["from"]),
-            "fromMe": (me_id is not None) and (str(m["from"]) == str(me_id)),
-            "created_at": iso_z(m.get("created_at")),
-        })
+    out = MENSAGEM.many(cur)
+    for m in out:
+        m["fromMe"] = (me_id is not None) and (str(m["from"]) == str(me_id))
     return jsonify(out)
 
 def _send_message(conv_id):
@@ -299,9 +360,9 @@ def _send_message(conv_id):
     )
 
     return jsonify({
-        "id": str(ins.inserted_id),
+        "id": ins.inserted_id,
         "text": text,
-        "from": str(me_id),
+        "from": me_id,
         "fromMe": True,
-        "created_at": iso_z(created),
+        "created_at": created,
     }), 201
@@ -48,24 +48,22 @@ def test_list_conversas_success(mock_mongo, app, client):
     mock_cur.sort.return_value = [conv]
     mock_mongo.db.conversations.find.return_value = mock_cur
 
-    # last message para completar payload
-    last_msg = {
-        "_id": ObjectId(),
-        "conversation_id": conv["_id"],
+    # last message para completar payload (agregação em lote)
+    mock_mongo.db.messages.aggregate.return_value = [{
+        "_id": conv["_id"],
         "text": "olá",
         "from": me_id,
         "created_at": datetime(2025, 11, 3, 11, 0, tzinfo=timezone.utc)
-    }
-    mock_mongo.db.messages.find_one.return_value = last_msg
+    }]
 
-    # dados do outro usuário
-    mock_mongo.db.alunos.find_one.return_value = {
+    # dados do outro usuário ($in em alunos)
+    mock_mongo.db.alunos.find.return_value = [{
         "_id": conv["members"][1],
         "nome": "Aluno 2",
         "email": "a2@example.com",
         "avatar_url": "http://x/y.png",
         "headline": "Estudante",
-    }
+    }]
 
     headers = _auth_headers(app, identity=str(me_id))
     resp = client.get('/api/chats/', headers=headers)
@@ -75,7 +73,57 @@ def test_list_conversas_success(mock_mongo, app, client):
     c0 = data[0]
     assert c0["id"] == str(conv["_id"])
     assert c0["other"]["nome"] == "Aluno 2"
+    assert c0["other"]["tipo"] == "aluno"
     assert c0["last_message"]["text"] == "olá"
+    mock_mongo.db.messages.find_one.assert_not_called()
+    mock_mongo.db.alunos.find_one.assert_not_called()
+
+
+@patch('app.chats.routes.mongo')
+def test_list_conversas_resolve_em_lote(mock_mongo, app, client):
+    me_id = ObjectId()
+    aluno_id, prof_id, sumido_id = ObjectId(), ObjectId(), ObjectId()
+    at = datetime(2025, 11, 3, 12, 0, tzinfo=timezone.utc)
+    convs = [
+        {"_id": ObjectId(), "members": [me_id, aluno_id], "updated_at": at,
+         "last_message": {"text": "oi", "at": "2025-11-03T10:00:00Z", "from": str(me_id)}},
+        # membros salvos como string
+        {"_id": ObjectId(), "members": [str(prof_id), str(me_id)], "updated_at": at, "last_message": None},
+        {"_id": ObjectId(), "members": [me_id, sumido_id], "updated_at": at, "last_message": None},
+    ]
+    mock_cur = MagicMock()
+    mock_cur.sort.return_value = convs
+    mock_mongo.db.conversations.find.return_value = mock_cur
+
+    mock_mongo.db.alunos.find.return_value = [{"_id": aluno_id, "nome": "Aluno"}]
+    mock_mongo.db.professores.find.return_value = [{"_id": prof_id, "nome": "Prof"}]
+    mock_mongo.db.usuarios.find.return_value = []
+    mock_mongo.db.messages.aggregate.return_value = [
+        {"_id": convs[1]["_id"], "text": "bom dia", "from": prof_id, "created_at": at},
+    ]
+
+    headers = _auth_headers(app, identity=str(me_id))
+    resp = client.get('/api/chats/', headers=headers)
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert [c["other"] and c["other"]["nome"] for c in data] == ["Aluno", "Prof", None]
+    assert data[1]["other"]["tipo"] == "prof"
+    assert data[0]["last_message"]["text"] == "oi"
+    assert data[1]["last_message"]["text"] == "bom dia"
+    assert data[2]["last_message"] is None
+
+    # um $in por coleção, cada um só com os ids ainda pendentes
+    alunos_in = mock_mongo.db.alunos.find.call_args[0][0]["_id"]["$in"]
+    profs_in = mock_mongo.db.professores.find.call_args[0][0]["_id"]["$in"]
+    usuarios_in = mock_mongo.db.usuarios.find.call_args[0][0]["_id"]["$in"]
+    assert alunos_in == [aluno_id, prof_id, sumido_id]
+    assert profs_in == [prof_id, sumido_id]
+    assert usuarios_in == [sumido_id]
+    # uma agregação só para as conversas sem last_message
+    mock_mongo.db.messages.aggregate.assert_called_once()
+    match = mock_mongo.db.messages.aggregate.call_args[0][0][0]["$match"]
+    assert match == {"conversation_id": {"$in": [convs[1]["_id"], convs[2]["_id"]]}}
+    mock_mongo.db.messages.find_one.assert_not_called()
 
 
 @patch('app.chats.routes.mongo')
@@ -1,8 +1,9 @@
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from datetime import timezone
-from pymongo import MongoClient
-import os
+from pymongo import MongoClient, monitoring
+import threading
+import time
 
 try:
     import mongomock
@@ -12,31 +13,191 @@ except Exception:
 cors = CORS()
 jwt = JWTManager()
 
+# config -> opção do MongoClient (só vão ao cliente as que estiverem definidas)
+POOL_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_COMPRESSORS": "compressors",
+}
+
+
+# depois das tentativas iniciais a reconexão continua em background, entre 1s e 30s
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 30.0
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Contadores do pool de conexões, para o /readyz."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.cleared = 0
+
+    def _add(self, attr, delta):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + delta)
+
+    def connection_created(self, event):
+        self._add("open", 1)
+
+    def connection_closed(self, event):
+        self._add("open", -1)
+
+    def connection_checked_out(self, event):
+        self._add("in_use", 1)
+
+    def connection_checked_in(self, event):
+        self._add("in_use", -1)
+
+    def pool_cleared(self, event):
+        self._add("cleared", 1)
+
+    # eventos que não mudam os contadores
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): pass
+
+    def snapshot(self):
+        with self._lock:
+            return {"open": self.open, "in_use": self.in_use, "cleared": self.cleared}
+
+
 class Mongo:
+    """
+    Cliente do Mongo em um de dois modos explícitos (DB_MODE):
+
+    - "mock": mongomock em memória (testes e desenvolvimento sem banco);
+    - "real": MongoClient com as opções de pool da config. O cliente é criado
+      sem bloquear o boot; uma thread confirma a conexão com ping, com
+      tentativas limitadas e backoff exponencial que decidem o estado inicial,
+      e segue tentando (no intervalo máximo) até o banco responder. Pronto, o
+      /readyz refaz um ping curto a cada DB_READY_TTL segundos; se falhar, volta
+      a "unavailable" e a reconexão recomeça. Não há fallback silencioso para o
+      mongomock: se o banco não responder, o /readyz diz que não está pronto.
+    """
     client = None
     db = None
+
+    def __init__(self):
+        self.mode = None
+        self.state = "idle"       # idle -> connecting -> ready <-> unavailable
+        self.attempts = 0
+        self.error = None
+        self.pool = None
+        self.options = {}
+        self._thread = None
+        self._settled = threading.Event()   # fim das tentativas iniciais
+        self._lock = threading.Lock()
+        self._backoff = 0.5
+        self._checked = 0.0                 # último ping bem-sucedido (monotonic)
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
     def init_app(self, app):
         uri = app.config["MONGODB_URI"]
         name = app.config["MONGO_DB"]
+        self.mode = app.config.get("DB_MODE", "real")
+        self.attempts, self.error = 0, None
+        self._settled = threading.Event()
 
-        use_mock = (
-            bool(app.config.get("USE_MOCK_DB"))
-            or "PYTEST_CURRENT_TEST" in os.environ
-        )
-
-        if use_mock and mongomock is not None:
+        if self.mode == "mock":
+            if mongomock is None:
+                raise RuntimeError("DB_MODE=mock requer o pacote mongomock")
             self.client = mongomock.MongoClient()
             self.db = self.client[name]
+            self.pool, self.options = None, {}
+            self.state = "ready"
+            self._settled.set()
+            return
+        if self.mode != "real":
+            raise RuntimeError(f"DB_MODE inválido: {self.mode!r} (use 'real' ou 'mock')")
+
+        self.options = {
+            opt: app.config[key] for key, opt in POOL_OPTIONS.items()
+            if app.config.get(key) not in (None, "")
+        }
+        self.pool = PoolStats()
+        # MongoClient não conecta no construtor: a seleção de servidor acontece em background
+        self.client = MongoClient(
+            uri, tz_aware=True, tzinfo=timezone.utc, event_listeners=[self.pool], **self.options
+        )
+        self.db = self.client[name]
+        self.state = "connecting"
+        self._backoff = app.config.get("DB_CONNECT_BACKOFF", 0.5)
+        self._start(app.config.get("DB_CONNECT_RETRIES", 5))
+
+    def _start(self, retries):
+        """Thread de conexão do cliente atual (a de um cliente anterior termina sozinha)."""
+        self._thread = threading.Thread(target=self._connect, args=(retries,), name="mongo-connect", daemon=True)
+        self._thread.start()
+
+    def _connect(self, retries):
+        """Ping até o banco responder; passadas `retries` tentativas o estado vira "unavailable"."""
+        client, attempt = self.client, 0
+        while client is self.client:
+            attempt += 1
+            self.attempts += 1
+            try:
+                client.admin.command("ping")
+            except Exception as e:
+                self.error = str(e)
+                print(f"[MONGO] ping falhou (tentativa {attempt}/{retries}): {e}")
+                delay = min(self._backoff * 2 ** (min(attempt, retries) - 1), RECONNECT_MAX)
+                if attempt >= retries:
+                    if client is self.client:
+                        self.state = "unavailable"
+                        self._settled.set()
+                    delay = max(delay, RECONNECT_MIN)
+                time.sleep(delay)
+                continue
+            if client is self.client:
+                self.state, self.error = "ready", None
+                self._checked = time.monotonic()
+                self._settled.set()
             return
 
+    def check(self, ttl):
+        """
+        Readiness em dia com a conexão: pronto, refaz o ping no máximo a cada `ttl`
+        segundos; se falhar, passa a "unavailable" e a reconexão volta para o background.
+        """
+        if self.mode != "real" or not self.ready or time.monotonic() - self._checked < ttl:
+            return self.ready
         try:
-            self.client = MongoClient(uri, tz_aware=True, tzinfo=timezone.utc)
             self.client.admin.command("ping")
-            self.db = self.client[name]
-        except Exception:
-            if mongomock is None:
-                raise
-            self.client = mongomock.MongoClient()
-            self.db = self.client[name]
+        except Exception as e:
+            print(f"[MONGO] ping do /readyz falhou: {e}")
+            with self._lock:
+                reconnecting = self.state == "unavailable"
+                self.state, self.error = "unavailable", str(e)
+            if not reconnecting:
+                self._start(1)
+            return False
+        self._checked = time.monotonic()
+        return True
+
+    def wait_ready(self, timeout=None):
+        """Espera o fim das tentativas iniciais; retorna se o banco ficou pronto."""
+        self._settled.wait(timeout)
+        return self.ready
+
+    def status(self):
+        """Estado da conexão e do pool, para /healthz e /readyz."""
+        out = {"mode": self.mode, "state": self.state, "attempts": self.attempts}
+        if self.error:
+            out["error"] = self.error
+        if self.pool is not None:
+            out["pool"] = {**self.pool.snapshot(), "max": self.options.get("maxPoolSize", 100)}
+        return out
 
 mongo = Mongo()
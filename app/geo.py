@@ -0,0 +1,195 @@
+import csv
+import os
+import re
+import threading
+import click
+from flask import jsonify
+from pymongo import UpdateOne
+from .extensions import mongo
+from .indexes import db_cli
+
+# ponto GeoJSON do endereço, com índice 2dsphere (ver professores/routes.py)
+FIELD = "localizacao"
+# dígitos do prefixo de CEP que deu o ponto: com menos de PRECISE_DIGITS o ponto é o de
+# uma região inteira (a capital), e distâncias de poucos km a partir dele não valem nada
+PRECISION_FIELD = "localizacao_precisao"
+PRECISE_DIGITS = 5
+EARTH_RADIUS_KM = 6378.1
+RAIO_PADRAO_KM = 10
+RAIO_MAX_KM = 500
+
+CEP_DATASET = os.path.join(os.path.dirname(__file__), "data", "cep_prefixos.csv")
+_CEP = re.compile(r"\D")
+
+
+class CepIndex:
+    """
+    CEP -> (lat, lon) a partir de um CSV local (prefixo,cidade,uf,lat,lon), sem API externa.
+
+    Vale o prefixo mais longo do arquivo: com "01" e "01310" o CEP 01310-100 cai no
+    segundo. O arquivo que vem no repositório tem só as capitais, por prefixos de 2 a
+    4 dígitos (precisão de região, ver PRECISE_DIGITS); um mais fino (por município,
+    faixa ou CEP inteiro) entra pelo CEP_DATASET no mesmo formato.
+    """
+
+    def __init__(self, path=CEP_DATASET):
+        self.path = path
+        self._prefixes = None
+        self._lock = threading.Lock()
+
+    def use(self, path):
+        """Troca o arquivo (recarregado na próxima consulta)."""
+        with self._lock:
+            if path != self.path:
+                self.path, self._prefixes = path, None
+
+    def _load(self):
+        with self._lock:
+            if self._prefixes is None:
+                prefixes = {}
+                with open(self.path, encoding="utf-8", newline="") as f:
+                    for row in csv.DictReader(f):
+                        prefixes[row["prefixo"]] = (float(row["lat"]), float(row["lon"]))
+                self._prefixes = prefixes
+        return self._prefixes
+
+    def locate(self, cep):
+        """(lat, lon, dígitos do prefixo casado) do CEP, ou None."""
+        digits = _CEP.sub("", str(cep or ""))
+        if len(digits) != 8:
+            return None
+        prefixes = self._prefixes if self._prefixes is not None else self._load()
+        for size in range(8, 0, -1):
+            found = prefixes.get(digits[:size])
+            if found:
+                return (*found, size)
+        return None
+
+    def lookup(self, cep):
+        found = self.locate(cep)
+        return found[:2] if found else None
+
+
+CEPS = CepIndex()
+
+
+def point(lat, lon):
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+def located(endereco):
+    """(ponto GeoJSON, dígitos do prefixo) do CEP de um endereço ({cep, ...}); (None, 0) se desconhecido."""
+    found = CEPS.locate(endereco.get("cep")) if isinstance(endereco, dict) else None
+    if not found:
+        return None, 0
+    lat, lon, size = found
+    return point(lat, lon), size
+
+
+def geocode(endereco):
+    """Ponto GeoJSON do CEP de um endereço ({cep, ...}), ou None."""
+    return located(endereco)[0]
+
+
+def on_write(body):
+    """
+    Acrescenta `localizacao` e a sua precisão a um $set que troca o endereço
+    (None e 0 quando o CEP não é conhecido).
+    """
+    if "endereco" in body:
+        body[FIELD], body[PRECISION_FIELD] = located(body["endereco"])
+    return body
+
+
+def approximate(row):
+    """A distância do documento sai de um ponto de região (CEP casado por prefixo curto)?"""
+    return (row.pop(PRECISION_FIELD, None) or 0) < PRECISE_DIGITS
+
+
+def near_args(args):
+    """
+    Lê `near=lat,lon` (ou `cep=`) e `raio_km=`; retorna (centro (lat, lon) | None, raio, erro).
+
+    `cep=` só vale como centro quando casa com um prefixo de PRECISE_DIGITS dígitos
+    ou mais: o centro de uma região inteira daria distâncias erradas com cara de certas.
+    """
+    near, cep = args.get("near"), args.get("cep")
+    if not near and not cep:
+        return None, None, None
+    if near:
+        try:
+            lat, lon = (float(v) for v in near.split(","))
+        except ValueError:
+            return None, None, (jsonify({"error": "invalid_near", "msg": "use near=lat,lon"}), 400)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return None, None, (jsonify({"error": "invalid_near", "msg": "use near=lat,lon"}), 400)
+        center = (lat, lon)
+    else:
+        found = CEPS.locate(cep)
+        if found is None:
+            return None, None, (jsonify({"error": "unknown_cep"}), 400)
+        if found[2] < PRECISE_DIGITS:
+            return None, None, (jsonify({"error": "imprecise_cep", "precisao": found[2], "min": PRECISE_DIGITS,
+                                         "msg": "o CEP só é conhecido pela região; use near=lat,lon"}), 400)
+        center = found[:2]
+    try:
+        raio = float(args.get("raio_km", RAIO_PADRAO_KM))
+    except ValueError:
+        raio = -1
+    if not 0 < raio <= RAIO_MAX_KM:
+        return None, None, (jsonify({"error": "invalid_raio_km", "max": RAIO_MAX_KM}), 400)
+    return center, raio, None
+
+
+def within(center, raio_km):
+    """Filtro do círculo (para contar: $geoNear não tem count)."""
+    lat, lon = center
+    return {FIELD: {"$geoWithin": {"$centerSphere": [[lon, lat], raio_km / EARTH_RADIUS_KM]}}}
+
+
+def near_pipeline(center, raio_km, filt, projection, skip, limit):
+    """
+    $geoNear pelo índice 2dsphere: só quem está no raio, do mais perto ao mais longe,
+    com `distancia_km` (e a precisão do ponto, ver approximate) em cada documento.
+    """
+    geo = {
+        "near": point(*center),
+        "key": FIELD,
+        "distanceField": "distancia_km",
+        "maxDistance": raio_km * 1000,
+        "distanceMultiplier": 0.001,
+        "spherical": True,
+    }
+    if filt:
+        geo["query"] = filt
+    pipeline = [{"$geoNear": geo}, {"$skip": skip}, {"$limit": limit}]
+    if projection:
+        if any(projection.values()):
+            projection = {**projection, "distancia_km": 1, PRECISION_FIELD: 1}
+        pipeline.append({"$project": projection})
+    return pipeline
+
+
+def rebuild(collection, batch=500):
+    """Geocodifica de novo todos os documentos com endereço (após trocar o CEP_DATASET)."""
+    ops, total = [], 0
+    for doc in collection.find({"endereco": {"$exists": True}}, {"endereco": 1}):
+        ponto, size = located(doc["endereco"])
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {FIELD: ponto, PRECISION_FIELD: size}}))
+        if len(ops) >= batch:
+            collection.bulk_write(ops, ordered=False)
+            total, ops = total + len(ops), []
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+        total += len(ops)
+    return total
+
+
+@db_cli.command("geocode")
+def geocode_cli():
+    """Preenche `localizacao` dos professores a partir do CEP (CEP_DATASET)."""
+    click.echo(f"professores: {rebuild(mongo.db.professores)} documento(s)")
+
+
+def init_app(app):
+    CEPS.use(app.config.get("CEP_DATASET") or CEP_DATASET)
@@ -1,10 +1,9 @@
 # app/google_calendar.py
+# As bibliotecas do Google são importadas no primeiro uso: chamadas ao Calendar
+# são raras e googleapiclient/google_auth_oauthlib pesam no boot de cada worker.
 import os
 import json
 from urllib.parse import urlencode
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from datetime import datetime
 from flask import current_app
 
@@ -12,6 +11,8 @@ SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
 
 def get_oauth_flow(redirect_uri=None, state=None):
     """Cria um objeto Flow para iniciar autorização."""
+    from google_auth_oauthlib.flow import Flow
+
     client_config = {
         "web": {
             "client_id": os.environ.get("GOOGLE_CLIENT_ID"),
@@ -31,6 +32,8 @@ def build_credentials_from_tokens(token_data):
     token_data: dict com keys access_token, refresh_token, token_uri, client_id, client_secret, scopes, expiry
     ou o dict retornado por google oauth
     """
+    from google.oauth2.credentials import Credentials
+
     creds = Credentials(
         token=token_data.get("access_token"),
         refresh_token=token_data.get("refresh_token"),
@@ -41,13 +44,15 @@ def build_credentials_from_tokens(token_data):
     )
     return creds
 
-def create_calendar_event(credentials: Credentials, summary: str, description: str,
+def create_calendar_event(credentials, summary: str, description: str,
                           start_dt, end_dt, attendees=None, timezone="America/Sao_Paulo"):
     """
     credentials: google oauth2 Credentials (com acesso calendar.events)
     start_dt, end_dt: datetime com timezone (p.ex. aware datetimes)
     attendees: list de dicts como [{"email":"x@y.com"}, ...]
     """
+    from googleapiclient.discovery import build
+
     service = build("calendar", "v3", credentials=credentials)
     
     event_body = {
@@ -0,0 +1,20 @@
+from flask import Blueprint, current_app, jsonify
+from ..extensions import mongo
+
+bp = Blueprint("health", __name__)
+
+
+@bp.get("/healthz")
+def healthz():
+    """Liveness: o processo responde; não depende do banco."""
+    return jsonify({"status": "ok", "db": mongo.status()}), 200
+
+
+@bp.get("/readyz")
+def readyz():
+    """Readiness: só recebe tráfego enquanto o banco responde ao ping (cacheado por DB_READY_TTL)."""
+    ready = mongo.check(current_app.config.get("DB_READY_TTL", 5))
+    status = mongo.status()
+    if not ready:
+        return jsonify({"status": "unavailable", "db": status}), 503
+    return jsonify({"status": "ready", "db": status}), 200
@@ -0,0 +1,108 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from app import create_app
+from app.extensions import mongo
+
+
+@pytest.fixture
+def real_mode(monkeypatch):
+    """create_app em DB_MODE=real com MongoClient falso; volta ao mongomock no fim."""
+    monkeypatch.setenv("DB_MODE", "real")
+    monkeypatch.setenv("DB_CONNECT_BACKOFF", "0")
+    monkeypatch.setenv("DB_CONNECT_RETRIES", "3")
+    with patch("app.extensions.MongoClient") as client_cls:
+        yield client_cls
+    monkeypatch.delenv("DB_MODE")
+    create_app()
+
+
+def test_mock_mode_pronto_sem_banco():
+    client = create_app().test_client()
+    resp = client.get("/healthz")
+    assert resp.status_code == 200
+    assert resp.get_json()["db"] == {"mode": "mock", "state": "ready", "attempts": 0}
+    resp = client.get("/readyz")
+    assert resp.status_code == 200
+    assert resp.get_json()["status"] == "ready"
+
+
+def test_real_conecta_com_retentativas(real_mode, monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "20")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd")
+    real_mode.return_value.admin.command.side_effect = [Exception("down"), Exception("down"), {"ok": 1}]
+
+    app = create_app()
+    assert mongo.wait_ready(timeout=5)
+    assert mongo.attempts == 3 and mongo.error is None
+
+    kwargs = real_mode.call_args.kwargs
+    assert kwargs["maxPoolSize"] == 20
+    assert kwargs["compressors"] == "zstd"
+    assert kwargs["serverSelectionTimeoutMS"] == 5000
+    assert "minPoolSize" not in kwargs          # não configurado: fica o padrão do pymongo
+    assert kwargs["event_listeners"] == [mongo.pool]
+
+    resp = app.test_client().get("/readyz")
+    assert resp.status_code == 200
+    assert resp.get_json()["db"]["pool"] == {"open": 0, "in_use": 0, "cleared": 0, "max": 20}
+
+
+def test_real_indisponivel_nao_cai_no_mongomock(real_mode):
+    real_mode.return_value.admin.command.side_effect = Exception("connection refused")
+
+    app = create_app()
+    assert not mongo.wait_ready(timeout=5)
+    assert mongo.state == "unavailable" and mongo.attempts == 3
+    assert mongo.client is real_mode.return_value
+
+    client = app.test_client()
+    resp = client.get("/readyz")
+    assert resp.status_code == 503
+    assert resp.get_json()["db"]["error"] == "connection refused"
+    assert client.get("/healthz").status_code == 200
+
+
+def test_reconecta_em_background_depois_das_tentativas(real_mode):
+    real_mode.return_value.admin.command.side_effect = [Exception("down")] * 3 + [{"ok": 1}]
+
+    app = create_app()
+    assert not mongo.wait_ready(timeout=5)           # estado inicial: indisponível
+    assert app.test_client().get("/readyz").status_code == 503
+    limite = time.monotonic() + 5
+    while not mongo.ready and time.monotonic() < limite:
+        time.sleep(0.05)
+    assert mongo.ready and mongo.attempts == 4
+    assert app.test_client().get("/readyz").status_code == 200
+
+
+def test_readyz_percebe_o_banco_caindo(real_mode, monkeypatch):
+    monkeypatch.setenv("DB_READY_TTL", "0")
+    real_mode.return_value.admin.command.side_effect = [{"ok": 1}, Exception("gone")] + [Exception("gone")] * 50
+
+    app = create_app()
+    assert mongo.wait_ready(timeout=5)
+    resp = app.test_client().get("/readyz")
+    assert resp.status_code == 503
+    assert resp.get_json()["db"]["state"] == "unavailable" and resp.get_json()["db"]["error"] == "gone"
+    assert app.test_client().get("/healthz").status_code == 200
+
+
+def test_db_mode_invalido(monkeypatch):
+    monkeypatch.setenv("DB_MODE", "auto")
+    with pytest.raises(RuntimeError):
+        create_app()
+    monkeypatch.delenv("DB_MODE")
+    create_app()
+
+
+def test_pool_stats_contadores():
+    from app.extensions import PoolStats
+    stats = PoolStats()
+    event = MagicMock()
+    stats.connection_created(event)
+    stats.connection_created(event)
+    stats.connection_checked_out(event)
+    stats.connection_closed(event)
+    stats.pool_cleared(event)
+    assert stats.snapshot() == {"open": 1, "in_use": 1, "cleared": 1}
@@ -0,0 +1,116 @@
+import click
+from flask.cli import AppGroup
+from .extensions import mongo
+
+db_cli = AppGroup("db", help="Manutenção do banco.")
+
+# opções de índice comparadas com as do banco (além das chaves)
+OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression", "default_language")
+
+
+def declared():
+    """Índices declarados pelos blueprints: {coleção: [IndexModel]}."""
+    from .agenda.routes import INDEXES as agenda
+    from .alunos.routes import INDEXES as alunos
+    from .aulas.routes import INDEXES as aulas
+    from .avaliacoes.routes import INDEXES as avaliacoes
+    from .categorias.routes import INDEXES as categorias
+    from .chats.routes import INDEXES as chats
+    from .professores.routes import INDEXES as professores
+
+    out = {}
+    for registry in (alunos, professores, aulas, categorias, agenda, avaliacoes, chats):
+        for coll, models in registry.items():
+            out.setdefault(coll, []).extend(models)
+    return out
+
+
+def _text_weights(key, weights=None):
+    return weights or {f: 1 for f, d in key if d == "text"}
+
+
+def _same(spec, live):
+    """O índice do banco (index_information) corresponde ao declarado (IndexModel.document)?"""
+    key = list(spec["key"].items())
+    live_key = [(f, d) for f, d in live["key"]]
+    if any(d == "text" for _, d in key):
+        # no servidor a chave de um índice de texto vira _fts/_ftsx; os campos ficam em weights
+        plain = [(f, d) for f, d in key if d != "text"]
+        live_plain = [(f, d) for f, d in live_key if f not in ("_fts", "_ftsx") and d != "text"]
+        if plain != live_plain:
+            return False
+        # o servidor sempre informa weights; o mongomock, não (aí só as chaves contam)
+        if "weights" in live and _text_weights(key, spec.get("weights")) != _text_weights(live_key, live["weights"]):
+            return False
+    elif key != live_key:
+        return False
+    for opt in OPTIONS:
+        if opt == "unique":
+            if bool(spec.get(opt)) != bool(live.get(opt)):
+                return False
+        # mongomock não informa partialFilterExpression; só compara o que o banco devolve
+        elif opt in spec and opt in live and spec[opt] != live[opt]:
+            return False
+        elif opt in live and opt not in spec and opt != "default_language":
+            return False
+    return True
+
+
+def plan(db, registry=None):
+    """
+    Diferença entre os índices declarados e os do banco.
+
+    Retorna uma lista de (coleção, ação, nome, IndexModel | None), com ação
+    "create" (não existe), "recreate" (mesmo nome, definição diferente) ou
+    "extra" (existe no banco mas não está declarado).
+    """
+    registry = registry if registry is not None else declared()
+    actions = []
+    for coll, models in sorted(registry.items()):
+        live = db[coll].index_information()
+        names = set()
+        for model in models:
+            spec = model.document
+            names.add(spec["name"])
+            if spec["name"] not in live:
+                actions.append((coll, "create", spec["name"], model))
+            elif not _same(spec, live[spec["name"]]):
+                actions.append((coll, "recreate", spec["name"], model))
+        for name in sorted(set(live) - names - {"_id_"}):
+            actions.append((coll, "extra", name, None))
+    return actions
+
+
+def apply(db, actions, prune=False):
+    """Aplica o plano: cria os que faltam, recria os divergentes e (com prune) remove os extras."""
+    creates = {}
+    for coll, action, name, model in actions:
+        if action == "recreate" or (action == "extra" and prune):
+            db[coll].drop_index(name)
+        if action in ("create", "recreate"):
+            creates.setdefault(coll, []).append(model)
+    for coll, models in creates.items():
+        db[coll].create_indexes(models)
+
+
+@db_cli.command("ensure-indexes")
+@click.option("--dry-run", is_flag=True, help="Só mostra a diferença, sem alterar o banco.")
+@click.option("--prune", is_flag=True, help="Remove índices que não estão declarados.")
+def ensure_indexes(dry_run, prune):
+    """Compara os índices declarados nos blueprints com os do banco e aplica a diferença."""
+    actions = plan(mongo.db)
+    if not actions:
+        click.echo("Índices em dia.")
+        return
+    marks = {"create": "+", "recreate": "~", "extra": "-"}
+    for coll, action, name, _ in actions:
+        note = " (não declarado; use --prune para remover)" if action == "extra" and not prune else ""
+        click.echo(f"{marks[action]} {coll}.{name}{note}")
+    if dry_run:
+        return
+    apply(mongo.db, actions, prune=prune)
+    click.echo("Índices aplicados.")
+
+
+def init_app(app):
+    app.cli.add_command(db_cli)
@@ -0,0 +1,36 @@
+import decimal
+import orjson
+from bson import ObjectId, Decimal128
+from flask.json.provider import JSONProvider
+
+# datetimes saem em ISO 8601 UTC com 'Z' (naive é tratado como UTC)
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def _default(obj):
+    """Tipos que o orjson não conhece: ObjectId e decimais viram string."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """JSONProvider do Flask com orjson: serializa ObjectId/datetime/Decimal128 direto dos documentos do Mongo."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # evita o decode/encode de dumps(): o orjson já entrega bytes
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS),
+            mimetype="application/json",
+        )
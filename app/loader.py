@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import g, has_app_context
+from .utils import oid, fetch_by_ids
+
+
+class Loader:
+    """Identity map de referências com escopo de requisição.
+
+    Memoiza `_id -> documento` por coleção (e projeção), inclusive ausências,
+    para que a mesma referência não seja lida duas vezes na mesma requisição.
+    Ids registrados com `want` ficam pendentes e são buscados juntos, com um
+    único $in na próxima leitura da mesma coleção.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._docs = {}         # (coleção, projeção) -> {str(_id): doc | None}
+        self._pending = {}      # (coleção, projeção) -> {str(_id): _id}
+        self._projections = {}  # (coleção, projeção) -> projeção original
+
+    def _key(self, collection, projection):
+        if not projection:
+            return (collection, None)
+        if isinstance(projection, dict):
+            shape = tuple(sorted((k, repr(v)) for k, v in projection.items()))
+        else:
+            shape = tuple(sorted(projection))
+        key = (collection, shape)
+        self._projections.setdefault(key, projection)
+        return key
+
+    def want(self, collection, ids, projection=None):
+        """Registra ids para a próxima busca em lote da coleção."""
+        key = self._key(collection, projection)
+        cache = self._docs.get(key, {})
+        pending = self._pending.setdefault(key, {})
+        for i in ids:
+            if not i or str(i) in cache:
+                continue
+            pending.setdefault(str(i), oid(i) or i)
+        return key
+
+    def load(self, collection, _id, projection=None):
+        """Um documento por _id (ou None), junto com o que estiver pendente na coleção.
+
+        Se nada mais estiver pendente, a leitura é um find_one simples.
+        """
+        if not _id:
+            return None
+        key = self.want(collection, [_id], projection)
+        self._flush(key, single=True)
+        return _copy(self._docs[key].get(str(_id)))
+
+    def load_many(self, collection, ids, projection=None):
+        """Vários documentos por _id em um $in; retorna {str(_id): doc} só com os encontrados."""
+        ids = [i for i in ids if i]
+        key = self.want(collection, ids, projection)
+        self._flush(key)
+        cache = self._docs.get(key, {})
+        return {str(i): _copy(cache[str(i)]) for i in ids if cache.get(str(i))}
+
+    def load_all(self, *specs):
+        """Leituras independentes `(coleção, _id, projeção)` disparadas em paralelo.
+
+        Cada uma é um find_one (o que já está no cache não vai ao banco); a latência
+        total é a da leitura mais lenta. Retorna os documentos na ordem dos specs.
+        O executor é da chamada: requisições concorrentes não disputam as mesmas threads.
+        """
+        todo = {}
+        for collection, _id, projection in specs:
+            if not _id:
+                continue
+            key = self._key(collection, projection)
+            if str(_id) not in self._docs.get(key, {}):
+                todo[(key, str(_id))] = (getattr(self.db, collection), oid(_id) or _id, self._projections.get(key))
+        if len(todo) > 1:
+            with ThreadPoolExecutor(max_workers=len(todo), thread_name_prefix="loader") as pool:
+                futures = {k: pool.submit(coll.find_one, {"_id": i}, proj) for k, (coll, i, proj) in todo.items()}
+                found = {k: f.result() for k, f in futures.items()}
+        else:
+            found = {k: coll.find_one({"_id": i}, proj) for k, (coll, i, proj) in todo.items()}
+        for (key, k), doc in found.items():
+            self._docs.setdefault(key, {})[k] = doc
+        return [self.load(collection, _id, projection) for collection, _id, projection in specs]
+
+    def forget(self, collection, _id):
+        """Descarta o documento de todas as projeções da coleção (após uma escrita)."""
+        for key, cache in self._docs.items():
+            if key[0] == collection:
+                cache.pop(str(_id), None)
+
+    def _flush(self, key, single=False):
+        pending = self._pending.pop(key, None)
+        if not pending:
+            return
+        coll, projection = getattr(self.db, key[0]), self._projections.get(key)
+        if single and len(pending) == 1:
+            (k, _id), = pending.items()
+            found = {k: coll.find_one({"_id": _id}, projection)}
+        else:
+            found = fetch_by_ids(coll, pending.values(), projection)
+        cache = self._docs.setdefault(key, {})
+        for k in pending:
+            cache[k] = found.get(k)
+
+
+def _copy(doc):
+    # cópia rasa: quem recebe pode alterar o dict (ex.: 'tipo' nos chats) sem afetar o cache
+    return dict(doc) if isinstance(doc, dict) else doc
+
+
+def get_loader(db):
+    """Loader da requisição atual (em flask.g); fora de contexto, um novo a cada chamada."""
+    if not has_app_context():
+        return Loader(db)
+    loader = g.get("_loader")
+    if loader is None or loader.db is not db:
+        loader = g._loader = Loader(db)
+    return loader
+
+
+def init_app(app):
+    @app.teardown_request
+    def _drop_loader(exc=None):
+        g.pop("_loader", None)
@@ -0,0 +1,174 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+import click
+from .extensions import mongo
+from .indexes import db_cli
+from .recommender import deps
+from .search import field_values, fold
+from .utils import now
+
+# o que o aluno quer aprender x o que o professor ensina
+ALUNO_MATERIAS = ("quer_aprender",)
+PROFESSOR_MATERIAS = ("quer_ensinar", "especializacoes")
+# campos do professor copiados em cada match: /me/matches não faz outra leitura
+CARD = ("nome", "slug", "headline", "avatar_url", "valor_hora", "modalidades", "media_avaliacoes")
+
+COLLECTION = "matches"
+TOP_K = 10
+CHUNK = 5000   # alunos por produto de matrizes (e por tarefa no pool de processos)
+
+
+def materias(doc, fields):
+    """{matéria dobrada: rótulo} dos campos; aceita lista ou texto separado por vírgulas."""
+    out = {}
+    for field in fields:
+        for value in field_values(doc, field):
+            for label in value.split(","):
+                key = fold(label)
+                if key:
+                    out.setdefault(key, label.strip())
+    return out
+
+
+def incidence(np, sparse, rows, vocab):
+    """Matriz esparsa linhas x matérias (1 onde a linha tem a matéria); ignora as fora do vocabulário."""
+    indptr, indices = [0], []
+    for row in rows:
+        cols = sorted({vocab[m] for m in row if m in vocab})
+        indices.extend(cols)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(rows), len(vocab)),
+    )
+
+
+def top_k(np, scores, tiebreak, k):
+    """
+    Os k maiores de cada linha de uma matriz esparsa, sem laço por linha: ordena todos os
+    não-zeros por (linha, -nota, -desempate) e fica com as k primeiras posições de cada linha.
+    Retorna (linhas, colunas, notas), já na ordem do ranking.
+    """
+    scores = scores.tocsr()
+    scores.eliminate_zeros()
+    rows = np.repeat(np.arange(scores.shape[0]), np.diff(scores.indptr))
+    order = np.lexsort((-tiebreak[scores.indices], -scores.data, rows))
+    rank = np.arange(len(order)) - scores.indptr[rows[order]]
+    keep = order[rank < k]
+    return rows[keep], scores.indices[keep], scores.data[keep]
+
+
+# estado de cada processo do pool (e do processo principal, sem pool)
+_WORKER = {}
+
+
+def _init_worker(professores_t, tiebreak, k):
+    _WORKER.update(professores_t=professores_t, tiebreak=tiebreak, k=k)
+
+
+def _score_chunk(start, alunos):
+    """Notas de um bloco de alunos contra todos os professores e o top-k de cada aluno."""
+    np, _ = deps()
+    rows, cols, vals = top_k(np, alunos @ _WORKER["professores_t"], _WORKER["tiebreak"], _WORKER["k"])
+    return start, rows, cols, vals
+
+
+def score(np, sparse, alunos, professores):
+    """
+    Matrizes do cálculo: alunos (linhas com peso idf, somando 1) e professores transposta.
+
+    A nota aluno x professor é a fração do que o aluno quer aprender que o professor
+    ensina, com as matérias raras (poucos professores) pesando mais que as comuns.
+    """
+    vocab = {}
+    for row in professores:
+        for m in row:
+            vocab.setdefault(m, len(vocab))
+    P = incidence(np, sparse, professores, vocab)
+    df = np.asarray(P.sum(axis=0)).ravel()
+    idf = np.log((1 + len(professores)) / (1 + df)) + 1.0
+    A = incidence(np, sparse, alunos, vocab) @ sparse.diags(idf.astype(np.float32))
+    total = np.asarray(A.sum(axis=1)).ravel()
+    total[total == 0] = 1.0
+    A = sparse.diags((1.0 / total).astype(np.float32)) @ A
+    return A.tocsr(), P.T.tocsr()
+
+
+def run(db, k=TOP_K, workers=1, chunk=CHUNK):
+    """
+    Recalcula os matches de todos os alunos e troca a coleção `matches` de uma vez.
+
+    Os resultados vão para uma coleção temporária, renomeada sobre `matches` no fim:
+    quem lê nunca vê um cálculo pela metade. Um documento por aluno (_id = id do
+    aluno), com os k professores em ordem: /me/matches é uma leitura pelo _id.
+    """
+    np, sparse = deps()
+    inicio = time.perf_counter()
+
+    profs = list(db.professores.find(
+        {"visibilidade": {"$ne": "privado"}},
+        {**{f: 1 for f in PROFESSOR_MATERIAS}, **{f: 1 for f in CARD}},
+    ))
+    prof_materias = [materias(p, PROFESSOR_MATERIAS) for p in profs]
+    aluno_ids, aluno_materias = [], []
+    for a in db.alunos.find({"quer_aprender": {"$exists": True, "$nin": [None, "", []]}}, {"quer_aprender": 1}):
+        aluno_ids.append(a["_id"])
+        aluno_materias.append(materias(a, ALUNO_MATERIAS))
+
+    A, PT = score(np, sparse, aluno_materias, prof_materias)
+    tiebreak = np.array([p.get("media_avaliacoes") or 0 for p in profs], dtype=np.float64)
+    tasks = [(s, A[s:s + chunk]) for s in range(0, A.shape[0], chunk)]
+
+    temp = db[f"{COLLECTION}_novo"]
+    temp.drop()
+    gerado_em, total = now(), 0
+
+    def store(start, rows, cols, vals):
+        nonlocal total
+        docs = {}
+        for r, c, v in zip(rows.tolist(), cols.tolist(), vals.tolist()):
+            aluno, prof = aluno_materias[start + r], profs[c]
+            comuns = [label for m, label in aluno.items() if m in prof_materias[c]]
+            card = {f: prof[f] for f in CARD if f in prof}
+            docs.setdefault(start + r, []).append({"_id": prof["_id"], "score": round(v, 4), "materias": comuns, **card})
+        if docs:
+            temp.insert_many(
+                [{"_id": aluno_ids[i], "professores": ps, "gerado_em": gerado_em} for i, ps in docs.items()],
+                ordered=False,
+            )
+            total += len(docs)
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(PT, tiebreak, k)) as pool:
+            for result in pool.map(_score_chunk, *zip(*tasks)):
+                store(*result)
+    else:
+        _init_worker(PT, tiebreak, k)
+        for start, rows in tasks:
+            store(*_score_chunk(start, rows))
+
+    if total:
+        temp.rename(COLLECTION, dropTarget=True)
+    else:
+        db[COLLECTION].drop()
+    return {
+        "alunos": len(aluno_ids),
+        "professores": len(profs),
+        "com_match": total,
+        "segundos": round(time.perf_counter() - inicio, 2),
+    }
+
+
+@db_cli.command("build-matches")
+@click.option("--top", "k", default=TOP_K, show_default=True, help="Professores guardados por aluno.")
+@click.option("--workers", default=1, show_default=True, help="Processos para o cálculo (1 = sem pool).")
+@click.option("--chunk", default=CHUNK, show_default=True, help="Alunos por bloco.")
+def build_matches(k, workers, chunk):
+    """Recalcula /api/alunos/me/matches (quer_aprender x quer_ensinar/especializacoes)."""
+    if deps() is None:
+        raise click.ClickException("instale numpy e scipy (requirements.txt)")
+    stats = run(mongo.db, k=k, workers=workers, chunk=chunk)
+    click.echo(
+        f"{stats['com_match']} de {stats['alunos']} aluno(s) com match entre "
+        f"{stats['professores']} professor(es) em {stats['segundos']}s"
+    )
@@ -0,0 +1,239 @@
+import base64
+import binascii
+import time
+from collections import OrderedDict
+from threading import Lock
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from flask import current_app, jsonify
+
+TOTALS_MAX = 1024
+
+
+class TTLCache:
+    """Cache do processo com validade por entrada e limite de tamanho (descarta o mais antigo)."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = Lock()
+
+    def get(self, key):
+        """Valor ainda válido de `key`, ou None."""
+        with self._lock:
+            hit = self._data.get(key)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+        return None
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# totais das listagens: (coleção, filtro normalizado) -> total
+_TOTALS = TTLCache(TOTALS_MAX)
+
+
+def encode_cursor(sort, order, doc):
+    """Cursor opaco com a posição da última linha da página: (valor de `sort`, _id)."""
+    raw = json_util.dumps([sort, order, doc.get(sort), doc["_id"]], json_options=CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def cursor_arg(args, sort, order):
+    """
+    Lê `?cursor=` e retorna ((valor, _id) | None, erro).
+
+    O cursor guarda a ordenação em que foi emitido; usá-lo com outro `sort`/`order`
+    é um erro (a posição não faria sentido).
+    """
+    raw = (args.get("cursor") or "").strip()
+    if not raw:
+        return None, None
+    try:
+        data = base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4))
+        c_sort, c_order, value, _id = json_util.loads(data, json_options=CANONICAL_JSON_OPTIONS)
+    except (ValueError, TypeError, binascii.Error):
+        return None, (jsonify({"error": "invalid_cursor"}), 400)
+    if c_sort != sort or c_order != order:
+        return None, (jsonify({"error": "cursor_sort_mismatch", "sort": c_sort, "order": c_order}), 400)
+    return (value, _id), None
+
+
+def after(filt, sort, order, position):
+    """Filtro das linhas depois de `position` em (sort, _id), na direção de `order`.
+
+    Os documentos sem o campo (null) vêm por último na ordem decrescente e
+    primeiro na crescente: continuam elegíveis enquanto o cursor estiver num
+    valor não nulo (decrescente), e os não nulos todos vêm depois de um cursor
+    parado num null (crescente).
+    """
+    if position is None:
+        return filt
+    value, _id = position
+    op = "$lt" if order < 0 else "$gt"
+    if value is None:
+        keyset = {sort: None, "_id": {op: _id}}
+        if order > 0:
+            keyset = {"$or": [keyset, {sort: {"$ne": None}}]}
+    else:
+        branches = [{sort: {op: value}}, {sort: value, "_id": {op: _id}}]
+        if order < 0:
+            branches.append({sort: None})
+        keyset = {"$or": branches}
+    return {"$and": [filt, keyset]} if filt else keyset
+
+
+def sort_arg(args, allowed, default="created_at"):
+    """
+    Lê `?sort=` e `?order=`; retorna (sort, order, erro).
+
+    `allowed` é o registro de ordenações da listagem ({chave: índice que a
+    serve}). Fora dele a ordenação viraria um SORT em memória (e, em coleções
+    grandes, o limite de 100MB do Mongo): com SORT_POLICY="reject" (padrão) a
+    resposta é 400; com "rewrite" a listagem cai na ordenação padrão.
+    """
+    sort = args.get("sort", default)
+    try:
+        order = int(args.get("order", -1))
+    except (TypeError, ValueError):
+        order = 0
+    if order not in (1, -1):
+        return None, None, (jsonify({"error": "invalid_order", "valid": [1, -1]}), 400)
+    if sort not in allowed:
+        if current_app.config.get("SORT_POLICY") != "rewrite":
+            return None, None, (jsonify({"error": "invalid_sort", "valid": list(allowed)}), 400)
+        print(f"[SORT] '{sort}' não tem índice; usando '{default}'")
+        sort = default
+    return sort, order, None
+
+
+def page_args(args, allowed, default="created_at"):
+    """`sort_arg` + `cursor_arg` de uma listagem: (sort, order, posição, erro)."""
+    sort, order, err = sort_arg(args, allowed, default)
+    if err:
+        return None, None, None, err
+    position, err = cursor_arg(args, sort, order)
+    return sort, order, position, err
+
+
+def sort_spec(sort, order):
+    """Ordenação estável: `_id` desempata valores iguais de `sort`."""
+    return [(sort, order), ("_id", order)]
+
+
+def with_sort_field(projection, sort):
+    """Numa projeção de inclusão, garante o campo de ordenação (o cursor é feito dele)."""
+    if projection and any(projection.values()) and sort not in projection:
+        return {**projection, sort: 1}
+    return projection
+
+
+def page_of(rows, sort, order, limit):
+    """Corta as `limit + 1` linhas buscadas em (página, cursor da próxima | None)."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(sort, order, rows[-1])
+
+
+def fetch_page(collection, filt, projection, sort, order, limit, position=None, page=1):
+    """
+    Uma página ordenada por (sort, _id) e o cursor da próxima (None na última).
+
+    Com `position` (vindo de `cursor_arg`) a página começa logo depois dela e o
+    custo não depende da profundidade; sem ela, cai no skip de `page`. Busca
+    uma linha a mais para saber se há próxima página.
+    """
+    cur = (collection.find(after(filt, sort, order, position), with_sort_field(projection, sort))
+           .sort(sort_spec(sort, order)))
+    if position is None:
+        cur = cur.skip((page-1)*limit)
+    return page_of(cur.limit(limit + 1), sort, order, limit)
+
+
+def plan_stages(plan):
+    """Estágios de um winningPlan, da raiz para as folhas (find clássico e SBE)."""
+    stages, todo = [], [plan.get("queryPlan", plan)]
+    while todo:
+        node = todo.pop(0)
+        if node.get("stage"):
+            stages.append((node["stage"], node.get("indexName")))
+        todo.extend(node.get("inputStages", []))
+        if node.get("inputStage"):
+            todo.append(node["inputStage"])
+    return stages
+
+
+def aggregate_plan(explained):
+    """Plano vencedor do explain de um aggregate (inteiro no find ou no `$cursor` do 1º estágio)."""
+    if "queryPlanner" in explained:
+        return explained["queryPlanner"]["winningPlan"]
+    return explained["stages"][0]["$cursor"]["queryPlanner"]["winningPlan"]
+
+
+def debug_plan(collection, filt, sort, order, limit, position, args, pipeline=None):
+    """
+    `{"plan": ...}` com o plano vencedor da página quando `?explain=1` e
+    LIST_EXPLAIN (ou o modo debug) estiverem ligados; `{}` nos outros casos.
+
+    Serve para conferir se a listagem usa índice (IXSCAN) ou varre a coleção
+    (COLLSCAN) e se a ordenação acontece em memória (SORT). Quando a página sai
+    de uma agregação, passe o `pipeline`: o explain é o dele, não o de um find.
+    """
+    if args.get("explain") not in ("1", "true"):
+        return {}
+    if not (current_app.debug or current_app.config.get("LIST_EXPLAIN")):
+        return {}
+    try:
+        if pipeline is not None:
+            explained = collection.database.command(
+                "aggregate", collection.name, pipeline=pipeline, explain=True)
+            stages = plan_stages(aggregate_plan(explained))
+        else:
+            explained = (collection.find(after(filt, sort, order, position))
+                         .sort(sort_spec(sort, order)).limit(limit + 1).explain())
+            stages = plan_stages(explained["queryPlanner"]["winningPlan"])
+    except Exception as e:  # mongomock e servidores sem explain
+        return {"plan": {"error": "explain_unavailable", "details": str(e)}}
+    names = [stage for stage, _ in stages]
+    return {"plan": {
+        "stages": names,
+        "indexes": [index for _, index in stages if index],
+        "collscan": "COLLSCAN" in names,
+        "in_memory_sort": "SORT" in names,
+    }}
+
+
+def filter_key(filt):
+    """Forma canônica do filtro: a mesma consulta com chaves em outra ordem cai na mesma entrada."""
+    return json_util.dumps(filt, sort_keys=True, json_options=CANONICAL_JSON_OPTIONS)
+
+
+def count_total(collection, filt, args):
+    """
+    Total da listagem, ou None com `?with_total=false`.
+
+    Sem filtro usa `estimated_document_count` (metadado da coleção); com filtro,
+    `count_documents`. O resultado fica em cache por TOTALS_TTL segundos, então
+    rolar a mesma listagem não reconta a coleção a cada página.
+    """
+    if (args.get("with_total") or "true").lower() in ("false", "0", "no"):
+        return None
+    key = (collection.full_name, filter_key(filt))
+    total = _TOTALS.get(key)
+    if total is None:
+        total = collection.count_documents(filt) if filt else collection.estimated_document_count()
+        _TOTALS.set(key, total, current_app.config.get("TOTALS_TTL", 30))
+    return total
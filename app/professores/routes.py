@@ -3,10 +3,17 @@ from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from pymongo.errors import DuplicateKeyError
+from pymongo import IndexModel
 import re
 
 from ..extensions import mongo
-from ..utils import oid, now, scrub, hash_password
+from ..utils import oid, now, hash_password
+from ..serializers import PROFESSOR, PROFESSOR_PUBLICO
+from ..loader import get_loader
+from ..pagination import page_args, fetch_page, count_total, debug_plan
+from ..search import PROFESSOR_BUSCA, SUGGEST, search_mode
+from ..recommender import RECOMMENDER, tokens
+from .. import geo
 
 bp = Blueprint("professores", __name__)
 
@@ -35,6 +42,23 @@ PROF_FIELDS = {
     "links"                  # {linkedin,github,site,...}
 }
 
+# Ordenações da listagem -> índice (declarado em INDEXES; criado por `flask db ensure-indexes`)
+SORT_KEYS = {
+    "created_at": [("created_at", -1), ("_id", -1)],
+    "media_avaliacoes": [("media_avaliacoes", -1), ("_id", -1)],
+}
+
+INDEXES = {"professores": [
+    IndexModel("email", unique=True),
+    # slug só é único entre os preenchidos: professores antigos ainda não têm
+    IndexModel("slug", unique=True, partialFilterExpression={"slug": {"$gt": ""}}),
+    *(IndexModel(keys) for keys in SORT_KEYS.values()),
+    # busca.*: texto dobrado com pesos (q) e igualdade em cidade/estado/area
+    *PROFESSOR_BUSCA.indexes(),
+    # near=/cep=: $geoNear sobre o ponto do CEP, já filtrando modalidades (Presencial)
+    IndexModel([(geo.FIELD, "2dsphere"), ("modalidades", 1)]),
+]}
+
 
 # ---------------------------
 # Helpers
@@ -144,6 +168,8 @@ def create():
     if senha:
         body["senha_hash"] = hash_password(senha)
 
+    body["busca"] = PROFESSOR_BUSCA.build(body)
+    geo.on_write(body)
     body["created_at"] = body["updated_at"] = now()
 
     try:
@@ -153,8 +179,10 @@ def create():
             return jsonify({"error": "email_already_exists"}), 409
         return jsonify({"error": "duplicate_key"}), 409
 
+    SUGGEST.put("professor", res.inserted_id, body.get("nome"))
+    RECOMMENDER.on_write(res.inserted_id, body)
     doc = mongo.db.professores.find_one({"_id": res.inserted_id}, {})
-    return jsonify(scrub(doc)), 201
+    return jsonify(PROFESSOR.one(doc)), 201
 
 
 @bp.get("/")
@@ -164,34 +192,93 @@ def list_():
     estado = request.args.get("estado")
     area = request.args.get("area")
     ensina = request.args.get("ensina")   # mapear para quer_ensinar
+    modalidades = request.args.get("modalidades")
     page = int(request.args.get("page", 1)); limit = int(request.args.get("limit", 10))
-    order = int(request.args.get("order", -1)); sort = request.args.get("sort", "created_at")
-
+    sort, order, position, err = page_args(request.args, SORT_KEYS)
+    if err:
+        return err
+    mode, err = search_mode(request.args)
+    if err:
+        return err
+    center, raio_km, err = geo.near_args(request.args)
+    if err:
+        return err
+    if center and ("sort" in request.args or "cursor" in request.args or (q and mode == "text")):
+        # $geoNear ordena por distância e não combina com $text
+        return jsonify({"error": "invalid_near", "msg": "near/cep não aceitam sort, cursor nem q em mode=text"}), 400
+
+    # campos dobrados em `busca` (sem acento, minúsculos): "matematica" acha "Matemática"
     filt = {}
     if q:
-        regex = {"$regex": q, "$options": "i"}
-        filt["$or"] = [
-            {"nome": regex},
-            {"email": regex},
-            {"bio": regex},
-            {"historico_academico_profissional": regex},
-            {"especializacoes": regex},
-            {"quer_ensinar": regex},
-            {"skills.nome": regex},
-        ]
-    if cidade: filt["endereco.cidade"] = {"$regex": f"^{cidade}$", "$options": "i"}
-    if estado: filt["endereco.estado"] = {"$regex": f"^{estado}$", "$options": "i"}
+        filt.update(PROFESSOR_BUSCA.filter(q, mode))
+    if cidade: filt.update(PROFESSOR_BUSCA.exact("cidade", cidade))
+    if estado: filt.update(PROFESSOR_BUSCA.exact("estado", estado))
     if area:
-        filt["area"] = {"$regex": f"^{area}$", "$options": "i"}
+        filt.update(PROFESSOR_BUSCA.exact("area", area))
     if ensina:
         filt["quer_ensinar"] = {"$regex": ensina, "$options": "i"}
-
-    cur = (mongo.db.professores.find(filt, {})
-           .sort(sort, order)
-           .skip((page-1)*limit)
-           .limit(limit))
-    total = mongo.db.professores.count_documents(filt)
-    return jsonify({"data": [scrub(d) for d in cur], "total": total, "page": page, "limit": limit})
+    if modalidades:
+        filt["modalidades"] = modalidades
+
+    # listagem resumida por padrão; ?view=full ou ?fields=a,b viram projeção no Mongo
+    projection, err = PROFESSOR.projection(request.args)
+    if err:
+        return err
+
+    if center:
+        return list_near(filt, projection, center, raio_km, page, limit)
+
+    rows, next_cursor = fetch_page(mongo.db.professores, filt, projection, sort, order, limit, position, page)
+    total = count_total(mongo.db.professores, filt, request.args)
+    return jsonify({"data": PROFESSOR.many(rows, projection), "total": total, "page": page, "limit": limit,
+                    "next_cursor": next_cursor,
+                    **debug_plan(mongo.db.professores, filt, sort, order, limit, position, request.args)})
+
+
+def list_near(filt, projection, center, raio_km, page, limit):
+    """Professores no raio de `center`, do mais perto ao mais longe (paginação por page)."""
+    pipeline = geo.near_pipeline(center, raio_km, filt, projection, (page - 1) * limit, limit)
+    rows = PROFESSOR.many(mongo.db.professores.aggregate(pipeline), projection)
+    for row in rows:
+        row["distancia_km"] = round(row["distancia_km"], 2)
+        # ponto do professor vindo só da região do CEP: a distância é aproximada
+        row["distancia_aproximada"] = geo.approximate(row)
+    total = count_total(mongo.db.professores, {**filt, **geo.within(center, raio_km)}, request.args)
+    return jsonify({"data": rows, "total": total, "page": page, "limit": limit, "next_cursor": None})
+
+
+@bp.route("/recomendar", methods=["GET", "POST"])
+def recomendar():
+    """
+    "Agente" de recomendação: professores mais próximos de uma descrição livre do
+    aluno (`texto`, na query ou no JSON), pelo cosseno TF-IDF sobre bio, headline,
+    especializações, o que ensina e skills. Perfis privados ficam de fora.
+    """
+    data = request.get_json(silent=True) or {}
+    texto = (request.args.get("texto") or data.get("texto") or "").strip()
+    if not texto:
+        return jsonify({"error": "missing_texto"}), 400
+    if not RECOMMENDER.available:
+        return jsonify({"error": "recommender_unavailable"}), 503
+    try:
+        limit = min(max(int(request.args.get("limit", data.get("limit", 10))), 1), 50)
+    except (TypeError, ValueError):
+        return jsonify({"error": "invalid_limit"}), 400
+
+    # folga para os privados, filtrados na leitura
+    ranked = RECOMMENDER.recommend(texto, limit * 2)
+    notas = {_id: nota for _id, nota in ranked}
+    docs = {
+        str(d["_id"]): d for d in mongo.db.professores.find(
+            {"_id": {"$in": [oid(i) for i in notas]}, "visibilidade": {"$ne": "privado"}},
+            PROFESSOR.summary(),
+        )
+    }
+    ordem = [i for i, _ in ranked if i in docs][:limit]
+    out = PROFESSOR.many(docs[i] for i in ordem)
+    for doc, i in zip(out, ordem):
+        doc["score"] = round(notas[i], 4)
+    return jsonify({"data": out, "termos": tokens(texto)})
 
 
 @bp.get("/<id>")
@@ -199,10 +286,13 @@ def get_(id):
     _id = oid(id)
     if not _id:
         return jsonify({"error": "invalid_id"}), 400
-    doc = mongo.db.professores.find_one({"_id": _id}, {})
+    projection, err = PROFESSOR.projection(request.args, default="full")
+    if err:
+        return err
+    doc = mongo.db.professores.find_one({"_id": _id}, projection)
     if not doc:
         return jsonify({"error": "not_found"}), 404
-    return jsonify(scrub(doc))
+    return jsonify(PROFESSOR.one(doc, projection))
 
 
 @bp.get("/me")
@@ -233,11 +323,11 @@ def get_me():
     if user_tipo not in ["professor", "prof"]:
         return jsonify({"error": "forbidden", "msg": "Acesso permitido apenas para professores"}), 403
 
-    doc = mongo.db.professores.find_one({"_id": _id}, {})
+    doc = mongo.db.professores.find_one({"_id": _id}, PROFESSOR.full())
     if not doc:
         return jsonify({"error": "not_found"}), 404
 
-    return jsonify(scrub(doc))
+    return jsonify(PROFESSOR.one(doc))
 
 
 @bp.put("/me")
@@ -290,7 +380,8 @@ def update_me():
             body["valor_hora"] = vh
 
     # slug updates
-    doc_atual = mongo.db.professores.find_one({"_id": _id}, {"nome": 1, "slug": 1})
+    # as origens da busca vêm junto: recalcular `busca` não custa outra leitura
+    doc_atual = mongo.db.professores.find_one({"_id": _id}, {"slug": 1, **PROFESSOR_BUSCA.sources()})
     if "slug" in body and body["slug"]:
         base = slugify(body["slug"])
         new_slug = base
@@ -319,13 +410,18 @@ def update_me():
     if not body:
         return jsonify({"error": "no_fields_to_update"}), 400
 
+    PROFESSOR_BUSCA.on_write(mongo.db.professores, _id, body, current=doc_atual or {})
+    geo.on_write(body)
     body["updated_at"] = now()
     r = mongo.db.professores.update_one({"_id": _id}, {"$set": body})
     if r.matched_count == 0:
         return jsonify({"error": "not_found"}), 404
+    if "nome" in body:
+        SUGGEST.put("professor", _id, body["nome"])
+    RECOMMENDER.on_write(_id, body, current=doc_atual)
 
     doc = mongo.db.professores.find_one({"_id": _id}, {})
-    return jsonify(scrub(doc))
+    return jsonify(PROFESSOR.one(doc))
 
 
 @bp.put("/<id>")
@@ -351,7 +447,8 @@ def update(id):
             body["valor_hora"] = vh
 
     # slug handling
-    doc_atual = mongo.db.professores.find_one({"_id": _id}, {"nome": 1, "slug": 1})
+    # as origens da busca vêm junto: recalcular `busca` não custa outra leitura
+    doc_atual = mongo.db.professores.find_one({"_id": _id}, {"slug": 1, **PROFESSOR_BUSCA.sources()})
     if "slug" in body and body["slug"]:
         base = slugify(body["slug"])
         new_slug = base
@@ -380,13 +477,18 @@ def update(id):
     if not body:
         return jsonify({"error": "no_fields_to_update"}), 400
 
+    PROFESSOR_BUSCA.on_write(mongo.db.professores, _id, body, current=doc_atual or {})
+    geo.on_write(body)
     body["updated_at"] = now()
     r = mongo.db.professores.update_one({"_id": _id}, {"$set": body})
     if r.matched_count == 0:
         return jsonify({"error": "not_found"}), 404
+    if "nome" in body:
+        SUGGEST.put("professor", _id, body["nome"])
+    RECOMMENDER.on_write(_id, body, current=doc_atual)
 
     doc = mongo.db.professores.find_one({"_id": _id}, {})
-    return jsonify(scrub(doc))
+    return jsonify(PROFESSOR.one(doc))
 
 
 @bp.delete("/<id>")
@@ -396,7 +498,11 @@ def delete(id):
     if not _id:
         return jsonify({"error": "invalid_id"}), 400
     r = mongo.db.professores.delete_one({"_id": _id})
-    return ("", 204) if r.deleted_count else (jsonify({"error": "not_found"}), 404)
+    if not r.deleted_count:
+        return jsonify({"error": "not_found"}), 404
+    SUGGEST.remove("professor", _id)
+    RECOMMENDER.on_delete(_id)
+    return ("", 204)
 
 
 # ----------- Perfil público por slug (sem JWT) ----------- 
@@ -404,7 +510,7 @@ def delete(id):
 @bp.route("/slug/<slug>/", methods=["GET"])   # aceita a barra final também
 def get_public_by_slug(slug):
     # Primeiro tenta buscar pelo slug exato
-    doc = mongo.db.professores.find_one({"slug": slug, "visibilidade": {"$ne": "privado"}}, {})
+    doc = mongo.db.professores.find_one({"slug": slug, "visibilidade": {"$ne": "privado"}}, PROFESSOR_PUBLICO.full())
 
     # Se não encontrou pelo slug, tenta buscar professores sem slug e comparar normalizado
     if not doc:
@@ -438,9 +544,7 @@ def get_public_by_slug(slug):
         mongo.db.professores.update_one({"_id": doc["_id"]}, {"$set": {"slug": novo_slug}})
         doc["slug"] = novo_slug
 
-    safe = scrub(doc)
-    safe.pop("cpf", None); safe.pop("telefone", None); safe.pop("email", None)
-    return jsonify(safe)
+    return jsonify(PROFESSOR_PUBLICO.one(doc))
 
 # ----------- Professores em alta (melhores avaliações) -----------
 @bp.route("/destaque", methods=["OPTIONS"], strict_slashes=False)
@@ -501,7 +605,10 @@ def get_em_alta():
             traceback.print_exc()
             return jsonify({"error": "aggregation_error", "details": str(agg_error)}), 500
         
-        # Buscar dados dos professores
+        # Buscar dados dos professores (um $in para todos, via loader da requisição)
+        prof_proj = {"senha_hash": 0, "cpf": 0, "telefone": 0}
+        refs = get_loader(mongo.db)
+        refs.want("professores", [item.get("_id") for item in avaliacoes_agregadas], prof_proj)
         professores_em_alta = []
         for item in avaliacoes_agregadas:
             prof_id = item.get("_id")
@@ -521,10 +628,10 @@ def get_em_alta():
                 print(f"[PROFESSORES DESTAQUE] Erro ao converter ObjectId: {str(oid_error)}")
                 continue
             
-            prof = mongo.db.professores.find_one({"_id": prof_id}, {"senha_hash": 0, "cpf": 0, "telefone": 0})
+            prof = refs.load("professores", prof_id, prof_proj)
             
             if prof and prof.get("visibilidade") != "privado":
-                prof_doc = scrub(prof)
+                prof_doc = PROFESSOR.one(prof)
                 prof_doc["nota_media"] = round(item["nota_media"], 1)
                 prof_doc["total_avaliacoes"] = item["total_avaliacoes"]
                 professores_em_alta.append(prof_doc)
@@ -1,7 +1,7 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from bson.objectid import ObjectId
-from app import create_app
+from app import create_app, geo
 from flask_jwt_extended import create_access_token
 
 flask_app = create_app()
@@ -53,7 +53,7 @@ def test_list_success(mock_mongo, client, auth_header):
     
     
     mock_mongo.db.professores.find.return_value = cursor
-    mock_mongo.db.professores.count_documents.return_value = len(professores)
+    mock_mongo.db.professores.estimated_document_count.return_value = len(professores)
 
     response = client.get("/api/professores/", headers=auth_header)
     assert response.status_code == 200, response.data
@@ -63,6 +63,151 @@ def test_list_success(mock_mongo, client, auth_header):
     assert body["data"][0]["nome"] == "João"
     assert body["data"][1]["nome"] == "Maria"
 
+@patch('app.search.text_search', return_value=True)   # servidor com índice de texto
+@patch('app.professores.routes.mongo')
+def test_list_busca_dobrada(mock_mongo, _text_search, client, auth_header):
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.skip.return_value = cursor
+    cursor.limit.return_value = []
+    mock_mongo.db.professores.find.return_value = cursor
+    mock_mongo.db.professores.count_documents.return_value = 0
+
+    response = client.get("/api/professores/?q=Matemática&cidade=São Paulo&estado=SP&area=Exatas",
+                          headers=auth_header)
+    assert response.status_code == 200
+    # sem regex: $text nos campos dobrados e igualdade nos filtros exatos
+    assert mock_mongo.db.professores.find.call_args[0][0] == {
+        "$text": {"$search": "matematica", "$language": "portuguese"},
+        "busca.cidade": "sao paulo",
+        "busca.estado": "sp",
+        "busca.area": "exatas",
+    }
+
+    assert client.get("/api/professores/?q=mat&mode=substring", headers=auth_header).status_code == 200
+    assert mock_mongo.db.professores.find.call_args[0][0]["$or"][0] == {"busca.nome": {"$regex": "mat"}}
+
+def test_list_busca_sem_text_no_banco(client, auth_header):
+    # DB_MODE=mock: sem $text, ?q= vai pela substring nos campos dobrados (e não dá 500)
+    from app.extensions import mongo
+    from app.search import PROFESSOR_BUSCA
+    mongo.db.professores.delete_many({})
+    for prof in ({"nome": "Ana", "especializacoes": ["Matemática"]}, {"nome": "Bia", "bio": "Física"}):
+        mongo.db.professores.insert_one({**prof, "busca": PROFESSOR_BUSCA.build(prof)})
+
+    response = client.get("/api/professores/?q=mat", headers=auth_header)
+    assert response.status_code == 200
+    assert [p["nome"] for p in response.get_json()["data"]] == ["Ana"]
+    assert client.get("/api/professores/?q=FÍS&mode=text", headers=auth_header).get_json()["total"] == 1
+
+
+@patch('app.professores.routes.mongo')
+def test_create_grava_campos_de_busca(mock_mongo, client):
+    oid = ObjectId()
+    mock_mongo.db.professores.count_documents.return_value = 0
+    mock_mongo.db.professores.find_one.return_value = {"_id": oid, "nome": "José"}
+    mock_mongo.db.professores.insert_one.return_value = MagicMock(inserted_id=oid)
+
+    response = client.post("/api/professores/", json={
+        "nome": "José Araújo", "email": "jose@example.com", "area": "Exatas",
+        "especializacoes": "Cálculo, Física", "endereco": {"cidade": "Ribeirão Preto", "estado": "SP"},
+    })
+    assert response.status_code == 201
+    busca = mock_mongo.db.professores.insert_one.call_args[0][0]["busca"]
+    assert busca["nome"] == "jose araujo"
+    assert busca["tags"] == "calculo fisica exatas"
+    assert busca["cidade"] == "ribeirao preto" and busca["area"] == "exatas"
+    assert "busca" not in response.get_json()
+
+@patch('app.professores.routes.mongo')
+def test_create_geocodifica_o_cep(mock_mongo, client):
+    oid = ObjectId()
+    mock_mongo.db.professores.count_documents.return_value = 0
+    mock_mongo.db.professores.find_one.return_value = {"_id": oid, "nome": "Rita"}
+    mock_mongo.db.professores.insert_one.return_value = MagicMock(inserted_id=oid)
+
+    response = client.post("/api/professores/", json={
+        "nome": "Rita", "email": "rita@example.com", "endereco": {"cep": "01310-100", "cidade": "São Paulo"},
+    })
+    assert response.status_code == 201
+    assert mock_mongo.db.professores.insert_one.call_args[0][0]["localizacao"] == {
+        "type": "Point", "coordinates": [-46.6333, -23.5505],
+    }
+
+@patch('app.search.text_search', return_value=True)   # servidor com índice de texto
+@patch('app.professores.routes.mongo')
+def test_list_near_ordena_por_distancia(mock_mongo, _text_search, client, auth_header, tmp_path):
+    mock_mongo.db.professores.aggregate.return_value = [
+        {"_id": ObjectId(), "nome": "Perto", "distancia_km": 1.23456, "localizacao_precisao": 8},
+        {"_id": ObjectId(), "nome": "Longe", "distancia_km": 8.9, "localizacao_precisao": 3},
+    ]
+    mock_mongo.db.professores.count_documents.return_value = 2
+
+    response = client.get("/api/professores/?near=-23.56,-46.65&raio_km=15&modalidades=Presencial&page=2&limit=5",
+                          headers=auth_header)
+    assert response.status_code == 200, response.data
+    body = response.get_json()
+    assert [(p["nome"], p["distancia_km"], p["distancia_aproximada"]) for p in body["data"]] == [
+        ("Perto", 1.23, False), ("Longe", 8.9, True)]
+    assert "localizacao_precisao" not in body["data"][0]
+    assert body["total"] == 2 and body["next_cursor"] is None
+
+    # $geoNear pelo índice 2dsphere, com o filtro de modalidade dentro do estágio
+    geo_near, skip, limit, project = mock_mongo.db.professores.aggregate.call_args[0][0]
+    assert geo_near["$geoNear"]["near"] == {"type": "Point", "coordinates": [-46.65, -23.56]}
+    assert geo_near["$geoNear"]["maxDistance"] == 15000
+    assert geo_near["$geoNear"]["query"] == {"modalidades": "Presencial"}
+    assert skip == {"$skip": 5} and limit == {"$limit": 5}
+    assert project["$project"]["distancia_km"] == 1 and project["$project"]["nome"] == 1
+    assert project["$project"]["localizacao_precisao"] == 1
+    contagem = mock_mongo.db.professores.count_documents.call_args[0][0]
+    assert contagem["localizacao"]["$geoWithin"]["$centerSphere"][0] == [-46.65, -23.56]
+    mock_mongo.db.professores.find.assert_not_called()
+
+    # cep= só vira centro com um prefixo fino: o arquivo do repositório só conhece regiões
+    response = client.get("/api/professores/?cep=20040-020&with_total=false", headers=auth_header)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "imprecise_cep" and response.get_json()["precisao"] == 2
+    dataset = tmp_path / "ceps.csv"
+    dataset.write_text("prefixo,cidade,uf,lat,lon\n20040,Rio de Janeiro,RJ,-22.9035,-43.1766\n", encoding="utf-8")
+    geo.CEPS.use(str(dataset))
+    try:
+        assert client.get("/api/professores/?cep=20040-020&with_total=false", headers=auth_header).status_code == 200
+    finally:
+        geo.CEPS.use(geo.CEP_DATASET)
+    assert mock_mongo.db.professores.aggregate.call_args[0][0][0]["$geoNear"]["near"]["coordinates"] == [-43.1766, -22.9035]
+
+    for query in ("near=abc", "near=100,0", "near=1,1&raio_km=0", "cep=99999999",
+                  "near=1,1&sort=created_at", "near=1,1&q=calculo"):
+        assert client.get(f"/api/professores/?{query}", headers=auth_header).status_code == 400, query
+
+@patch('app.professores.routes.mongo')
+def test_list_projecao_resumo_e_fields(mock_mongo, client, auth_header):
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.skip.return_value = cursor
+    cursor.limit.return_value = [{"_id": ObjectId(), "nome": "João"}]
+    mock_mongo.db.professores.find.return_value = cursor
+    mock_mongo.db.professores.estimated_document_count.return_value = 1
+
+    # listagem padrão: projeção de inclusão (resumo), sem campos sensíveis
+    assert client.get("/api/professores/", headers=auth_header).status_code == 200
+    projecao = mock_mongo.db.professores.find.call_args[0][1]
+    assert projecao["nome"] == 1 and "google_tokens" not in projecao and "senha_hash" not in projecao
+
+    # fields= vira a projeção do find (mais o campo de ordenação, usado no cursor)
+    response = client.get("/api/professores/?fields=nome,endereco.cidade", headers=auth_header)
+    assert response.status_code == 200
+    assert mock_mongo.db.professores.find.call_args[0][1] == {"nome": 1, "endereco.cidade": 1, "created_at": 1}
+
+    # campo fora da lista branca
+    response = client.get("/api/professores/?fields=nome,google_tokens", headers=auth_header)
+    assert response.status_code == 400
+    assert response.get_json()["invalid"] == ["google_tokens"]
+
+    response = client.get("/api/professores/?view=tudo", headers=auth_header)
+    assert response.status_code == 400
+
 @patch('app.professores.routes.mongo')
 def test_get_by_id_success(mock_mongo, client, auth_header):
     oid = ObjectId()
@@ -0,0 +1,260 @@
+import atexit
+import json
+import os
+import threading
+import click
+from bson import json_util
+from flask import current_app, has_request_context, request
+from pymongo import monitoring
+from .extensions import mongo
+from .indexes import db_cli, declared
+from .pagination import plan_stages
+from .utils import flock
+
+# comandos com filtro; getMore, insert, hello, createIndexes... não interessam
+FILTER_COMMANDS = ("find", "aggregate", "count", "distinct", "findAndModify", "update", "delete")
+MAX_SHAPES = 5000
+
+# operadores que, num índice, entram depois da ordenação (regra ESR)
+RANGE_OPS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$exists", "$regex", "$options"}
+
+RECORDER = None
+
+
+def shape_of(value):
+    """
+    Forma de um filtro: mantém campos e operadores e troca os valores por "?".
+
+    Regex ancorada vira "^?" e `$options` é mantido (ambos mudam o uso de índice);
+    listas de valores ($in) viram "?", listas de filtros ($or/$and) são ordenadas.
+    """
+    if isinstance(value, dict):
+        out = {}
+        for k, v in sorted(value.items()):
+            if k == "$regex":
+                out[k] = "^?" if str(getattr(v, "pattern", v)).startswith("^") else "?"
+            elif k == "$options":
+                out[k] = v
+            else:
+                out[k] = shape_of(v)
+        return out
+    if isinstance(value, (list, tuple)):
+        items = [shape_of(v) for v in value if isinstance(v, dict)]
+        return sorted(items, key=repr) if items else "?"
+    return "?"
+
+
+def query_of(name, cmd):
+    """(coleção, filtro, ordenação, projeção) de um comando, ou None se não tiver filtro."""
+    if name == "find":
+        return cmd["find"], cmd.get("filter") or {}, cmd.get("sort"), cmd.get("projection")
+    if name == "aggregate":
+        pipeline = cmd.get("pipeline") or []
+        filt = pipeline[0].get("$match", {}) if pipeline else {}
+        sort = next((st["$sort"] for st in pipeline if "$sort" in st), None)
+        return cmd["aggregate"], filt, sort, None
+    if name in ("count", "distinct"):
+        return cmd[name], cmd.get("query") or {}, None, None
+    if name == "findAndModify":
+        return cmd["findAndModify"], cmd.get("query") or {}, cmd.get("sort"), cmd.get("fields")
+    ops = cmd.get("updates" if name == "update" else "deletes") or []
+    if not ops:
+        return None
+    return cmd[name], ops[0].get("q") or {}, None, None
+
+
+class ShapeRecorder(monitoring.CommandListener):
+    """Agrega as consultas por forma (coleção, comando, filtro, ordenação, projeção).
+
+    Para cada forma guarda frequência, latência total/máxima, os endpoints que a
+    disparam e um exemplo com valores reais (usado no explain do relatório).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.shapes = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in FILTER_COMMANDS:
+            return
+        query = query_of(event.command_name, event.command)
+        if query is None:
+            return
+        coll, filt, sort, projection = query
+        sort = [[f, d] for f, d in (sort or {}).items()]
+        shape = {
+            "collection": coll,
+            "command": event.command_name,
+            "filter": shape_of(filt),
+            "sort": sort,
+            "projection": sorted(projection or {}),
+        }
+        key = json.dumps(shape, sort_keys=True)
+        endpoint = request.endpoint if has_request_context() else None
+        with self._lock:
+            self._pending[event.request_id] = (key, shape, endpoint, filt)
+
+    def succeeded(self, event):
+        with self._lock:
+            pending = self._pending.pop(event.request_id, None)
+            if pending is None:
+                return
+            key, shape, endpoint, filt = pending
+            entry = self.shapes.get(key)
+            if entry is None:
+                if len(self.shapes) >= MAX_SHAPES:
+                    return
+                entry = self.shapes[key] = {
+                    **shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "endpoints": [],
+                    "sample": json_util.dumps(filt),
+                }
+            ms = event.duration_micros / 1000
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            if endpoint and endpoint not in entry["endpoints"]:
+                entry["endpoints"].append(endpoint)
+
+    def failed(self, event):
+        with self._lock:
+            self._pending.pop(event.request_id, None)
+
+    def dump(self):
+        """
+        Soma o que foi gravado ao arquivo (execuções anteriores continuam contando).
+        Ler, somar e regravar acontece sob uma trava de arquivo: workers que saem
+        juntos somam um depois do outro, sem um sobrescrever as contagens do outro.
+        """
+        with self._lock:
+            shapes, self.shapes = self.shapes, {}
+        if not shapes:
+            return
+        with flock(f"{self.path}.lock"):
+            self._merge(shapes)
+
+    def _merge(self, shapes):
+        saved = load(self.path)
+        for key, entry in shapes.items():
+            old = saved.get(key)
+            if old:
+                entry["count"] += old["count"]
+                entry["total_ms"] += old["total_ms"]
+                entry["max_ms"] = max(entry["max_ms"], old["max_ms"])
+                entry["endpoints"] = sorted(set(entry["endpoints"]) | set(old["endpoints"]))
+                entry["sample"] = old["sample"]
+            saved[key] = entry
+        # arquivo temporário + os.replace: o relatório nunca lê um JSON pela metade
+        tmp = f"{self.path}.{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+def load(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def explain_flags(db, entry):
+    """Estágios do plano vencedor para o exemplo da forma, ou None se o banco não souber explicar."""
+    try:
+        cmd = {"find": entry["collection"], "filter": json_util.loads(entry["sample"])}
+        if entry["sort"]:
+            cmd["sort"] = {f: d for f, d in entry["sort"]}
+        explained = db.command("explain", cmd, verbosity="queryPlanner")
+        return [stage for stage, _ in plan_stages(explained["queryPlanner"]["winningPlan"])]
+    except Exception:
+        return None
+
+
+def suggest_index(filt, sort):
+    """
+    Índice composto sugerido pela regra ESR (igualdade, ordenação, faixa) e observações.
+
+    Regex sem âncora ou case-insensitive não usa limites de índice; `$or` precisa de
+    um índice por ramo. Esses campos ficam de fora da sugestão e viram observação.
+    """
+    eq, rng, notes = [], [], []
+    for field, cond in filt.items():
+        if field in ("$or", "$and", "$nor"):
+            notes.append(f"{field}: cada ramo precisa de um índice próprio")
+            continue
+        if field.startswith("$"):
+            continue
+        if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+            if "$regex" in cond and (cond["$regex"] != "^?" or "i" in str(cond.get("$options", ""))):
+                notes.append(f"{field}: regex sem âncora ou com 'i' varre o índice inteiro; "
+                             "avaliar índice de texto ou campo normalizado")
+                continue
+            if set(cond) <= {"$eq", "$in", "$all"}:
+                eq.append(field)
+            else:
+                rng.append(field)
+        else:
+            eq.append(field)
+    sort_fields = [f for f, _ in sort]
+    keys = [(f, 1) for f in eq]
+    keys += [(f, d) for f, d in sort if f not in eq]
+    keys += [(f, 1) for f in rng if f not in sort_fields]
+    return keys, notes
+
+
+def ranked(db, shapes, explain=True):
+    """Formas com COLLSCAN ou SORT em memória primeiro, depois por tempo total."""
+    rows = []
+    for entry in shapes.values():
+        stages = explain_flags(db, entry) if explain else None
+        problem = bool(stages) and ("COLLSCAN" in stages or "SORT" in stages)
+        rows.append((problem, entry["total_ms"], entry, stages))
+    rows.sort(key=lambda r: (r[0], r[1]), reverse=True)
+    return [(entry, stages) for _, _, entry, stages in rows]
+
+
+@db_cli.command("query-report")
+@click.option("--top", default=20, show_default=True, help="Quantas formas mostrar.")
+@click.option("--no-explain", is_flag=True, help="Não consulta o plano no banco.")
+def query_report(top, no_explain):
+    """Ranking das formas de consulta gravadas (QUERY_SHAPES) com sugestões de índice."""
+    path = current_app.config["QUERY_SHAPES_FILE"]
+    shapes = load(path)
+    if RECORDER is not None:
+        RECORDER.dump()
+        shapes = load(path)
+    if not shapes:
+        click.echo(f"Nenhuma forma gravada em {path} (ligue QUERY_SHAPES=true).")
+        return
+    existing = {
+        coll: [list(m.document["key"].items()) for m in models]
+        for coll, models in declared().items()
+    }
+    for entry, stages in ranked(mongo.db, shapes, explain=not no_explain)[:top]:
+        flags = ", ".join(s for s in ("COLLSCAN", "SORT") if stages and s in stages) or (
+            "plano indisponível" if stages is None else "ok")
+        avg = entry["total_ms"] / entry["count"]
+        click.echo(f"[{flags}] {entry['collection']}.{entry['command']} x{entry['count']} "
+                   f"média {avg:.1f}ms máx {entry['max_ms']:.1f}ms ({', '.join(entry['endpoints']) or '-'})")
+        click.echo(f"  filtro: {json.dumps(entry['filter'], ensure_ascii=False)}")
+        if entry["sort"]:
+            click.echo(f"  ordenação: {entry['sort']}")
+        if stages is None or "COLLSCAN" in stages or "SORT" in stages:
+            keys, notes = suggest_index(entry["filter"], entry["sort"])
+            if keys:
+                known = [list(map(tuple, k)) for k in existing.get(entry["collection"], [])]
+                hint = " (já declarado: rode flask db ensure-indexes)" if keys in known else ""
+                click.echo(f"  sugestão: IndexModel({keys}){hint}")
+            for note in notes:
+                click.echo(f"  obs: {note}")
+
+
+def init_app(app):
+    """Liga o gravador antes de o cliente do Mongo ser criado (listeners globais valem para os novos)."""
+    global RECORDER
+    if not app.config.get("QUERY_SHAPES") or RECORDER is not None:
+        return
+    RECORDER = ShapeRecorder(app.config["QUERY_SHAPES_FILE"])
+    monitoring.register(RECORDER)
+    atexit.register(RECORDER.dump)
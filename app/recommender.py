@@ -0,0 +1,515 @@
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+import click
+from .extensions import mongo
+from .indexes import db_cli
+from .search import field_values, fold
+from .utils import flock
+
+# campos do professor que entram no índice e o peso (repetição) de cada termo
+FIELDS = (
+    ("especializacoes", 2),
+    ("quer_ensinar", 2),
+    ("skills.nome", 2),
+    ("headline", 1),
+    ("bio", 1),
+)
+SOURCES = frozenset(f.split(".", 1)[0] for f, _ in FIELDS)
+
+TOKEN = re.compile(r"[a-z0-9]{2,}")
+STOPWORDS = frozenset("""
+a o as os um uma uns umas de da do das dos em na no nas nos e ou para pra por com sem
+que se ao aos sobre mais muito como eu me meu minha quero gostaria preciso aprender
+aula aulas ajuda professor professora alguem sou estou tenho ter ser bem ja tambem
+""".split())
+
+POINTER = "CURRENT"
+DELTA = "delta.jsonl"
+LOCK = "LOCK"
+
+
+def deps():
+    """numpy/scipy só no primeiro uso (o boot não paga o import); None se não estiverem instalados."""
+    try:
+        import numpy as np
+        from scipy import sparse
+    except ImportError:
+        return None
+    return np, sparse
+
+
+def tokens(text):
+    return [t for t in TOKEN.findall(fold(text)) if t not in STOPWORDS]
+
+
+def doc_terms(doc):
+    """Frequência ponderada dos termos dos campos indexados de um professor."""
+    terms = Counter()
+    for field, weight in FIELDS:
+        for value in field_values(doc, field):
+            for t in tokens(value):
+                terms[t] += weight
+    return terms
+
+
+class TfidfIndex:
+    """
+    Matriz TF-IDF (scipy CSR, linhas normalizadas) dos professores.
+
+    A nota de cada professor para uma descrição é o cosseno entre a linha dele e o
+    vetor da consulta: um único produto matriz esparsa x vetor. A matriz base só é
+    montada por `build` (todo o banco). Escritas de professor não mexem nela: viram
+    linhas de um delta em memória (`update`/`remove`, com o idf do momento) que
+    substituem as da base na consulta, até o próximo `build` incorporá-las.
+
+    Persistido em `path` como .npy (data/indices/indptr/df) + meta.json, numa pasta
+    por versão apontada por CURRENT: os workers abrem com mmap, sem recalcular, e
+    recarregam quando outro processo publica uma versão nova. As escritas são
+    acrescentadas ao delta.jsonl da versão (`record`, sob a trava LOCK entre
+    processos); cada worker aplica as linhas novas antes de consultar (`sync`).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.vocab = {}          # termo -> coluna
+        self.ids = []            # linha da base -> str(_id)
+        self.rows = {}           # str(_id) -> linha da base
+        self.df = None           # np.ndarray[int64], documentos por coluna
+        self.matrix = None       # csr da base (linhas x termos da base)
+        self.delta = {}          # str(_id) -> (colunas, valores) | None (removido)
+        self.count = 0           # professores no índice (base + delta)
+        self.version = None      # pasta carregada/gravada
+        self.offset = 0          # bytes do delta.jsonl já aplicados
+
+    @property
+    def ready(self):
+        return self.matrix is not None
+
+    def __len__(self):
+        return self.count
+
+    # ---- cálculo ----
+
+    def _idf(self, np):
+        return np.log((1 + self.count) / (1 + self.df)) + 1.0
+
+    def _vector(self, np, terms, idf):
+        """(colunas, valores) normalizados de uma linha: (1 + log tf) * idf."""
+        cols = [self.vocab[t] for t in terms if t in self.vocab]
+        if not cols:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        tf = np.array([terms[t] for t in terms if t in self.vocab], dtype=np.float64)
+        cols = np.array(cols, dtype=np.int32)
+        vals = (1.0 + np.log(tf)) * idf[cols]
+        order = np.argsort(cols)
+        vals = vals[order] / np.sqrt((vals ** 2).sum())
+        return cols[order], vals.astype(np.float32)
+
+    def build(self, docs):
+        """Monta a matriz inteira a partir dos documentos (com os campos de FIELDS)."""
+        np, sparse = deps()
+        counted = [(str(d["_id"]), doc_terms(d)) for d in docs]
+        vocab, df = {}, Counter()
+        for _, terms in counted:
+            for t in terms:
+                vocab.setdefault(t, len(vocab))
+            df.update(vocab[t] for t in terms)
+        with self._lock:
+            self._reset()
+            self.vocab = vocab
+            self.df = np.zeros(len(vocab), dtype=np.int64)
+            for col, n in df.items():
+                self.df[col] = n
+            self.ids = [_id for _id, _ in counted]
+            self.rows = {_id: i for i, _id in enumerate(self.ids)}
+            self.count = len(self.rows)
+            idf = self._idf(np)
+            data, indices, indptr = [], [], [0]
+            for _, terms in counted:
+                cols, vals = self._vector(np, terms, idf)
+                indices.append(cols)
+                data.append(vals)
+                indptr.append(indptr[-1] + len(cols))
+            self.matrix = sparse.csr_matrix(
+                (np.concatenate(data) if data else np.zeros(0, np.float32),
+                 np.concatenate(indices) if indices else np.zeros(0, np.int32),
+                 np.array(indptr, dtype=np.int64)),
+                shape=(len(self.ids), len(vocab)),
+            )
+
+    def _current_cols(self, _id):
+        """Colunas da linha em vigor de um professor (delta ou base), ou None se não estiver no índice."""
+        if _id in self.delta:
+            vec = self.delta[_id]
+            return None if vec is None else vec[0]
+        if _id in self.rows:
+            return self.matrix[self.rows[_id]].indices
+        return None
+
+    def _put(self, np, _id, terms):
+        """Troca a linha de um professor no delta (terms None = remover). Retorna se mudou."""
+        old = self._current_cols(_id)
+        if old is None and terms is None:
+            return False
+        if old is not None:
+            self.df[old] -= 1
+        if terms is None:
+            self.delta[_id] = None
+            self.count -= 1
+            return True
+        if old is None:
+            self.count += 1
+        novos = [t for t in terms if t not in self.vocab]
+        for t in novos:
+            self.vocab[t] = len(self.vocab)
+        if novos:
+            self.df = np.concatenate([self.df, np.zeros(len(novos), dtype=np.int64)])
+        self.df[[self.vocab[t] for t in terms]] += 1
+        self.delta[_id] = self._vector(np, terms, self._idf(np))
+        return True
+
+    def update(self, _id, doc):
+        """Recalcula (no delta em memória) a linha de um professor novo ou alterado."""
+        np, _ = deps()
+        with self._lock:
+            return self._put(np, str(_id), doc_terms(doc))
+
+    def remove(self, _id):
+        np, _ = deps()
+        with self._lock:
+            return self._put(np, str(_id), None)
+
+    def query(self, text, limit=10):
+        """[(str(_id), nota)] dos professores mais próximos da descrição, nota > 0."""
+        np, _ = deps()
+        with self._lock:
+            if not self.ready or not self.count:
+                return []
+            cols, vals = self._vector(np, Counter(tokens(text)), self._idf(np))
+            if not len(cols):
+                return []
+            q = np.zeros(len(self.vocab), dtype=np.float32)
+            q[cols] = vals
+            matrix, ids = self.matrix, self.ids
+            # linhas da base substituídas pelo delta ficam de fora; as do delta são poucas
+            hidden = [self.rows[i] for i in self.delta if i in self.rows]
+            extra = [(i, float(q[c] @ v)) for i, (c, v) in
+                     ((i, vec) for i, vec in self.delta.items() if vec is not None)]
+        scores = matrix @ q[:matrix.shape[1]]
+        scores[hidden] = 0
+        ranked = [(i, nota) for i, nota in extra if nota > 0]
+        k = min(limit, len(scores))
+        if k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ranked += [(ids[i], float(scores[i])) for i in top if scores[i] > 0 and ids[i] is not None]
+        ranked.sort(key=lambda item: -item[1])
+        return ranked[:limit]
+
+    # ---- disco ----
+
+    def _current(self):
+        try:
+            with open(os.path.join(self.path, POINTER), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _delta_file(self, version):
+        return os.path.join(self.path, version, DELTA)
+
+    def mark(self):
+        """(versão publicada, bytes do delta dela) no disco; chamar com a trava."""
+        version = self._current()
+        if version is None:
+            return None, 0
+        try:
+            return version, os.path.getsize(self._delta_file(version))
+        except OSError:
+            return version, 0
+
+    def save(self, carry=(None, 0)):
+        """
+        Publica a matriz base como versão nova, com o delta vazio (chamar logo após `build`,
+        com a trava). `carry` = `mark()` de antes do build: as escritas gravadas no delta
+        da versão antiga desde então passam para o delta da nova. O ponteiro troca com
+        os.replace: leitores nunca veem meia versão.
+        """
+        np, _ = deps()
+        with self._lock:
+            version = f"v{time.time_ns()}"
+            target = os.path.join(self.path, version)
+            os.makedirs(target)
+            m = self.matrix
+            np.save(os.path.join(target, "data.npy"), m.data)
+            np.save(os.path.join(target, "indices.npy"), m.indices)
+            np.save(os.path.join(target, "indptr.npy"), m.indptr)
+            np.save(os.path.join(target, "df.npy"), self.df)
+            with open(os.path.join(target, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"ids": self.ids, "terms": list(self.vocab), "shape": list(m.shape)}, f)
+            old, start = carry
+            pending = b""
+            if old is not None and old == self._current():
+                try:
+                    with open(self._delta_file(old), "rb") as f:
+                        f.seek(start)
+                        pending = f.read()
+                except OSError:
+                    pass
+            with open(self._delta_file(version), "wb") as f:
+                f.write(pending)
+            previous = self._current()
+            tmp = os.path.join(self.path, f"{POINTER}.{version}")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(version)
+            os.replace(tmp, os.path.join(self.path, POINTER))
+            self.version, self.offset = version, 0
+        self._replay()
+        # versões antigas: quem ainda tem mmap aberto continua lendo (o arquivo só some no close)
+        for name in os.listdir(self.path):
+            if name.startswith("v") and name not in (version, previous):
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def load(self):
+        """Abre a versão atual do disco com mmap (e aplica o delta); False se não houver nenhuma."""
+        np, sparse = deps()
+        version = self._current()
+        if not version:
+            return False
+        source = os.path.join(self.path, version)
+        try:
+            with open(os.path.join(source, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {n: np.load(os.path.join(source, f"{n}.npy"), mmap_mode="r")
+                      for n in ("data", "indices", "indptr", "df")}
+        except OSError:
+            return False
+        with self._lock:
+            self._reset()
+            self.vocab = {t: i for i, t in enumerate(meta["terms"])}
+            self.ids = meta["ids"]
+            self.rows = {_id: i for i, _id in enumerate(self.ids) if _id is not None}
+            self.count = len(self.rows)
+            # df muda a cada escrita: cópia em memória; a matriz fica no mmap
+            self.df = np.array(arrays["df"])
+            self.matrix = sparse.csr_matrix(
+                (arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(meta["shape"]), copy=False
+            )
+            self.version = version
+        self._replay()
+        return True
+
+    def _replay(self):
+        """Aplica as linhas do delta.jsonl gravadas depois de `offset` (só linhas completas)."""
+        np, _ = deps()
+        try:
+            with open(self._delta_file(self.version), "rb") as f:
+                f.seek(self.offset)
+                chunk = f.read()
+        except OSError:
+            return
+        end = chunk.rfind(b"\n") + 1
+        with self._lock:
+            for line in chunk[:end].splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    terms = entry["terms"]
+                    self._put(np, entry["id"], Counter(terms) if terms is not None else None)
+            self.offset += end
+
+    def stale(self):
+        """Outro processo publicou uma versão mais nova que a carregada?"""
+        return self.path is not None and self._current() not in (None, self.version)
+
+    def sync(self):
+        """Em dia com o disco (versão nova ou linhas novas do delta); False se ainda não há índice."""
+        if self.path is not None:
+            if (not self.ready or self.stale()) and not self.load():
+                return self.ready
+            if self.version:
+                self._replay()
+        return self.ready
+
+    def record(self, _id, terms):
+        """
+        Grava a escrita de um professor (terms None = remoção) no delta da versão e a
+        aplica em memória. Chamar com a trava entre processos e depois de `sync`: assim
+        nenhum worker grava sobre um delta que ainda não leu.
+        """
+        np, _ = deps()
+        _id = str(_id)
+        if self.path is not None and self.version:
+            line = json.dumps({"id": _id, "terms": None if terms is None else dict(terms)}) + "\n"
+            with open(self._delta_file(self.version), "ab") as f:
+                f.write(line.encode("utf-8"))
+            self._replay()
+        else:
+            with self._lock:
+                self._put(np, _id, terms)
+
+
+@contextmanager
+def file_lock(path):
+    """Trava exclusiva entre processos (flock em LOCK dentro de `path`)."""
+    if path is None:
+        yield
+        return
+    with flock(os.path.join(path, LOCK)):
+        yield
+
+
+class Recommender:
+    """
+    Índice TF-IDF do processo: abre a versão do disco, monta do banco na falta e segue as escritas.
+
+    Na requisição, uma escrita de professor só entra numa fila em memória; uma thread
+    do processo grava a fila no delta, um lote por trava de arquivo. O build lê o
+    banco fora das travas (consultas e escritas seguem enquanto isso) e o índice
+    novo entra no lugar do anterior de uma vez.
+    """
+
+    def __init__(self):
+        self.index = None
+        self._lock = threading.Lock()        # sync, gravação e troca do índice; nunca durante o build
+        self._building = threading.Lock()    # um build por vez
+        self._missed = None                  # escritas durante o build, para o índice novo
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.use(app.config.get("RECOMMENDER_DIR") or None)
+
+    def use(self, path):
+        """Troca a pasta do índice (a próxima consulta abre ou monta de novo)."""
+        self.flush()
+        with self._lock:
+            self.index = TfidfIndex(path)
+
+    @property
+    def available(self):
+        return self.index is not None and deps() is not None
+
+    def _loaded(self):
+        """Índice em memória e em dia com o disco, ou None (chamar com `_lock`)."""
+        index = self.index
+        return index if index.sync() else None
+
+    def recommend(self, text, limit=10):
+        with self._lock:
+            index = self._loaded()
+        return (index or self._build()).query(text, limit)
+
+    def _build(self):
+        """Monta do banco e troca o índice; quem pede durante o build espera por ele e o reaproveita."""
+        with self._building:
+            with self._lock:
+                index = self._loaded()
+                if index is not None:
+                    return index
+                path, self._missed = self.index.path, []
+            try:
+                fresh = rebuild(TfidfIndex(path))
+            except Exception:
+                with self._lock:
+                    self._missed = None
+                raise
+            with file_lock(path), self._lock:
+                # a leitura do banco pode ter passado antes delas (e sem versão não havia delta)
+                fresh.sync()
+                for _id, terms in self._missed:
+                    fresh.record(_id, terms)
+                self.index, self._missed = fresh, None
+            return fresh
+
+    def on_write(self, _id, body, current=None):
+        """
+        Após create/update de professor: enfileira a linha nova se `body` mexe num campo
+        indexado. Sem índice ainda não faz nada: o primeiro /recomendar monta do banco.
+        """
+        if not self.available or SOURCES.isdisjoint(body):
+            return
+        self._enqueue(_id, doc_terms({**(current or {}), **body}))
+
+    def on_delete(self, _id):
+        if self.available:
+            self._enqueue(_id, None)
+
+    def _enqueue(self, _id, terms):
+        self._queue.put((str(_id), terms))
+        # a thread não sobrevive ao fork do servidor: sobe no primeiro uso de cada processo
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._drain, name="recommender-writer", daemon=True)
+                self._writer.start()
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._apply(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _apply(self, batch):
+        try:
+            with file_lock(self.index.path), self._lock:
+                if self._missed is not None:
+                    self._missed.extend(batch)
+                index = self._loaded()
+                if index is not None:
+                    for _id, terms in batch:
+                        index.record(_id, terms)
+        except Exception as e:  # o índice nunca derruba a escrita; o próximo build corrige
+            print(f"[RECOMENDAR] falha ao gravar {len(batch)} escrita(s): {e}")
+
+    def flush(self):
+        """Espera as escritas enfileiradas chegarem ao índice."""
+        self._queue.join()
+
+
+def rebuild(index):
+    """
+    Monta o índice com os professores do banco e publica uma versão nova (se houver
+    pasta). É o que incorpora o delta à matriz base; a leitura do banco roda fora da
+    trava e as escritas gravadas enquanto isso passam para o delta da versão nova.
+    """
+    with file_lock(index.path):
+        carry = index.mark() if index.path else (None, 0)
+    index.build(mongo.db.professores.find({}, {f: 1 for f in SOURCES}))
+    if index.path:
+        with file_lock(index.path):
+            index.save(carry)
+    return index
+
+
+RECOMMENDER = Recommender()
+
+
+@db_cli.command("build-recommender")
+def build_recommender():
+    """Recalcula do zero a matriz TF-IDF do /api/professores/recomendar."""
+    if deps() is None:
+        raise click.ClickException("instale numpy e scipy (requirements.txt)")
+    index = rebuild(TfidfIndex(RECOMMENDER.index.path))
+    click.echo(f"{len(index)} professor(es), {len(index.vocab)} termo(s) em {index.path}")
+
+
+def init_app(app):
+    RECOMMENDER.init_app(app)
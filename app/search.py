@@ -0,0 +1,324 @@
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+import click
+from flask import current_app, jsonify
+from pymongo import IndexModel, UpdateOne
+from .extensions import mongo
+from .indexes import db_cli
+
+SEARCH_LANGUAGE = "portuguese"
+# buscas aceitas em ?mode= (ver AULAS.md)
+SEARCH_MODES = ("text", "substring")
+
+
+def fold(text):
+    """Texto para busca: sem acentos, minúsculo e com espaços simples ("São  Paulo" -> "sao paulo")."""
+    s = unicodedata.normalize("NFKD", str(text))
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return " ".join(s.casefold().split())
+
+
+def _values(value, parts):
+    """Strings em `parts` (caminho com pontos), descendo por listas e subdocumentos."""
+    if isinstance(value, list):
+        for item in value:
+            yield from _values(item, parts)
+    elif isinstance(value, dict):
+        if parts:
+            yield from _values(value.get(parts[0]), parts[1:])
+    elif value not in (None, ""):
+        # lista de tags simples no lugar de [{nome}] (ex.: skills vindas do formulário)
+        yield str(value)
+
+
+def field_values(doc, path):
+    """Valores (texto) de `path` em `doc`: "skills.nome" percorre a lista de skills."""
+    root, *rest = path.split(".")
+    return _values(doc.get(root), rest)
+
+
+class SearchFields:
+    """Campos normalizados de busca de uma coleção, guardados em `busca` a cada escrita.
+
+    `text` agrupa campos de origem em campos de texto com peso ({campo: (peso, origens)}),
+    cobertos por um único índice de texto; `exact` mapeia filtros de igualdade para a
+    origem ({filtro: origem}), gravados dobrados (`fold`) e com índice próprio.
+    """
+
+    FIELD = "busca"
+
+    def __init__(self, text, exact=None):
+        self._text = tuple((name, weight, tuple(srcs)) for name, (weight, srcs) in text.items())
+        self._exact = tuple((exact or {}).items())
+        sources = [s for _, _, srcs in self._text for s in srcs] + [s for _, s in self._exact]
+        self._roots = frozenset(s.split(".", 1)[0] for s in sources)
+
+    def build(self, doc):
+        """Subdocumento `busca` de um documento completo (ou do que se sabe dele)."""
+        out = {}
+        for name, _, srcs in self._text:
+            words = [fold(v) for src in srcs for v in field_values(doc, src)]
+            out[name] = " ".join(w for w in words if w)
+        for name, src in self._exact:
+            vals = [fold(v) for v in field_values(doc, src)]
+            out[name] = vals[0] if vals else None
+        return out
+
+    def touches(self, body):
+        return not self._roots.isdisjoint(body)
+
+    def sources(self):
+        """Projeção com os campos de origem (para quem já lê o documento antes do update)."""
+        return {r: 1 for r in self._roots}
+
+    def on_write(self, collection, _id, body, current=None):
+        """
+        Acrescenta `busca` ao $set de um update parcial que mexe em algum campo de origem.
+        Sem `current` (documento lido com `sources()`), lê só as origens do atual.
+        """
+        if not self.touches(body):
+            return body
+        if current is None:
+            current = collection.find_one({"_id": _id}, self.sources()) or {}
+        body[self.FIELD] = self.build({**current, **body})
+        return body
+
+    def indexes(self):
+        """Índice de texto com pesos sobre os campos de texto + um índice por filtro exato."""
+        text = IndexModel(
+            [(f"{self.FIELD}.{name}", "text") for name, _, _ in self._text],
+            weights={f"{self.FIELD}.{name}": weight for name, weight, _ in self._text},
+            default_language=SEARCH_LANGUAGE,
+            name=f"{self.FIELD}_text",
+        )
+        return [text, *(IndexModel(f"{self.FIELD}.{name}") for name, _ in self._exact)]
+
+    def filter(self, q, mode="text"):
+        """Filtro de `?q=`: $text sobre os campos dobrados, ou substring (regex, sem índice)."""
+        q = fold(q)
+        if mode == "substring":
+            regex = {"$regex": re.escape(q)}
+            return {"$or": [{f"{self.FIELD}.{name}": regex} for name, _, _ in self._text]}
+        return {"$text": {"$search": q, "$language": SEARCH_LANGUAGE}}
+
+    def exact(self, name, value):
+        """Filtro de igualdade (cidade, estado, area...) sobre o campo dobrado."""
+        return {f"{self.FIELD}.{name}": fold(value)}
+
+    def rebuild(self, collection, batch=500):
+        """Recalcula `busca` de toda a coleção (documentos anteriores aos campos normalizados)."""
+        ops, total = [], 0
+        for doc in collection.find({}, self.sources()):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {self.FIELD: self.build(doc)}}))
+            if len(ops) >= batch:
+                collection.bulk_write(ops, ordered=False)
+                total, ops = total + len(ops), []
+        if ops:
+            collection.bulk_write(ops, ordered=False)
+            total += len(ops)
+        return total
+
+
+# origens comuns aos perfis; o nome pesa mais que as tags, que pesam mais que o texto livre
+PROFESSOR_BUSCA = SearchFields(
+    text={
+        "nome": (10, ("nome",)),
+        "tags": (5, ("especializacoes", "quer_ensinar", "skills.nome", "area")),
+        "texto": (1, ("headline", "bio", "historico_academico_profissional", "email")),
+    },
+    exact={"cidade": "endereco.cidade", "estado": "endereco.estado", "area": "area"},
+)
+ALUNO_BUSCA = SearchFields(
+    text={
+        "nome": (10, ("nome",)),
+        "tags": (5, ("especializacoes", "quer_ensinar", "quer_aprender", "skills.nome")),
+        "texto": (1, ("headline", "bio", "email")),
+    },
+    exact={"cidade": "endereco.cidade", "estado": "endereco.estado"},
+)
+
+
+class PrefixIndex:
+    """
+    Índice de prefixos em memória para autocomplete (listas ordenadas + bisect).
+
+    Cada rótulo entra dobrado uma vez por início de palavra ("fisica quantica" e
+    "quantica"), então "quan" acha "Física Quântica". As chaves ficam numa lista
+    ordenada por tipo e por posição (começo do rótulo ou palavra do meio): uma
+    consulta é um bisect por lista e uma varredura até juntar `limit` candidatos,
+    sem ir ao banco e sem tropeçar em chaves de outros tipos. As rotas de escrita
+    mantêm o índice em dia com `put`/`remove`; `build` recarrega tudo do banco
+    (no boot e, com SUGGEST_TTL, periodicamente, para pegar escritas de outros
+    processos). Escritas durante um `build` são reaplicadas sobre o resultado.
+    """
+
+    # (tipo, coleção, campo do rótulo)
+    SOURCES = (
+        ("categoria", "categorias", "nome"),
+        ("aula", "aulas", "titulo"),
+        ("professor", "professores", "nome"),
+    )
+    KINDS = tuple(kind for kind, _, _ in SOURCES)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (tipo, palavra do meio?) -> [(chave dobrada, posição da palavra, tipo, id)], ordenada
+        self._keys = {}
+        self._entries = {}    # (tipo, id) -> (rótulo, [chaves])
+        self._replay = None   # escritas durante um build: [(tipo, id, rótulo | None)]
+        self.built_at = None
+
+    @staticmethod
+    def _keys_of(kind, _id, label):
+        words = fold(label).split()
+        return [(" ".join(words[i:]), i, kind, _id) for i in range(len(words))]
+
+    @staticmethod
+    def _list_of(key):
+        return key[2], key[1] > 0
+
+    def _remove(self, kind, _id):
+        entry = self._entries.pop((kind, _id), None)
+        for key in entry[1] if entry else ():
+            keys = self._keys.get(self._list_of(key), [])
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    def _put(self, kind, _id, label):
+        self._remove(kind, _id)
+        if not label:
+            return
+        keys = self._keys_of(kind, _id, label)
+        for key in keys:
+            insort(self._keys.setdefault(self._list_of(key), []), key)
+        self._entries[(kind, _id)] = (label, keys)
+
+    def put(self, kind, _id, label):
+        """Insere ou troca o rótulo de um documento."""
+        label = str(label).strip() if label else None
+        with self._lock:
+            self._put(kind, str(_id), label)
+            if self._replay is not None:
+                self._replay.append((kind, str(_id), label))
+
+    def remove(self, kind, _id):
+        with self._lock:
+            self._remove(kind, str(_id))
+            if self._replay is not None:
+                self._replay.append((kind, str(_id), None))
+
+    def suggest(self, prefix, limit=10, kinds=None):
+        """Rótulos com alguma palavra começando por `prefix` (começo do rótulo primeiro)."""
+        p = fold(prefix)
+        if not p or limit <= 0:
+            return []
+        found = {}
+        with self._lock:
+            # começos de rótulo antes; palavras do meio só se ainda faltar candidato
+            for inner in (False, True):
+                for kind in kinds or self.KINDS:
+                    keys = self._keys.get((kind, inner), ())
+                    i, n = bisect_left(keys, (p,)), 0
+                    while i < len(keys) and n < limit:
+                        key, pos, _, _id = keys[i]
+                        if not key.startswith(p):
+                            break
+                        if (kind, _id) not in found:
+                            found[(kind, _id)] = (pos, key, self._entries[(kind, _id)][0])
+                            n += 1
+                        i += 1
+                if len(found) >= limit:
+                    break
+        ranked = sorted(found.items(), key=lambda item: (item[1][0] > 0, len(item[1][2]), item[1][1]))
+        return [{"tipo": kind, "id": _id, "texto": label} for (kind, _id), (_, _, label) in ranked[:limit]]
+
+    def build(self, db):
+        """Recarrega o índice das coleções (só o campo do rótulo)."""
+        with self._lock:
+            if self._replay is not None:
+                return False  # já há um build em andamento
+            self._replay = []
+        try:
+            fresh = PrefixIndex()
+            for kind, coll, field in self.SOURCES:
+                for doc in db[coll].find({field: {"$type": "string"}}, {field: 1}):
+                    label, _id = doc[field].strip(), str(doc["_id"])
+                    if label:
+                        keys = self._keys_of(kind, _id, label)
+                        for key in keys:
+                            fresh._keys.setdefault(self._list_of(key), []).append(key)
+                        fresh._entries[(kind, _id)] = (label, keys)
+            for keys in fresh._keys.values():
+                keys.sort()  # uma ordenação no fim em vez de um insort por chave
+        except Exception as e:
+            print(f"[SUGGEST] falha ao montar o índice: {e}")
+            with self._lock:
+                self._replay = None
+            return False
+        with self._lock:
+            for kind, _id, label in self._replay:
+                fresh._put(kind, _id, label)
+            self._keys, self._entries = fresh._keys, fresh._entries
+            self._replay = None
+            self.built_at = time.monotonic()
+        return True
+
+    def refresh(self, db, ttl):
+        """Dispara um `build` em background se o índice tiver mais de `ttl` segundos."""
+        if ttl and self.built_at is not None and time.monotonic() - self.built_at > ttl:
+            self.built_at = time.monotonic()  # evita disparar outro enquanto este roda
+            threading.Thread(target=self.build, args=(db,), name="suggest-build", daemon=True).start()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+SUGGEST = PrefixIndex()
+
+
+def text_search():
+    """
+    O banco atende $text? Não com DB_MODE=mock (o mongomock não implementa o
+    operador) nem com SEARCH_TEXT=false (servidor sem os índices de texto).
+    """
+    return mongo.mode != "mock" and current_app.config.get("SEARCH_TEXT", True)
+
+
+def search_mode(args):
+    """
+    Lê `?mode=`; retorna (modo, erro). Sem $text (ver text_search) o modo "text"
+    vira "substring": a mesma busca por regex, em vez de um erro do banco.
+    """
+    mode = args.get("mode", "text")
+    if mode not in SEARCH_MODES:
+        return None, (jsonify({"error": "invalid_mode", "valid": list(SEARCH_MODES)}), 400)
+    if mode == "text" and not text_search():
+        mode = "substring"
+    return mode, None
+
+
+@db_cli.command("rebuild-search")
+def rebuild_search():
+    """Recalcula os campos de busca normalizados de alunos e professores."""
+    for name, fields in (("alunos", ALUNO_BUSCA), ("professores", PROFESSOR_BUSCA)):
+        click.echo(f"{name}: {fields.rebuild(mongo.db[name])} documento(s)")
+
+
+def init_app(app):
+    """Monta o índice de sugestões: já no boot com mongomock; em background com o banco real."""
+    if not app.config.get("SUGGEST_INDEX", True):
+        return
+    if mongo.mode == "mock":
+        SUGGEST.build(mongo.db)
+        return
+
+    def warm():
+        if mongo.wait_ready():
+            n = SUGGEST.build(mongo.db) and len(SUGGEST)
+            print(f"[SUGGEST] índice de sugestões com {n} rótulo(s)")
+
+    threading.Thread(target=warm, name="suggest-warm", daemon=True).start()
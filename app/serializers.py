@@ -0,0 +1,153 @@
+from flask import current_app, jsonify
+
+# representações aceitas em ?view=
+VIEWS = ("summary", "full")
+
+# metadados presentes em (quase) todo documento
+META_FIELDS = ("created_at", "updated_at")
+
+
+class Serializer:
+    """Serializador de um recurso, montado uma vez (no import) a partir da sua definição.
+
+    Em uma única passada sobre o documento descarta os campos sensíveis, aplica os
+    defaults e, se `rename` for dado, seleciona/renomeia campos (saída -> origem).
+    Devolve um dict novo sem alterar o documento de entrada. SHOW_HASH é lido uma
+    vez por chamada de `one`/`many`, não por documento; ObjectId e datetime ficam
+    para o JSONProvider.
+
+    Cada recurso também define as projeções do Mongo das suas representações:
+    `summary` (campos das listagens) e `full` (tudo menos os campos ocultos), além
+    da lista branca de campos aceitos em `?fields=`. `refs` são as referências
+    (id_*) que as rotas usam para embutir relações: vão sempre ao banco.
+    """
+
+    def __init__(self, hidden=(), defaults=None, rename=None, summary=None, selectable=(), refs=()):
+        base = frozenset(hidden) | {"senha"}
+        self._hidden = {True: tuple(base), False: tuple(base | {"senha_hash"})}
+        self._defaults = tuple((defaults or {}).items())
+        self._rename = tuple(rename.items()) if rename else None
+        self._summary = {f: 1 for f in summary} if summary else None
+        roots = {f.split(".", 1)[0] for f in (*selectable, *(summary or ()), *META_FIELDS)}
+        self._selectable = frozenset(roots) - base - {"senha_hash"}
+        self._refs = tuple(refs)
+
+    def _hidden_now(self):
+        return self._hidden[bool(current_app.config.get("SHOW_HASH", False))]
+
+    def _defaults_for(self, projection):
+        # numa projeção de inclusão só entram os defaults dos campos pedidos
+        if projection and any(projection.values()):
+            return tuple((k, v) for k, v in self._defaults if k in projection)
+        return self._defaults
+
+    def _apply(self, doc, hidden, defaults):
+        if self._rename:
+            out = {dst: doc.get(src) for dst, src in self._rename}
+        else:
+            # cópia em C + remoção dos poucos campos ocultos: mais barato que filtrar chave a chave
+            out = dict(doc)
+            for k in hidden:
+                out.pop(k, None)
+        for k, v in defaults:
+            if not out.get(k):
+                out[k] = v
+        return out
+
+    def one(self, doc, projection=None):
+        if not doc:
+            return doc
+        return self._apply(doc, self._hidden_now(), self._defaults_for(projection))
+
+    def many(self, docs, projection=None):
+        hidden = self._hidden_now()
+        defaults = self._defaults_for(projection)
+        return [self._apply(d, hidden, defaults) for d in docs]
+
+    def full(self):
+        """Projeção da representação completa: tudo menos os campos ocultos."""
+        return {f: 0 for f in self._hidden_now()}
+
+    def summary(self):
+        """Projeção da representação resumida (listagens)."""
+        return dict(self._summary) if self._summary else self.full()
+
+    def fetch(self, projection):
+        """Projeção a mandar ao banco: numa inclusão, acrescenta as referências do recurso."""
+        if projection and any(projection.values()):
+            return {**projection, **{r: 1 for r in self._refs if r not in projection}}
+        return projection
+
+    def selects(self, field):
+        """O campo (ou subcampo `a.b`) está na lista branca do recurso?"""
+        return field.split(".", 1)[0] in self._selectable
+
+    def projection(self, args, default="summary"):
+        """
+        Projeção pedida na query string: `fields=a,b` (lista branca do recurso,
+        com subcampos como `endereco.cidade`) ou `view=summary|full`.
+        Retorna (projeção, erro).
+        """
+        raw = (args.get("fields") or "").strip()
+        if raw:
+            fields = [f.strip() for f in raw.split(",") if f.strip()]
+            # `endereco` já traz `endereco.cidade`; pedir os dois colide no Mongo
+            fields = [f for f in fields if "." not in f or f.split(".", 1)[0] not in fields]
+            invalid = [f for f in fields if not self.selects(f)]
+            if invalid or not fields:
+                return None, (jsonify({"error": "invalid_fields", "invalid": invalid, "allowed": sorted(self._selectable)}), 400)
+            return {f: 1 for f in fields}, None
+
+        view = args.get("view", default)
+        if view not in VIEWS:
+            return None, (jsonify({"error": "invalid_view", "valid": list(VIEWS)}), 400)
+        return (self.full() if view == "full" else self.summary()), None
+
+
+# Campos de perfil comuns a alunos e professores
+PERFIL_FIELDS = (
+    "nome", "email", "telefone", "cpf", "bio", "data_nascimento", "endereco",
+    "slug", "headline", "avatar_url", "banner_url", "visibilidade",
+    "especializacoes", "quer_ensinar", "skills", "modalidades", "valor_hora",
+    "disponibilidade", "experiencias", "formacao", "certificacoes", "idiomas",
+    "projetos", "links", "media_avaliacoes",
+)
+PERFIL_RESUMO = (
+    "nome", "email", "slug", "headline", "avatar_url", "bio", "endereco.cidade",
+    "endereco.estado", "especializacoes", "quer_ensinar", "modalidades",
+    "valor_hora", "media_avaliacoes", "visibilidade", "created_at",
+)
+
+# `busca` (campos normalizados, ver search.py) é interno: nunca vai na resposta
+ALUNO = Serializer(
+    hidden=("busca",),
+    summary=PERFIL_RESUMO + ("quer_aprender",),
+    selectable=PERFIL_FIELDS + ("interesse", "quer_aprender", "avaliacoes"),
+)
+# perfil público (por slug e nas relações das listagens abertas): sem dados de contato
+CONTATO_FIELDS = ("cpf", "telefone", "email")
+PERFIL_PUBLICO = tuple(f for f in PERFIL_FIELDS if f not in CONTATO_FIELDS)
+ALUNO_PUBLICO = Serializer(hidden=("busca", *CONTATO_FIELDS), selectable=PERFIL_PUBLICO + ("quer_aprender",))
+PROFESSOR = Serializer(
+    hidden=("busca", "google_tokens"),
+    summary=PERFIL_RESUMO + ("area",),
+    selectable=PERFIL_FIELDS + ("area", "saldo", "historico_academico_profissional"),
+)
+PROFESSOR_PUBLICO = Serializer(hidden=("busca", "google_tokens", *CONTATO_FIELDS), selectable=PERFIL_PUBLICO + ("area",))
+AULA = Serializer(
+    defaults={"status": "disponivel"},
+    summary=("titulo", "descricao_aula", "preco_decimal", "status", "id_professor", "id_categoria", "created_at"),
+    refs=("id_professor", "id_categoria"),
+)
+CATEGORIA = Serializer(summary=("nome", "aulas_count", "created_at"))
+AGENDA = Serializer(
+    summary=("id_aluno", "id_professor", "id_aula", "data_hora", "status", "observacoes",
+             "meet_link", "calendar_status", "created_at"),
+    selectable=("calendar_event_id", "calendar_htmlLink", "calendar_error"),
+    refs=("id_aluno", "id_professor", "id_aula"),
+)
+AVALIACAO = Serializer(
+    summary=("id_aluno", "id_aula", "id_prof", "nota", "texto", "created_at"),
+    refs=("id_aluno", "id_aula", "id_prof"),
+)
+MENSAGEM = Serializer(rename={"id": "_id", "text": "text", "from": "from", "created_at": "created_at"})
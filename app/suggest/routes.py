@@ -0,0 +1,31 @@
+from flask import Blueprint, current_app, jsonify, request
+from ..extensions import mongo
+from ..search import SUGGEST
+
+bp = Blueprint("suggest", __name__)
+
+TIPOS = tuple(kind for kind, _, _ in SUGGEST.SOURCES)
+MAX_LIMIT = 50
+
+
+@bp.get("/suggest")
+def suggest():
+    """
+    Autocomplete das caixas de busca: categorias, títulos de aulas e nomes de
+    professores que tenham uma palavra começando por `prefix` (sem acento e sem
+    diferenciar maiúsculas). Responde do índice em memória, sem consultar o banco.
+    """
+    prefix = (request.args.get("prefix") or "").strip()
+    if not prefix:
+        return jsonify({"error": "missing_prefix"}), 400
+    tipos = [t.strip() for t in (request.args.get("tipos") or "").split(",") if t.strip()]
+    invalid = [t for t in tipos if t not in TIPOS]
+    if invalid:
+        return jsonify({"error": "invalid_tipos", "invalid": invalid, "valid": list(TIPOS)}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), MAX_LIMIT)
+    except ValueError:
+        return jsonify({"error": "invalid_limit"}), 400
+
+    SUGGEST.refresh(mongo.db, current_app.config.get("SUGGEST_TTL", 0))
+    return jsonify({"prefix": prefix, "data": SUGGEST.suggest(prefix, limit, set(tipos) or None)})
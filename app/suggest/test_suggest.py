@@ -0,0 +1,101 @@
+import time
+import pytest
+from bson import ObjectId
+from app import create_app
+from app.extensions import mongo
+from app.search import SUGGEST, PrefixIndex
+
+
+@pytest.fixture
+def client():
+    app = create_app()
+    app.config["SUGGEST_TTL"] = 0
+    db = mongo.db
+    for coll in ("categorias", "aulas", "professores"):
+        db[coll].delete_many({})
+    db.categorias.insert_one({"nome": "Matemática"})
+    db.aulas.insert_many([{"titulo": "Física Quântica"}, {"titulo": "Cálculo I"}, {"titulo": None}])
+    db.professores.insert_one({"nome": "Maria Quintana"})
+    SUGGEST.build(db)
+    return app.test_client()
+
+
+def test_suggest_por_inicio_de_palavra_sem_acento(client):
+    resp = client.get("/api/search/suggest?prefix=QUA")
+    assert resp.status_code == 200
+    assert [s["texto"] for s in resp.get_json()["data"]] == ["Física Quântica"]
+
+    data = client.get("/api/search/suggest?prefix=ma").get_json()["data"]
+    assert [(s["tipo"], s["texto"]) for s in data] == [("categoria", "Matemática"), ("professor", "Maria Quintana")]
+
+    data = client.get("/api/search/suggest?prefix=q&tipos=professor").get_json()["data"]
+    assert [s["texto"] for s in data] == ["Maria Quintana"]
+
+    assert client.get("/api/search/suggest?prefix=").status_code == 400
+    resp = client.get("/api/search/suggest?prefix=a&tipos=aluno")
+    assert resp.get_json()["invalid"] == ["aluno"]
+
+
+def test_rotas_de_escrita_atualizam_o_indice(client):
+    resp = client.post("/api/categorias/", json={"nome": "Química Orgânica"})
+    assert resp.status_code == 201
+    cat_id = resp.get_json()["_id"]
+    assert [s["id"] for s in SUGGEST.suggest("organ")] == [cat_id]
+
+    client.put(f"/api/categorias/{cat_id}", json={"nome": "Bioquímica"})
+    assert SUGGEST.suggest("organ") == []
+    assert [s["texto"] for s in SUGGEST.suggest("bioq")] == ["Bioquímica"]
+
+    assert client.delete(f"/api/categorias/{cat_id}").status_code == 204
+    assert SUGGEST.suggest("bioq") == []
+
+
+def test_build_reaplica_escritas_concorrentes():
+    index = PrefixIndex()
+
+    class Db:
+        def __getitem__(self, name):
+            return self
+
+        def find(self, filt, projection):
+            # uma escrita chega enquanto o build lê o banco
+            if not index._replay:
+                index.put("aula", "nova", "Álgebra Linear")
+            field, = projection
+            return [{"_id": ObjectId(), field: "Geometria"}]
+
+    assert index.build(Db())
+    assert [s["texto"] for s in index.suggest("alg")] == ["Álgebra Linear"]
+    assert len(index) == 4
+
+
+def test_tipos_e_comecos_de_rotulo_alem_das_primeiras_chaves():
+    index = PrefixIndex()
+    for i in range(300):
+        index.put("aula", f"a{i}", f"Matematica basica {i}")
+        index.put("aula", f"b{i}", f"Algebra e matematica {i}")
+    index.put("professor", "p1", "Matheus Souza")
+    index.put("aula", "curta", "Mat")
+
+    assert [s["texto"] for s in index.suggest("mat", 10, {"professor"})] == ["Matheus Souza"]
+    # começo de rótulo vence palavra do meio; o mais curto primeiro
+    data = index.suggest("mat", 5)
+    assert data[0]["texto"] == "Mat" and all(not s["texto"].startswith("Algebra") for s in data)
+    assert len(index.suggest("mate", 50)) == 50
+
+
+def test_suggest_sub_milissegundo():
+    class Db:
+        def __getitem__(self, name):
+            return self
+
+        def find(self, filt, projection):
+            field, = projection
+            return ({"_id": i, field: f"Aula {i} de Cálculo Diferencial turma {i % 97}"} for i in range(5000))
+
+    index = PrefixIndex()
+    assert index.build(Db())
+    inicio = time.perf_counter()
+    for _ in range(200):
+        assert index.suggest("calc", limit=10)
+    assert (time.perf_counter() - inicio) / 200 < 0.001
@@ -0,0 +1,37 @@
+from unittest.mock import MagicMock
+from app.geo import CepIndex, approximate, geocode, on_write, rebuild
+
+
+def test_prefixo_mais_longo(tmp_path):
+    dataset = tmp_path / "ceps.csv"
+    dataset.write_text("prefixo,cidade,uf,lat,lon\n01,São Paulo,SP,-23.5,-46.6\n01310,Bela Vista,SP,-23.56,-46.65\n",
+                       encoding="utf-8")
+    ceps = CepIndex(str(dataset))
+    assert ceps.lookup("01310-100") == (-23.56, -46.65)
+    assert ceps.lookup("01001000") == (-23.5, -46.6)
+    assert ceps.lookup("99999-999") is None
+    assert ceps.lookup("0131") is None and ceps.lookup(None) is None
+    # a precisão é o tamanho do prefixo casado
+    assert ceps.locate("01310-100") == (-23.56, -46.65, 5) and ceps.locate("01001000")[2] == 2
+
+
+def test_geocode_do_endereco():
+    assert geocode({"cep": "30130-000"}) == {"type": "Point", "coordinates": [-43.9345, -19.9167]}
+    assert geocode({"cidade": "Belo Horizonte"}) is None and geocode(None) is None
+    # trocar o endereço por um sem CEP conhecido limpa o ponto (fora do índice 2dsphere)
+    assert on_write({"endereco": {"cep": "00000-000"}})["localizacao"] is None
+    # o arquivo do repositório só conhece regiões: o ponto fica marcado como aproximado
+    body = on_write({"endereco": {"cep": "30130-000"}})
+    assert body["localizacao_precisao"] == 2 and approximate(body) and "localizacao_precisao" not in body
+    assert not approximate({"localizacao_precisao": 8})
+    assert "localizacao" not in on_write({"nome": "Ana"})
+
+
+def test_rebuild_em_lotes():
+    collection = MagicMock()
+    collection.find.return_value = [{"_id": i, "endereco": {"cep": "80010-000"}} for i in range(5)]
+    assert rebuild(collection, batch=2) == 5
+    assert collection.bulk_write.call_count == 3
+    op = collection.bulk_write.call_args_list[0][0][0][0]
+    assert op._doc == {"$set": {"localizacao": {"type": "Point", "coordinates": [-49.2733, -25.4284]},
+                                "localizacao_precisao": 2}}
@@ -0,0 +1,60 @@
+import mongomock
+from pymongo import IndexModel
+from app import create_app
+from app.indexes import apply, declared, plan
+
+
+def test_indices_do_caminho_quente_declarados():
+    names = {coll: {m.document["name"] for m in models} for coll, models in declared().items()}
+    assert "conversation_id_1_created_at_1" in names["messages"]
+    assert "members_1_updated_at_-1" in names["conversations"]
+    assert "id_aula_1_status_1" in names["agenda"]
+    assert "slug_1" in names["alunos"] and "slug_1" in names["professores"]
+
+
+def test_plano_cria_recria_e_aponta_extras():
+    db = mongomock.MongoClient().db
+    db.aulas.create_index("status", unique=True)   # definição diferente da declarada
+    db.aulas.create_index([("created_at", -1)])     # índice antigo, não declarado
+    registry = {"aulas": [IndexModel("status"), IndexModel([("created_at", -1), ("_id", -1)])]}
+
+    actions = [(coll, action, name) for coll, action, name, _ in plan(db, registry)]
+    assert actions == [
+        ("aulas", "recreate", "status_1"),
+        ("aulas", "create", "created_at_-1__id_-1"),
+        ("aulas", "extra", "created_at_-1"),
+    ]
+
+    apply(db, plan(db, registry))
+    assert [a[1] for a in plan(db, registry)] == ["extra"]
+    apply(db, plan(db, registry), prune=True)
+    assert plan(db, registry) == []
+    assert not db.aulas.index_information()["status_1"].get("unique")
+
+
+def test_create_app_nao_cria_indices_e_comando_aplica():
+    app = create_app()
+    from app.extensions import mongo
+    with app.app_context():
+        assert "members_1_updated_at_-1" not in mongo.db.conversations.index_information()
+    result = app.test_cli_runner().invoke(args=["db", "ensure-indexes"])
+    assert result.exit_code == 0, result.output
+    assert "+ conversations.members_1_updated_at_-1" in result.output
+    with app.app_context():
+        assert "members_1_updated_at_-1" in mongo.db.conversations.index_information()
+    again = app.test_cli_runner().invoke(args=["db", "ensure-indexes", "--dry-run"])
+    assert "Índices em dia." in again.output
+
+
+def test_indice_de_texto_compara_pesos_do_servidor():
+    from app.aulas.routes import TEXT_INDEX
+    from app.indexes import _same
+    # forma em que o servidor devolve um índice de texto (index_information)
+    live = {
+        "key": [("_fts", "text"), ("_ftsx", 1)],
+        "weights": {"titulo": 1, "descricao_aula": 1},
+        "default_language": "english",
+    }
+    assert not _same(TEXT_INDEX.document, live)
+    live.update(weights={"titulo": 3, "descricao_aula": 1}, default_language="portuguese")
+    assert _same(TEXT_INDEX.document, live)
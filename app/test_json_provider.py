@@ -0,0 +1,39 @@
+import pytest
+from datetime import datetime, timezone, timedelta
+from decimal import Decimal
+from bson import ObjectId, Decimal128
+from app import create_app
+
+
+def test_tipos_do_mongo_serializados_nativamente():
+    app = create_app()
+    _id = ObjectId()
+    doc = {
+        "_id": _id,
+        "id_professor": _id,
+        "data_hora": datetime(2025, 12, 1, 10, 0, tzinfo=timezone.utc),
+        "naive": datetime(2025, 12, 1, 10, 0, 30),
+        "sp": datetime(2025, 12, 1, 7, 0, tzinfo=timezone(timedelta(hours=-3))),
+        "preco": Decimal128("149.90"),
+        "desconto": Decimal("0.10"),
+        "nested": [{"id": _id}],
+    }
+    with app.test_request_context():
+        resp = app.json.response(doc)
+    assert resp.mimetype == "application/json"
+    assert app.json.loads(resp.get_data()) == {
+        "_id": str(_id),
+        "id_professor": str(_id),
+        "data_hora": "2025-12-01T10:00:00Z",
+        "naive": "2025-12-01T10:00:30Z",
+        "sp": "2025-12-01T07:00:00-03:00",
+        "preco": "149.90",
+        "desconto": "0.10",
+        "nested": [{"id": str(_id)}],
+    }
+
+
+def test_tipo_desconhecido_falha():
+    app = create_app()
+    with pytest.raises(TypeError):
+        app.json.dumps({"x": object()})
@@ -0,0 +1,83 @@
+import threading
+from unittest.mock import MagicMock
+from bson import ObjectId
+from app import create_app
+from app.loader import Loader, get_loader
+
+
+def test_load_memoiza_inclusive_ausencias():
+    db = MagicMock()
+    _id = ObjectId()
+    db.professores.find_one.return_value = {"_id": _id, "nome": "Maria"}
+    refs = Loader(db)
+
+    assert refs.load("professores", _id)["nome"] == "Maria"
+    assert refs.load("professores", str(_id))["nome"] == "Maria"
+    assert db.professores.find_one.call_count == 1
+
+    db.alunos.find_one.return_value = None
+    assert refs.load("alunos", ObjectId()) is None
+    assert db.alunos.find_one.call_count == 1
+
+
+def test_pendentes_viram_um_in():
+    db = MagicMock()
+    ids = [ObjectId() for _ in range(3)]
+    db.aulas.find.return_value = [{"_id": i, "titulo": f"Aula {n}"} for n, i in enumerate(ids[:2])]
+    refs = Loader(db)
+
+    refs.want("aulas", ids + [ids[0]], {"titulo": 1})
+    assert refs.load("aulas", ids[1], {"titulo": 1})["titulo"] == "Aula 1"
+    assert refs.load("aulas", ids[2], {"titulo": 1}) is None
+    assert refs.load_many("aulas", ids, {"titulo": 1}).keys() == {str(ids[0]), str(ids[1])}
+
+    db.aulas.find.assert_called_once_with({"_id": {"$in": ids}}, {"titulo": 1})
+    db.aulas.find_one.assert_not_called()
+
+
+def test_projecao_diferente_nao_reaproveita_e_copia_protege_cache():
+    db = MagicMock()
+    _id = ObjectId()
+    db.professores.find_one.return_value = {"_id": _id, "nome": "Maria", "email": "m@x.com"}
+    refs = Loader(db)
+
+    doc = refs.load("professores", _id, {"nome": 1})
+    doc["_id"] = str(doc["_id"])
+    assert refs.load("professores", _id, {"nome": 1})["_id"] == _id
+    refs.load("professores", _id)
+    assert db.professores.find_one.call_count == 2
+
+    refs.forget("professores", _id)
+    refs.load("professores", _id, {"nome": 1})
+    assert db.professores.find_one.call_count == 3
+
+
+def test_load_all_de_requisicoes_concorrentes_nao_disputam_threads():
+    # 2 requisições x 3 leituras presas na mesma barreira: só passam se as 6 rodarem juntas
+    barreira = threading.Barrier(6, timeout=5)
+    db = MagicMock()
+    for coll in (db.alunos, db.professores, db.aulas):
+        coll.find_one.side_effect = lambda filt, proj: barreira.wait() and None or {"_id": filt["_id"]}
+    resultados = []
+
+    def requisicao():
+        refs = Loader(db)
+        resultados.append(refs.load_all(
+            ("alunos", ObjectId(), None), ("professores", ObjectId(), None), ("aulas", ObjectId(), None)))
+
+    threads = [threading.Thread(target=requisicao) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(resultados) == 2 and all(all(docs) for docs in resultados)
+
+
+def test_loader_por_requisicao():
+    app = create_app()
+    db = MagicMock()
+    with app.test_request_context():
+        assert get_loader(db) is get_loader(db)
+        primeiro = get_loader(db)
+    with app.test_request_context():
+        assert get_loader(db) is not primeiro
@@ -0,0 +1,113 @@
+import random
+import time
+import pytest
+from bson import ObjectId
+from flask_jwt_extended import create_access_token
+
+np = pytest.importorskip("numpy")
+sparse = pytest.importorskip("scipy.sparse")
+
+from app import create_app
+from app.extensions import mongo
+from app.matching import materias, run, score, top_k
+
+
+def test_top_k_por_linha_com_desempate():
+    scores = sparse.csr_matrix(np.array([
+        [0.5, 0.9, 0.0, 0.5],
+        [0.0, 0.0, 0.0, 0.0],
+        [0.2, 0.0, 0.7, 0.0],
+    ], dtype=np.float32))
+    tiebreak = np.array([1.0, 0.0, 0.0, 4.5])         # média de avaliações
+    rows, cols, vals = top_k(np, scores, tiebreak, 2)
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 1), (0, 3), (2, 2), (2, 0)]
+    assert vals.tolist() == pytest.approx([0.9, 0.5, 0.7, 0.2])
+
+
+def test_materia_rara_pesa_mais():
+    profs = [materias({"quer_ensinar": m}, ("quer_ensinar",)) for m in ("Cálculo", "Cálculo", "Cálculo, Latim")]
+    A, PT = score(np, sparse, [{"calculo": "Cálculo", "latim": "Latim"}], profs)
+    notas = (A @ PT).toarray()[0]
+    assert notas[2] == pytest.approx(1.0)              # ensina tudo
+    assert notas[0] == notas[1] < 0.5                  # só a matéria comum
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    for coll in ("alunos", "professores", "matches"):
+        mongo.db[coll].delete_many({})
+    return app
+
+
+@pytest.fixture
+def db(app):
+    return mongo.db
+
+
+def test_run_grava_um_documento_por_aluno(db):
+    mat = db.professores.insert_one({"nome": "Ana", "quer_ensinar": ["Cálculo", "Álgebra"], "media_avaliacoes": 4}).inserted_id
+    fis = db.professores.insert_one({"nome": "Bia", "especializacoes": ["Física", "calculo"]}).inserted_id
+    db.professores.insert_one({"nome": "Oculto", "quer_ensinar": ["Cálculo"], "visibilidade": "privado"})
+    joao = db.alunos.insert_one({"nome": "João", "quer_aprender": ["Álgebra", "Cálculo"]}).inserted_id
+    db.alunos.insert_one({"nome": "Sem match", "quer_aprender": ["Latim"]})
+    db.alunos.insert_one({"nome": "Sem interesse"})
+
+    stats = run(db, k=5)
+    assert stats["alunos"] == 2 and stats["professores"] == 2 and stats["com_match"] == 1
+
+    doc = db.matches.find_one({"_id": joao})
+    assert [p["_id"] for p in doc["professores"]] == [mat, fis]
+    assert doc["professores"][0]["score"] == 1.0
+    assert doc["professores"][0]["materias"] == ["Álgebra", "Cálculo"]
+    assert doc["professores"][1]["materias"] == ["Cálculo"] and doc["professores"][1]["nome"] == "Bia"
+
+    # nova rodada troca a coleção inteira
+    db.alunos.update_one({"_id": joao}, {"$set": {"quer_aprender": ["Física"]}})
+    run(db, k=5)
+    assert [p["_id"] for p in db.matches.find_one({"_id": joao})["professores"]] == [fis]
+    assert "matches_novo" not in db.list_collection_names()
+
+
+def test_pool_de_processos_igual_ao_sequencial(db):
+    rnd = random.Random(7)
+    nomes = [f"Matéria {i}" for i in range(40)]
+    db.professores.insert_many([{"quer_ensinar": rnd.sample(nomes, 4), "media_avaliacoes": i % 5} for i in range(60)])
+    db.alunos.insert_many([{"quer_aprender": rnd.sample(nomes, 3)} for _ in range(300)])
+
+    run(db, k=3)
+    sequencial = {d["_id"]: d["professores"] for d in db.matches.find()}
+    run(db, k=3, workers=2, chunk=64)
+    assert {d["_id"]: d["professores"] for d in db.matches.find()} == sequencial
+
+
+def test_endpoint_le_o_documento_do_aluno(app, db):
+    aluno = ObjectId()
+    db.matches.insert_one({"_id": aluno, "professores": [{"_id": ObjectId(), "score": 0.9}, {"_id": ObjectId(), "score": 0.5}]})
+    with app.app_context():
+        token = create_access_token(identity=str(aluno), additional_claims={"tipo": "aluno"})
+        outro = create_access_token(identity=str(ObjectId()), additional_claims={"tipo": "aluno"})
+        prof = create_access_token(identity=str(aluno), additional_claims={"tipo": "professor"})
+    client = app.test_client()
+
+    resp = client.get("/api/alunos/me/matches?limit=1", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    assert [p["score"] for p in resp.get_json()["data"]] == [0.9]
+
+    resp = client.get("/api/alunos/me/matches", headers={"Authorization": f"Bearer {outro}"})
+    assert resp.get_json() == {"data": [], "gerado_em": None}
+    assert client.get("/api/alunos/me/matches", headers={"Authorization": f"Bearer {prof}"}).status_code == 403
+
+
+def test_calculo_de_100k_alunos_em_segundos():
+    rnd = random.Random(1)
+    nomes = [f"materia {i}" for i in range(800)]
+    profs = [dict.fromkeys(rnd.sample(nomes, 5)) for _ in range(5000)]
+    alunos = [dict.fromkeys(rnd.sample(nomes, 3)) for _ in range(100_000)]
+
+    inicio = time.perf_counter()
+    A, PT = score(np, sparse, alunos, profs)
+    tiebreak = np.zeros(len(profs))
+    total = sum(len(top_k(np, A[s:s + 5000] @ PT, tiebreak, 10)[0]) for s in range(0, A.shape[0], 5000))
+    assert total == 1_000_000
+    assert time.perf_counter() - inicio < 30
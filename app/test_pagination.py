@@ -0,0 +1,130 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+import mongomock
+from bson import ObjectId
+from werkzeug.datastructures import MultiDict
+from app import create_app
+from app.indexes import declared
+from app.pagination import after, count_total, cursor_arg, debug_plan, encode_cursor, fetch_page, page_args
+
+
+def test_cursor_ida_e_volta():
+    app = create_app()
+    doc = {"_id": ObjectId(), "created_at": datetime(2025, 3, 1, 12, 30)}
+    with app.test_request_context():
+        cursor = encode_cursor("created_at", -1, doc)
+        position, err = cursor_arg(MultiDict({"cursor": cursor}), "created_at", -1)
+        _, erro_sort = cursor_arg(MultiDict({"cursor": cursor}), "nome", -1)
+        _, erro_lixo = cursor_arg(MultiDict({"cursor": "nao-e-cursor"}), "created_at", -1)
+    assert err is None and position == (doc["created_at"], doc["_id"])
+    assert erro_sort[1] == 400 and erro_lixo[1] == 400
+
+
+def test_filtro_depois_da_posicao():
+    _id = ObjectId()
+    assert after({}, "nome", 1, None) == {}
+    assert after({}, "nome", 1, ("b", _id)) == {"$or": [{"nome": {"$gt": "b"}}, {"nome": "b", "_id": {"$gt": _id}}]}
+    # decrescente: os sem valor (null) vêm por último e continuam elegíveis
+    desc = after({"status": "x"}, "nome", -1, ("b", _id))
+    assert desc["$and"][0] == {"status": "x"} and {"nome": None} in desc["$and"][1]["$or"]
+    assert after({}, "nome", -1, (None, _id)) == {"nome": None, "_id": {"$lt": _id}}
+    # crescente: os null vêm primeiro; depois deles, todos os não nulos
+    assert after({}, "nome", 1, (None, _id)) == {
+        "$or": [{"nome": None, "_id": {"$gt": _id}}, {"nome": {"$ne": None}}]
+    }
+
+
+def test_paginacao_crescente_passa_pelos_nulls():
+    coll = mongomock.MongoClient().db.docs
+    coll.insert_many([{"n": i} for i in range(4)] + [{"n": 4, "media": 3.5}, {"n": 5, "media": 4.0}])
+    app = create_app()
+    vistos, position = [], None
+    with app.test_request_context():
+        while True:
+            rows, cursor = fetch_page(coll, {}, None, "media", 1, 2, position)
+            vistos += [r["n"] for r in rows]
+            if not cursor:
+                break
+            position, _ = cursor_arg(MultiDict({"cursor": cursor}), "media", 1)
+    assert sorted(vistos[:4]) == [0, 1, 2, 3] and vistos[4:] == [4, 5]
+
+
+def test_sort_restrito_a_chaves_indexadas():
+    app = create_app()
+    with app.test_request_context():
+        assert page_args(MultiDict({"order": "1"}), ("created_at",))[:3] == ("created_at", 1, None)
+        assert page_args(MultiDict({"sort": "titulo"}), ("created_at",))[3][1] == 400
+        assert page_args(MultiDict({"order": "2"}), ("created_at",))[3][1] == 400
+        # política "rewrite": ordenação sem índice cai na padrão
+        app.config["SORT_POLICY"] = "rewrite"
+        assert page_args(MultiDict({"sort": "titulo"}), ("created_at",))[:3] == ("created_at", -1, None)
+
+
+def test_ordenacoes_registradas_tem_indice():
+    from app.agenda.routes import SORT_KEYS as agenda
+    from app.alunos.routes import SORT_KEYS as alunos
+    from app.aulas.routes import SORT_KEYS as aulas
+    from app.avaliacoes.routes import SORT_KEYS as avaliacoes
+    from app.categorias.routes import SORT_KEYS as categorias
+    from app.professores.routes import SORT_KEYS as professores
+    registry = {"agenda": agenda, "alunos": alunos, "aulas": aulas, "avaliacoes": avaliacoes,
+                "categorias": categorias, "professores": professores}
+    indices = {coll: [list(m.document["key"].items()) for m in models] for coll, models in declared().items()}
+    for coll, sort_keys in registry.items():
+        for sort, keys in sort_keys.items():
+            assert keys[0][0] == sort and keys[-1][0] == "_id"
+            assert keys in indices[coll], (coll, sort)
+
+
+def test_plano_da_listagem_em_debug():
+    app = create_app()
+    coll = MagicMock()
+    coll.find.return_value.sort.return_value.limit.return_value.explain.return_value = {
+        "queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}
+    }
+    with app.test_request_context():
+        assert debug_plan(coll, {}, "created_at", -1, 10, None, MultiDict({"explain": "1"})) == {}
+        app.config["LIST_EXPLAIN"] = True
+        assert debug_plan(coll, {}, "created_at", -1, 10, None, MultiDict()) == {}
+        plan = debug_plan(coll, {}, "created_at", -1, 10, None, MultiDict({"explain": "1"}))["plan"]
+    assert plan == {"stages": ["SORT", "COLLSCAN"], "indexes": [], "collscan": True, "in_memory_sort": True}
+
+
+def test_plano_da_agregacao_quando_a_listagem_agrega():
+    app = create_app()
+    app.config["LIST_EXPLAIN"] = True
+    coll = MagicMock()
+    coll.name = "aulas"
+    coll.database.command.return_value = {"stages": [
+        {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {
+            "stage": "IXSCAN", "indexName": "status_1_created_at_-1"}}}}},
+        {"$lookup": {}},
+    ]}
+    pipeline = [{"$match": {"status": "disponivel"}}, {"$sort": {"created_at": -1, "_id": -1}}]
+    with app.test_request_context():
+        plan = debug_plan(coll, {"status": "disponivel"}, "created_at", -1, 10, None,
+                          MultiDict({"explain": "1"}), pipeline=pipeline)["plan"]
+    coll.database.command.assert_called_once_with("aggregate", "aulas", pipeline=pipeline, explain=True)
+    coll.find.assert_not_called()
+    assert plan == {"stages": ["FETCH", "IXSCAN"], "indexes": ["status_1_created_at_-1"],
+                    "collscan": False, "in_memory_sort": False}
+
+
+def test_total_opcional_e_em_cache():
+    app = create_app()
+    coll = MagicMock()
+    coll.count_documents.return_value = 7
+    coll.estimated_document_count.return_value = 100
+    with app.test_request_context():
+        assert count_total(coll, {"a": 1}, MultiDict({"with_total": "false"})) is None
+        coll.count_documents.assert_not_called()
+        # mesmo filtro com as chaves em outra ordem: uma contagem só
+        assert count_total(coll, {"a": 1, "b": 2}, MultiDict()) == 7
+        assert count_total(coll, {"b": 2, "a": 1}, MultiDict()) == 7
+        assert coll.count_documents.call_count == 1
+        # sem filtro, a estimativa da coleção
+        assert count_total(coll, {}, MultiDict()) == 100
+        app.config["TOTALS_TTL"] = 0
+        count_total(coll, {"a": 1, "c": 3}, MultiDict())
+        count_total(coll, {"a": 1, "c": 3}, MultiDict())
+    assert coll.count_documents.call_count == 3
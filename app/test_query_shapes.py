@@ -0,0 +1,95 @@
+import json
+import multiprocessing
+from types import SimpleNamespace
+import pytest
+from app import create_app
+from app.query_shapes import ShapeRecorder, shape_of, suggest_index
+from app.utils import fcntl
+
+
+def _evento(request_id, name, command, micros=2000):
+    return SimpleNamespace(request_id=request_id, command_name=name, command=command, duration_micros=micros)
+
+
+def test_forma_troca_valores_e_mantem_operadores():
+    filt = {"visibilidade": {"$ne": "privado"}, "id_categoria": {"$in": [1, 2]},
+            "$or": [{"nome": {"$regex": "ana", "$options": "i"}}, {"slug": {"$regex": "^ana"}}]}
+    assert shape_of(filt) == {
+        "$or": [{"nome": {"$options": "i", "$regex": "?"}}, {"slug": {"$regex": "^?"}}],
+        "id_categoria": {"$in": "?"},
+        "visibilidade": {"$ne": "?"},
+    }
+
+
+def test_gravador_agrega_por_forma(tmp_path):
+    app = create_app()
+    rec = ShapeRecorder(str(tmp_path / "shapes.json"))
+    with app.test_request_context("/api/professores/"):
+        for i, nome in enumerate(["ana", "bia"]):
+            cmd = {"find": "professores", "filter": {"nome": nome}, "sort": {"created_at": -1}}
+            rec.started(_evento(i, "find", cmd))
+            rec.succeeded(_evento(i, "find", cmd, micros=3000 * (i + 1)))
+        rec.started(_evento(9, "insert", {"insert": "professores"}))
+    (entry,) = rec.shapes.values()
+    assert entry["count"] == 2 and entry["total_ms"] == 9.0 and entry["max_ms"] == 6.0
+    assert entry["filter"] == {"nome": "?"} and entry["sort"] == [["created_at", -1]]
+
+    # o arquivo acumula entre execuções
+    rec.dump()
+    rec.started(_evento(3, "find", {"find": "professores", "filter": {"nome": "c"}, "sort": {"created_at": -1}}))
+    rec.succeeded(_evento(3, "find", {}))
+    rec.dump()
+    (salvo,) = json.loads((tmp_path / "shapes.json").read_text()).values()
+    assert salvo["count"] == 3
+
+
+def _worker_sai(path, inicio, vezes):
+    # um worker do servidor: grava suas consultas e faz o dump do atexit junto com os outros
+    rec = ShapeRecorder(path)
+    cmd = {"find": "aulas", "filter": {"status": "x"}}
+    for i in range(vezes):
+        rec.started(_evento(i, "find", cmd))
+        rec.succeeded(_evento(i, "find", cmd))
+    inicio.wait(5)
+    rec.dump()
+
+
+@pytest.mark.skipif(fcntl is None, reason="flock só existe em POSIX")
+def test_dumps_concorrentes_nao_perdem_contagens(tmp_path):
+    path = str(tmp_path / "shapes.json")
+    ctx = multiprocessing.get_context("fork")
+    for _ in range(3):
+        inicio = ctx.Event()
+        workers = [ctx.Process(target=_worker_sai, args=(path, inicio, n + 1)) for n in range(6)]
+        for w in workers:
+            w.start()
+        inicio.set()
+        for w in workers:
+            w.join(10)
+            assert w.exitcode == 0
+    (salvo,) = json.loads((tmp_path / "shapes.json").read_text()).values()
+    assert salvo["count"] == 3 * sum(range(1, 7))
+
+
+def test_sugestao_esr():
+    keys, notes = suggest_index(
+        {"status": "?", "created_at": {"$gte": "?"}, "nome": {"$options": "i", "$regex": "?"}},
+        [["data_hora", -1]],
+    )
+    assert keys == [("status", 1), ("data_hora", -1), ("created_at", 1)]
+    assert len(notes) == 1 and notes[0].startswith("nome")
+
+
+def test_relatorio_pelo_cli(tmp_path):
+    app = create_app()
+    path = tmp_path / "shapes.json"
+    rec = ShapeRecorder(str(path))
+    cmd = {"find": "aulas", "filter": {"id_professor": 1, "status": "x"}, "sort": {"created_at": -1}}
+    rec.started(_evento(1, "find", cmd))
+    rec.succeeded(_evento(1, "find", cmd))
+    rec.dump()
+    app.config["QUERY_SHAPES_FILE"] = str(path)
+    out = app.test_cli_runner().invoke(args=["db", "query-report"]).output
+    # mongomock não tem explain: sem plano, a sugestão aparece mesmo assim
+    assert "[plano indisponível] aulas.find x1" in out
+    assert "sugestão: IndexModel([('id_professor', 1), ('status', 1), ('created_at', -1)])" in out
@@ -0,0 +1,176 @@
+import threading
+import time
+import pytest
+from bson import ObjectId
+from flask_jwt_extended import create_access_token
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from app import create_app
+from app.extensions import mongo
+from app.recommender import RECOMMENDER, TfidfIndex, doc_terms, file_lock
+
+PROFS = [
+    {"_id": "mat", "especializacoes": ["Cálculo", "Álgebra Linear"], "bio": "Monitor de matemática"},
+    {"_id": "fis", "quer_ensinar": ["Física"], "skills": [{"nome": "Mecânica"}], "headline": "Física para engenharia"},
+    {"_id": "prog", "skills": ["Python", "Algoritmos"], "bio": "Aulas de programação e cálculo numérico"},
+]
+
+
+def mapped(array):
+    """O array é uma view de um arquivo aberto com mmap (e não uma cópia em memória)?"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def ranking(index, texto):
+    return [_id for _id, _ in index.query(texto)]
+
+
+def test_ranking_por_cosseno():
+    index = TfidfIndex()
+    index.build(PROFS)
+    assert ranking(index, "Quero aprender cálculo e álgebra") == ["mat", "prog"]
+    assert ranking(index, "mecanica") == ["fis"]
+    assert index.query("palavra inexistente") == []
+    _, nota = index.query("algebra linear")[0]
+    assert 0 < nota <= 1
+
+
+def test_update_incremental_equivale_ao_build():
+    index = TfidfIndex()
+    index.build(PROFS[:2])
+    index.update("prog", PROFS[2])                       # novo professor, termos novos
+    index.update("fis", {**PROFS[1], "quer_ensinar": ["Física", "Python"]})
+    completo = TfidfIndex()
+    completo.build([PROFS[0], {**PROFS[1], "quer_ensinar": ["Física", "Python"]}, PROFS[2]])
+    assert ranking(index, "python") == ranking(completo, "python") == ["prog", "fis"]
+    assert np.array_equal(index.df, completo.df[[completo.vocab[t] for t in index.vocab]])
+
+    assert index.remove("prog") and not index.remove("prog")
+    assert ranking(index, "python") == ["fis"]
+    assert len(index) == 2
+
+
+def test_persistencia_com_mmap(tmp_path):
+    index = TfidfIndex(str(tmp_path))
+    index.build(PROFS)
+    index.save()
+
+    worker = TfidfIndex(str(tmp_path))
+    assert worker.load()
+    assert mapped(worker.matrix.data)    # sem recalcular e sem copiar a matriz
+    assert ranking(worker, "calculo") == ranking(index, "calculo")
+    assert not worker.stale()
+
+    # outro processo grava uma escrita: vira uma linha do delta, sem regravar a matriz
+    index.record("fis", doc_terms({"quer_ensinar": ["Cálculo"]}))
+    versao, matriz = worker.version, worker.matrix
+    assert worker.sync() and worker.version == versao and worker.matrix is matriz
+    assert "fis" in ranking(worker, "calculo")
+
+    # um build novo publica outra versão: o worker percebe e recarrega
+    index.build(PROFS)
+    index.save()
+    assert worker.stale() and worker.sync() and worker.version == index.version
+    assert "fis" not in ranking(worker, "calculo")
+    assert len([p for p in tmp_path.iterdir() if p.name.startswith("v")]) == 2
+
+
+def test_escritas_concorrentes_de_dois_workers_nao_se_perdem(tmp_path):
+    base = TfidfIndex(str(tmp_path))
+    base.build(PROFS)
+    base.save()
+    a, b = TfidfIndex(str(tmp_path)), TfidfIndex(str(tmp_path))
+    assert a.load() and b.load()                      # os dois partem da mesma versão
+
+    for worker, _id, materia in ((a, "novo_a", "Química"), (b, "novo_b", "Biologia"), (a, "mat", "Geometria")):
+        with file_lock(worker.path):
+            worker.sync()
+            worker.record(_id, doc_terms({"quer_ensinar": [materia]}))
+
+    for worker in (a, b, TfidfIndex(str(tmp_path))):
+        worker.sync()
+        assert ranking(worker, "quimica") == ["novo_a"] and ranking(worker, "biologia") == ["novo_b"]
+        assert ranking(worker, "geometria") == ["mat"] and "mat" not in ranking(worker, "algebra")
+        assert len(worker) == 5
+    assert len([p for p in tmp_path.iterdir() if p.name.startswith("v")]) == 1
+
+
+def test_rebuild_leva_as_escritas_do_meio_para_a_versao_nova(tmp_path):
+    index = TfidfIndex(str(tmp_path))
+    index.build(PROFS)
+    index.save()
+    carry = index.mark()
+    index.record("novo", doc_terms({"quer_ensinar": ["Química"]}))   # chega durante a leitura do banco
+    index.build(PROFS)
+    index.save(carry)
+
+    worker = TfidfIndex(str(tmp_path))
+    assert worker.load() and ranking(worker, "quimica") == ["novo"]
+
+
+def test_endpoint_monta_do_banco_e_segue_escritas(tmp_path):
+    app = create_app()                      # RECOMMENDER_DIR em tmp_path (conftest.py)
+    db = mongo.db
+    db.professores.delete_many({})
+    ids = {}
+    for prof in PROFS:
+        ids[prof["_id"]] = db.professores.insert_one({**prof, "_id": ObjectId(), "nome": prof["_id"]}).inserted_id
+    db.professores.update_one({"_id": ids["prog"]}, {"$set": {"visibilidade": "privado"}})
+    client = app.test_client()
+
+    resp = client.post("/api/professores/recomendar", json={"texto": "Preciso de ajuda em cálculo"})
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert [p["nome"] for p in body["data"]] == ["mat"]          # "prog" é privado
+    assert body["data"][0]["score"] > 0 and body["termos"] == ["calculo"]
+    assert (tmp_path / "recomendador" / "CURRENT").exists()
+
+    with app.app_context():
+        token = create_access_token(identity="tester")
+    resp = client.put(f"/api/professores/{ids['fis']}", json={"especializacoes": "Cálculo Vetorial"},
+                      headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    RECOMMENDER.flush()                     # a requisição só enfileira; a thread grava no delta
+    nomes = [p["nome"] for p in client.get("/api/professores/recomendar?texto=calculo").get_json()["data"]]
+    assert sorted(nomes) == ["fis", "mat"]
+
+    assert client.get("/api/professores/recomendar").status_code == 400
+
+
+def test_build_fora_da_trava_nao_segura_escritas(monkeypatch):
+    create_app()
+    db = mongo.db
+    db.professores.delete_many({})
+    ids = [db.professores.insert_one({**p, "_id": ObjectId()}).inserted_id for p in PROFS]
+    lendo, liberar = threading.Event(), threading.Event()
+    build = TfidfIndex.build
+
+    def build_lento(self, docs):
+        docs = list(docs)                   # o banco já foi lido: escritas daqui em diante escapam do build
+        lendo.set()
+        assert liberar.wait(5)
+        build(self, docs)
+
+    monkeypatch.setattr(TfidfIndex, "build", build_lento)
+    resultado = []
+    consulta = threading.Thread(target=lambda: resultado.append(RECOMMENDER.recommend("quimica")))
+    consulta.start()
+    assert lendo.wait(5)
+
+    # durante o build a escrita só enfileira e a thread de gravação não espera por ele
+    inicio = time.perf_counter()
+    RECOMMENDER.on_write(ids[1], {"quer_ensinar": ["Química"]}, current=PROFS[1])
+    RECOMMENDER.flush()
+    assert time.perf_counter() - inicio < 1
+
+    liberar.set()
+    consulta.join(5)
+    # a escrita do meio entra no índice novo
+    assert [_id for _id, _ in resultado[0]] == [str(ids[1])]
+    assert [_id for _id, _ in RECOMMENDER.recommend("quimica")] == [str(ids[1])]
@@ -0,0 +1,55 @@
+import mongomock
+from unittest.mock import MagicMock
+from app.search import ALUNO_BUSCA, PROFESSOR_BUSCA, fold
+
+
+def test_fold_remove_acentos_caixa_e_espacos():
+    assert fold("  São   PAULO ") == "sao paulo"
+    assert fold("Matemática Aplicada") == "matematica aplicada"
+    assert fold("Ção") == "cao"
+
+
+def test_build_desce_listas_e_subdocumentos():
+    doc = {
+        "nome": "Ana Júlia",
+        "skills": [{"nome": "Álgebra", "endossos": 3}, "Geometria"],
+        "quer_aprender": ["Violão"],
+        "endereco": {"cidade": "Belém", "estado": "PA"},
+        "email": "ana@x.com",
+    }
+    assert ALUNO_BUSCA.build(doc) == {
+        "nome": "ana julia",
+        "tags": "violao algebra geometria",
+        "texto": "ana@x.com",
+        "cidade": "belem",
+        "estado": "pa",
+    }
+
+
+def test_on_write_so_recalcula_quando_mexe_nas_origens():
+    db = mongomock.MongoClient().db
+    _id = db.professores.insert_one({"nome": "Luís", "area": "Humanas", "endereco": {"cidade": "Niterói"}}).inserted_id
+
+    body = {"headline": "Professor de História"}
+    PROFESSOR_BUSCA.on_write(db.professores, _id, body)
+    # o que não mudou vem do documento atual
+    assert body["busca"]["nome"] == "luis" and body["busca"]["cidade"] == "niteroi"
+    assert body["busca"]["texto"] == "professor de historia"
+
+    assert PROFESSOR_BUSCA.on_write(db.professores, _id, {"visibilidade": "privado"}) == {"visibilidade": "privado"}
+
+
+def test_indices_e_rebuild():
+    text, *exact = PROFESSOR_BUSCA.indexes()
+    assert text.document["weights"] == {"busca.nome": 10, "busca.tags": 5, "busca.texto": 1}
+    assert text.document["default_language"] == "portuguese"
+    assert [m.document["name"] for m in exact] == ["busca.cidade_1", "busca.estado_1", "busca.area_1"]
+
+    # bulk_write do mongomock não acompanha o UpdateOne do pymongo 4.x
+    coll = MagicMock()
+    coll.find.return_value = [{"_id": 1, "nome": "Érica", "endereco": {"estado": "RJ"}}, {"_id": 2, "nome": "Caio"}]
+    assert ALUNO_BUSCA.rebuild(coll, batch=1) == 2
+    assert coll.bulk_write.call_count == 2
+    first = coll.bulk_write.call_args_list[0][0][0][0]
+    assert first._filter == {"_id": 1}
+    assert first._doc["$set"]["busca"]["nome"] == "erica" and first._doc["$set"]["busca"]["estado"] == "rj"
@@ -0,0 +1,50 @@
+from bson import ObjectId
+from app import create_app
+from app.serializers import Serializer, AULA, PROFESSOR, PROFESSOR_PUBLICO, MENSAGEM
+
+
+def test_remove_sensiveis_sem_alterar_documento():
+    app = create_app()
+    doc = {"_id": ObjectId(), "nome": "Maria", "senha": "x", "senha_hash": "h",
+           "google_tokens": {"refresh_token": "r"}, "email": "m@x.com"}
+    with app.app_context():
+        out = PROFESSOR.one(doc)
+        publico = PROFESSOR_PUBLICO.one(doc)
+    assert out == {"_id": doc["_id"], "nome": "Maria", "email": "m@x.com"}
+    assert publico == {"_id": doc["_id"], "nome": "Maria"}
+    assert "senha_hash" in doc and "google_tokens" in doc
+
+
+def test_show_hash_lido_por_chamada():
+    app = create_app()
+    app.config["SHOW_HASH"] = True
+    with app.app_context():
+        docs = PROFESSOR.many([{"_id": 1, "senha": "x", "senha_hash": "h"}] * 2)
+    assert docs == [{"_id": 1, "senha_hash": "h"}] * 2
+
+
+def test_defaults_e_campos():
+    app = create_app()
+    with app.app_context():
+        aulas = AULA.many([{"_id": 1, "status": None}, {"_id": 2, "status": "agendada"}, {"_id": 3}])
+        msg = MENSAGEM.one({"_id": 9, "text": "oi", "from": 1, "conversation_id": 5, "read_by": [1]})
+        vazio = Serializer().one(None)
+    assert [a["status"] for a in aulas] == ["disponivel", "agendada", "disponivel"]
+    assert msg == {"id": 9, "text": "oi", "from": 1, "created_at": None}
+    assert vazio is None
+
+
+def test_projecoes_por_representacao():
+    app = create_app()
+    with app.test_request_context("/?fields=titulo,preco_decimal"):
+        from flask import request
+        fields, err = AULA.projection(request.args)
+        # a aula sem status não ganha o default se ele não foi pedido
+        out = AULA.one({"_id": 1, "titulo": "x"}, fields)
+    assert err is None and fields == {"titulo": 1, "preco_decimal": 1}
+    assert AULA.fetch(fields) == {"titulo": 1, "preco_decimal": 1, "id_professor": 1, "id_categoria": 1}
+    assert out == {"_id": 1, "titulo": "x"}
+    with app.app_context():
+        assert PROFESSOR.full() == {"busca": 0, "google_tokens": 0, "senha": 0, "senha_hash": 0}
+        assert AULA.fetch(AULA.full()) == AULA.full()
+        assert "google_tokens" not in PROFESSOR.summary()
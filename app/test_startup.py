@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# importadas só no primeiro uso (Calendar, ViaCEP e recomendador)
+LAZY_MODULES = ("googleapiclient", "google_auth_oauthlib", "google.oauth2", "requests", "numpy", "scipy")
+
+# orçamentos do boot de um worker (folgados: a máquina de CI varia)
+IMPORT_BUDGET_US = 1_500_000
+RSS_BUDGET_MB = 90
+
+# memória residente em MB, ou "-" onde não há como medir (Windows: sem `resource`).
+# Linux: VmRSS do próprio processo (o ru_maxrss herda o pico do pytest no fork + exec);
+# macOS: ru_maxrss vem em bytes (no Linux, em KB)
+SCRIPT = """
+import sys
+from app import create_app
+create_app()
+try:
+    with open("/proc/self/status") as f:
+        print(next(int(l.split()[1]) for l in f if l.startswith("VmRSS:")) / 1024)
+except OSError:
+    try:
+        import resource
+    except ImportError:
+        print("-")
+    else:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024)
+"""
+
+
+def test_boot_sem_dependencias_pesadas():
+    env = {**os.environ, "PYTEST_CURRENT_TEST": "startup"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+
+    imported = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                imported[name.strip()] = int(cumulative)
+
+    lazy = [m for m in imported if m.split(".")[0] in LAZY_MODULES or m.startswith(LAZY_MODULES)]
+    assert not lazy, f"importados no boot: {lazy}"
+    assert imported["app"] < IMPORT_BUDGET_US, f"import de app: {imported['app']}us"
+
+    rss = proc.stdout.strip().splitlines()[-1]
+    if rss != "-":  # no Windows só valem os imports e o tempo
+        assert float(rss) < RSS_BUDGET_MB, f"memória residente após create_app: {float(rss):.0f}MB"
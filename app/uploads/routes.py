@@ -4,7 +4,8 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 from ..extensions import mongo
-from ..utils import oid, now, scrub
+from ..utils import oid, now
+from ..serializers import ALUNO, PROFESSOR
 from urllib.parse import urljoin
 
 bp = Blueprint("uploads", __name__)
@@ -86,7 +87,7 @@ def upload_avatar_alunos(id):
 
     mongo.db.alunos.update_one({"_id": _id}, {"$set": {"avatar_url": url, "updated_at": now()}}, upsert=True)
     doc = mongo.db.alunos.find_one({"_id": _id}, {})
-    out = scrub(doc)
+    out = ALUNO.one(doc)
     out["avatarUrl"] = url
     return jsonify({"ok": True, "avatarUrl": url, "user": out}), 200
 
@@ -109,6 +110,6 @@ def upload_avatar_professores(id):
 
     mongo.db.professores.update_one({"_id": _id}, {"$set": {"avatar_url": url, "updated_at": now()}}, upsert=True)
     doc = mongo.db.professores.find_one({"_id": _id}, {})
-    out = scrub(doc)
+    out = PROFESSOR.one(doc)
     out["avatarUrl"] = url
     return jsonify({"ok": True, "avatarUrl": url, "user": out}), 200
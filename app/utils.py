@@ -1,9 +1,14 @@
 from bson.objectid import ObjectId
-from flask import current_app
+from contextlib import contextmanager
 from datetime import datetime, timezone
 import bcrypt
 import os
 
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (desenvolvimento com um worker só)
+    fcntl = None
+
 def oid(s):
     try: return ObjectId(s)
     except Exception: return None
@@ -25,15 +30,46 @@ def hash_password(plain: str) -> str:
         rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
     return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
 
-def scrub(doc):
-    if not doc:
-        return doc
-    doc["_id"] = str(doc["_id"])
-    doc.pop("senha", None)
-    show_hash = current_app.config.get("SHOW_HASH", False)
+@contextmanager
+def flock(lock_file):
+    """Trava exclusiva entre processos sobre `lock_file` (criado se preciso)."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(lock_file)), exist_ok=True)
+    with open(lock_file, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
 
-    if show_hash:
-        pass
-    else:
-        doc.pop("senha_hash", None)
-    return doc
+def fetch_by_ids(collection, ids, projection=None):
+    """Busca vários documentos por _id em uma única consulta ($in).
+
+    Retorna um dict indexado por str(_id), para que o join em memória funcione
+    tanto com ObjectId quanto com ids legados salvos como string.
+    """
+    unique = {}
+    for i in ids:
+        if not i:
+            continue
+        unique.setdefault(str(i), oid(i) or i)
+    if not unique:
+        return {}
+    cur = collection.find({"_id": {"$in": list(unique.values())}}, projection)
+    return {str(d["_id"]): d for d in cur}
+
+def lookup_stages(from_, local_field, as_, fields):
+    """Estágios de agregação que juntam `from_` por _id trazendo só `fields`.
+
+    Usa $lookup com localField/foreignField seguido de $map, o que funciona
+    tanto no MongoDB quanto no mongomock; o resultado fica em `as_` como uma
+    lista com no máximo um elemento.
+    """
+    shape = {"_id": "$$r._id"}
+    shape.update({f: f"$$r.{f}" for f in fields})
+    return [
+        {"$lookup": {"from": from_, "localField": local_field, "foreignField": "_id", "as": as_}},
+        {"$addFields": {as_: {"$map": {"input": f"${as_}", "as": "r", "in": shape}}}},
+    ]
@@ -0,0 +1,61 @@
+"""Microbenchmark: scrub() + cópia + ajuste de status (caminho antigo) vs. serializador AULA.
+
+Uso: python benchmarks/bench_serializers.py [linhas] [repetições]
+"""
+import sys
+import timeit
+from datetime import datetime, timezone
+from bson import ObjectId
+
+sys.path.insert(0, ".")
+from app import create_app  # noqa: E402
+from app.serializers import AULA  # noqa: E402
+
+
+def legacy_scrub(doc, app):
+    # cópia de app.utils.scrub antes dos serializadores
+    if not doc:
+        return doc
+    doc["_id"] = str(doc["_id"])
+    doc.pop("senha", None)
+    if not app.config.get("SHOW_HASH", False):
+        doc.pop("senha_hash", None)
+    return doc
+
+
+def legacy_list(docs, app):
+    out = []
+    for aula in docs:
+        status_original = aula.get("status")
+        aula_doc = legacy_scrub(dict(aula), app)
+        aula_doc["status"] = status_original or "disponivel"
+        for k in ("id_professor", "id_categoria"):
+            if aula_doc.get(k):
+                aula_doc[k] = str(aula_doc[k])
+        out.append(aula_doc)
+    return out
+
+
+def make_docs(n):
+    agora = datetime.now(timezone.utc)
+    return [{
+        "_id": ObjectId(), "titulo": f"Aula {i}", "descricao_aula": "x" * 120,
+        "preco_decimal": 99.9, "id_professor": ObjectId(), "id_categoria": ObjectId(),
+        "status": None if i % 3 else "agendada", "created_at": agora, "updated_at": agora,
+    } for i in range(n)]
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    app = create_app()
+    docs = make_docs(linhas)
+    with app.app_context():
+        for nome, fn in (("scrub (antigo)", lambda: legacy_list(docs, app)),
+                         ("AULA.many", lambda: AULA.many(docs))):
+            t = min(timeit.repeat(fn, number=reps, repeat=5)) / reps
+            print(f"{nome:15s} {t * 1e6:8.1f} µs por página de {linhas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import pytest
+from app.recommender import RECOMMENDER
+
+
+@pytest.fixture(autouse=True)
+def recommender_dir(tmp_path, monkeypatch):
+    """O índice do /recomendar de cada teste grava em tmp_path, nunca no instance/ do repositório."""
+    path = str(tmp_path / "recomendador")
+    monkeypatch.setenv("RECOMMENDER_DIR", path)
+    RECOMMENDER.use(path)
+    yield
+    RECOMMENDER.flush()